@@ -9,7 +9,7 @@ class Module(ModuleManager.BaseModule):
     @utils.kwarg("usage", "<acronym>")
     def acronym(self, event):
         query = event["args_split"][0].upper()
-        response = utils.http.request(API % query)
+        response = yield utils.http.Request(API % query)
 
         acronyms = []
         for element in response.soup().find_all("acro"):
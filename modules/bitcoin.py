@@ -12,7 +12,8 @@ class Module(ModuleManager.BaseModule):
         :usage: [currency]
         """
         currency = (event["args"] or "USD").upper()
-        page = utils.http.request("https://blockchain.info/ticker").json()
+        page = (yield utils.http.Request("https://blockchain.info/ticker")
+            ).json()
         if page:
             if currency in page:
                 conversion = page[currency]
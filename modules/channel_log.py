@@ -13,9 +13,12 @@ SETTING = utils.BoolSetting("channel-log",
 @utils.export("botset", SETTING)
 class Module(ModuleManager.BaseModule):
     def _enabled(self, server, channel):
-        return channel.get_setting("log",
-            server.get_setting("channel-log",
-            self.bot.get_setting("channel-log", False)))
+        enabled = channel.get_setting("log", None)
+        if enabled == None:
+            # the per-channel setting has a different name
+            enabled = self.bot.resolve_setting("channel-log", server=server,
+                default=False)
+        return enabled
     def _file(self, server_name, channel_name):
         # if a channel name has os.path.sep (e.g. "/") in it, the channel's log
         # file will create a subdirectory.
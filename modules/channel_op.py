@@ -89,9 +89,8 @@ class Module(ModuleManager.BaseModule):
                     channel.send_mode(timer.kwargs["mode"], False)
 
     def _kick_reason(self, server, channel):
-        return channel.get_setting("default-kick-reason",
-            server.get_setting("default-kick-reason",
-            self.bot.get_setting("default-kick-reson", KICK_REASON)))
+        return self.bot.resolve_setting("default-kick-reason",
+            channel=channel, server=server, default=KICK_REASON)
 
     def _kick(self, server, channel, nicknames, reason):
         reason = reason or self._kick_reason(server, channel)
@@ -181,7 +181,7 @@ class Module(ModuleManager.BaseModule):
         user_coins = self._get_user_coins(event["user"])
         if user_coins == DECIMAL_ZERO:
             cache = self._redeem_cache(event["server"], event["user"])
-            if not self.bot.cache.has_item(cache):
+            if not self.cache.has_item(cache):
                 redeem_amount = self._redeem_amount(event["server"])
                 self._give(event["server"], event["user"], redeem_amount)
 
@@ -189,9 +189,9 @@ class Module(ModuleManager.BaseModule):
                     % (event["user"].nickname, self._coin_str(redeem_amount)))
 
                 redeem_delay = self._redeem_delay(event["server"])
-                self.bot.cache.temporary_cache(cache, True, redeem_delay)
+                self.cache.temporary_cache(cache, True, redeem_delay)
             else:
-                time_left = self.bot.cache.until_expiration(cache)
+                time_left = self.cache.until_expiration(cache)
                 event["stderr"].write("%s: Please wait %s before redeeming" % (
                     event["user"].nickname,
                     utils.datetime.format.to_pretty_until(time_left)))
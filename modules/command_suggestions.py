@@ -1,6 +1,5 @@
 #--depends-on commands
 
-import difflib
 from src import ModuleManager, utils
 
 SETTING = utils.BoolSetting("command-suggestions",
@@ -8,18 +7,15 @@ SETTING = utils.BoolSetting("command-suggestions",
 @utils.export("serverset", SETTING)
 @utils.export("channelset", SETTING)
 class Module(ModuleManager.BaseModule):
-    def _all_command_hooks(self):
-        return self.events.on("received.command").get_children()
-
     @utils.hook("unknown.command")
     def unknown_command(self, event):
-        if not event["server"].get_setting("command-suggestions",
-                event["target"].get_setting("command-suggestions", True)):
+        if not self.bot.resolve_setting("command-suggestions",
+                channel=event["target"], server=event["server"],
+                default=True, bot=False):
             return
 
-        all_commands = self._all_command_hooks()
-        match = difflib.get_close_matches(event["command"], all_commands,
-            cutoff=0.7)
+        match = self.events.on("received.command").get_close_children(
+            event["command"], cutoff=0.7)
         if match:
             nickname = ""
             if event["is_channel"]:
@@ -13,7 +13,7 @@ class Module(ModuleManager.BaseModule):
     _last_called = 0
 
     def _get_definition(self, word):
-        page = utils.http.request(URL_WORDNIK % word, get_params={
+        page = yield utils.http.Request(URL_WORDNIK % word, get_params={
             "useCanonical": "true", "limit": 1,
             "sourceDictionaries": "wiktionary",
             "api_key": self.bot.config["wordnik-api-key"]})
@@ -32,7 +32,7 @@ class Module(ModuleManager.BaseModule):
     def define(self, event):
         word = event["spec"][0].replace(" ", "+")
 
-        success, definition = self._get_definition(word)
+        success, definition = yield from self._get_definition(word)
         if success:
             if not definition == None:
                 text = utils.http.strip_html(definition["text"])
@@ -49,11 +49,12 @@ class Module(ModuleManager.BaseModule):
                 RANDOM_DELAY_SECONDS):
             self._last_called = time.time()
 
-            page = utils.http.request(URL_WORDNIK_RANDOM, get_params={
+            page = (yield utils.http.Request(URL_WORDNIK_RANDOM, get_params={
                 "api_key": self.bot.config["wordnik-api-key"],
-                "min_dictionary_count": 1}).json()
+                "min_dictionary_count": 1})).json()
             if page:
-                success, definition = self._get_definition(page["word"])
+                success, definition = yield from self._get_definition(
+                    page["word"])
                 if not success:
                     raise utils.EventError("Try again in a couple of seconds")
 
@@ -16,9 +16,9 @@ class Module(ModuleManager.BaseModule):
 
         phrase = event["args"] or event["target"].buffer.get()
         if phrase:
-            page = utils.http.request(URL_DDG, get_params={
+            page = (yield utils.http.Request(URL_DDG, get_params={
                 "q": phrase, "format": "json", "no_html": "1",
-                "no_redirect": "1"}).json()
+                "no_redirect": "1"})).json()
 
             if page and page["AbstractURL"]:
                 event["stdout"].write(page["AbstractURL"])
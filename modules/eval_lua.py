@@ -10,7 +10,7 @@ class Module(ModuleManager.BaseModule):
     @utils.hook("received.command.lua", min_args=1)
     def eval(self, event):
         try:
-            page = utils.http.request(EVAL_URL, post_data=
+            page = yield utils.http.Request(EVAL_URL, post_data=
                 {"input": event["args"]}, method="POST")
         except socket.timeout:
             raise utils.EventError("%s: eval timed out" %
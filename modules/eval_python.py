@@ -15,7 +15,7 @@ class Module(ModuleManager.BaseModule):
 
         page = None
         try:
-            page = utils.http.request(url)
+            page = yield utils.http.Request(url)
         except:
             pass
 
@@ -75,13 +75,13 @@ class Module(ModuleManager.BaseModule):
         note = None
         type = "Create"
         if not url == None:
-            note_page = ap_utils.activity_request(url)
+            note_page = yield ap_utils.activity_request(url)
             if not note_page.content_type in ap_utils.AP_TYPES:
                 raise utils.EventError("That's not a fediverse URL")
 
             note = note_page.json()
             actor = ap_actor.Actor(note["attributedTo"])
-            actor.load()
+            yield from actor.load()
         else:
             username = None
             instance = None
@@ -90,13 +90,15 @@ class Module(ModuleManager.BaseModule):
 
             if not username or not instance:
                 raise utils.EventError("Please provide @<user>@<instance>")
-            actor, note = self._get_from_outbox(username, instance)
+            actor, note = yield from self._get_from_outbox(username,
+                instance)
             type = note["type"]
             note = note["object"]
 
-        cw, author, content, url = ap_utils.parse_note(actor, note, type)
-        shorturl = self.exports.get("shorturl")(event["server"], url,
-            context=event["target"])
+        cw, author, content, url = yield from ap_utils.parse_note(actor, note,
+            type)
+        shorturl = yield from self.exports.get("shorturl")(event["server"],
+            url, context=event["target"])
 
         if cw:
             if strict_cw:
@@ -109,15 +111,15 @@ class Module(ModuleManager.BaseModule):
 
     def _get_from_outbox(self, username, instance):
         try:
-            actor_url = ap_utils.find_actor(username, instance)
+            actor_url = yield from ap_utils.find_actor(username, instance)
         except ap_utils.FindActorException as e:
             raise utils.EventError(str(e))
 
         actor = ap_actor.Actor(actor_url)
-        if not actor.load():
+        if not (yield from actor.load()):
             raise utils.EventError("Failed to load user")
 
-        items = actor.outbox.load()
+        items = yield from actor.outbox.load()
         nonreply = [actor.followers]
         first_item = None
         for item in items:
@@ -13,7 +13,7 @@ class Actor(object):
         self.followers = None
 
     def load(self):
-        response = ap_utils.activity_request(self.url)
+        response = yield ap_utils.activity_request(self.url)
         if response.code == 200:
             response = response.json()
             self.username = response["preferredUsername"]
@@ -29,7 +29,7 @@ class Outbox(object):
         self._url = url
 
     def load(self):
-        outbox = ap_utils.activity_request(self._url).json()
+        outbox = (yield ap_utils.activity_request(self._url)).json()
 
         items = None
         if "first" in outbox:
@@ -38,7 +38,8 @@ class Outbox(object):
                 items = outbox["first"]["orderedItems"]
             else:
                 # mastodon
-                first = ap_utils.activity_request(outbox["first"]).json()
+                first = (yield ap_utils.activity_request(outbox["first"])
+                    ).json()
                 items = first["orderedItems"]
         else:
             items = outbox["orderedItems"]
@@ -60,6 +61,7 @@ class Inbox(object):
 
         headers.append(["signature", signature])
 
-        return ap_utils.activity_request(self._url, activity.format(sender),
-            method="POST", headers=dict(headers)).json()
+        return utils.http.request(ap_utils.activity_request(self._url,
+            activity.format(sender), method="POST", headers=dict(headers))
+            ).json()
 
@@ -79,7 +79,7 @@ class Server(object):
 
         for actor_url in self._get_actors():
             actor = ap_actor.Actor(actor_url)
-            actor.load()
+            yield from actor.load()
             actor.inbox.send(activity, private_key)
 
     def _ap_url(self, url_for, fragment, arg):
@@ -209,6 +209,18 @@ class Server(object):
         filename = self.bot.config["tls-key"]
         return ap_security.PrivateKey(filename, id)
 
+    def _follow_back(self, url_for, follower, data):
+        actor = ap_actor.Actor(follower)
+        yield from actor.load()
+        accept = ap_activities.Accept(self._ap_uuid_url(url_for), data)
+        self._request_queue.put([actor, accept])
+
+        follow = ap_activities.Follow(self._ap_uuid_url(url_for), actor.url)
+        self._request_queue.put([actor, follow])
+    def _followed_back(self, error):
+        if not error is None:
+            self.bot.log.error("failed to follow back", exc_info=error)
+
     def ap_inbox(self, event):
         data = json.loads(event["data"])
         self_id = self._ap_self_url(event["url_for"])
@@ -220,14 +232,8 @@ class Server(object):
                 if not new_follower in followers:
                     followers.add(new_follower)
 
-                    actor = ap_actor.Actor(new_follower)
-                    actor.load()
-                    accept = ap_activities.Accept(
-                        self._ap_uuid_url(event["url_for"]), data)
-                    self._request_queue.put([actor, accept])
-
-                    follow = ap_activities.Follow(
-                        self._ap_uuid_url(event["url_for"]), actor.url)
-                    self._request_queue.put([actor, follow])
+                    utils.http.run_generator(self._follow_back(
+                        event["url_for"], new_follower, data),
+                        self._followed_back, self.bot.trigger)
             else:
                 event["response"].code = 404
@@ -27,10 +27,9 @@ def activity_request(url, data=None, method="GET", type=ACTIVITY_TYPE,
     else:
         headers = {"Accept": type}
 
-    request = utils.http.Request(url, headers=headers,
+    return utils.http.Request(url, headers=headers,
         content_type=content_type, post_data=data, method=method,
         json_body=True, fallback_encoding="utf8")
-    return utils.http.request(request)
 
 HOSTMETA_TEMPLATE = "https://%s/.well-known/host-meta"
 WEBFINGER_TEMPLATE = "https://%s/.well-known/webfinger?resource={uri}"
@@ -42,8 +41,8 @@ def find_actor(username, instance):
     hostmeta_url = HOSTMETA_TEMPLATE % instance
     hostmeta_request = utils.http.Request(hostmeta_url)
     try:
-        hostmeta = utils.http.request(hostmeta_request)
-    except:
+        hostmeta = yield hostmeta_request
+    except Exception:
         # failed to GET hostmeta; this is an optional step for servers that do
         # not host their webfinger at the usual URL (see WEBFINGER_TEMPLATE)
         hostmeta = None
@@ -61,7 +60,7 @@ def find_actor(username, instance):
         "acct:%s@%s" % (username, instance), 1)
 
     try:
-        webfinger = activity_request(webfinger_url, type=JRD_TYPE)
+        webfinger = yield activity_request(webfinger_url, type=JRD_TYPE)
     except Exception as e:
         raise FindActorException("Failed to get webfinger for %s: %s" %
             (instance, str(e)))
@@ -132,11 +131,11 @@ def parse_note(actor, note, type="Create"):
     if type == "Announce":
         retoot_url = note
         retoot_instance = urllib.parse.urlparse(retoot_url).hostname
-        retoot = activity_request(retoot_url).json()
+        retoot = (yield activity_request(retoot_url)).json()
         retoot_url = retoot.get("url", retoot["id"])
 
         original_tooter = ap_actor.Actor(retoot["attributedTo"])
-        original_tooter.load()
+        yield from original_tooter.load()
         retooted_user = "@%s@%s" % (original_tooter.username, retoot_instance)
         retoot_content = _content(retoot)
 
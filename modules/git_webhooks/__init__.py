@@ -3,8 +3,8 @@
 #--depends-on commands
 #--depends-on shorturl
 
-import itertools, json, re, urllib.parse
-from src import ModuleManager, utils
+import inspect, itertools, json, re, urllib.parse
+from src import IRCLine, ModuleManager, utils
 from . import colors, gitea, github, gitlab
 
 FORM_ENCODED = "application/x-www-form-urlencoded"
@@ -123,7 +123,16 @@ class Module(ModuleManager.BaseModule):
             else:
                 return {"state": "success", "deliveries": 0}
 
-        outputs = handler.webhook(full_name, current_events[0], data, headers)
+        utils.http.run_generator(self._deliver(webhook_name, handler,
+            full_name, organisation, repo_name, current_events[0], data,
+            headers, targets), self._delivered, self.bot.trigger)
+        return {"state": "success", "deliveries": len(targets)}
+
+    def _deliver(self, webhook_name, handler, full_name, organisation,
+            repo_name, current_event, data, headers, targets):
+        outputs = handler.webhook(full_name, current_event, data, headers)
+        if inspect.isgenerator(outputs):
+            outputs = yield from outputs
 
         if outputs:
             for server, channel in targets:
@@ -138,8 +147,8 @@ class Module(ModuleManager.BaseModule):
 
                     if url:
                         if channel.get_setting("git-shorten-urls", False):
-                            url = self.exports.get("shorturl")(server, url,
-                                context=channel) or url
+                            url = (yield from self.exports.get("shorturl")(
+                                server, url, context=channel)) or url
                         output = "%s - %s" % (output, url)
 
                     if channel.get_setting("git-prevent-highlight", False):
@@ -149,9 +158,10 @@ class Module(ModuleManager.BaseModule):
                     hide_prefix = channel.get_setting("git-hide-prefix", False)
                     self.events.on("send.stdout").call(target=channel,
                         module_name=webhook_name, server=server, message=output,
-                        hide_prefix=hide_prefix)
-
-        return {"state": "success", "deliveries": len(targets)}
+                        hide_prefix=hide_prefix, priority=IRCLine.PRIORITY_BULK)
+    def _delivered(self, error):
+        if not error is None:
+            self.log.error("Failed to deliver webhook", exc_info=error)
 
     def _prevent_highlight(self, server, channel, s):
         for user in channel.users:
@@ -140,29 +140,29 @@ class GitHub(object):
     def webhook(self, full_name, event, data, headers):
         out = []
         if event == "push":
-            out = self.push(full_name, data)
+            out = yield from self.push(full_name, data)
         elif event == "commit_comment":
-            out = self.commit_comment(full_name, data)
+            out = yield from self.commit_comment(full_name, data)
         elif event == "pull_request":
-            out = self.pull_request(full_name, data)
+            out = yield from self.pull_request(full_name, data)
         elif event == "pull_request_review":
-            out = self.pull_request_review(full_name, data)
+            out = yield from self.pull_request_review(full_name, data)
         elif event == "pull_request_review_comment":
-            out = self.pull_request_review_comment(full_name, data)
+            out = yield from self.pull_request_review_comment(full_name, data)
         elif event == "issue_comment":
-            out = self.issue_comment(full_name, data)
+            out = yield from self.issue_comment(full_name, data)
         elif event == "issues":
-            out = self.issues(full_name, data)
+            out = yield from self.issues(full_name, data)
         elif event == "create":
-            out = self.create(full_name, data)
+            out = yield from self.create(full_name, data)
         elif event == "delete":
             out = self.delete(full_name, data)
         elif event == "release":
-            out = self.release(full_name, data)
+            out = yield from self.release(full_name, data)
         elif event == "check_run":
-            out = self.check_run(data)
+            out = yield from self.check_run(data)
         elif event == "fork":
-            out = self.fork(full_name, data)
+            out = yield from self.fork(full_name, data)
         elif event == "ping":
             out = self.ping(data)
         elif event == "membership":
@@ -174,7 +174,7 @@ class GitHub(object):
     def _short_url(self, url):
         self.log.debug("git.io shortening: %s" % url)
         try:
-            page = utils.http.request("https://git.io", method="POST",
+            page = yield utils.http.Request("https://git.io", method="POST",
                 post_data={"url": url})
             return page.headers["Location"]
         except utils.http.HTTPTimeoutException:
@@ -217,8 +217,8 @@ class GitHub(object):
 
         single_url = COMMIT_URL % (full_name, "%s")
 
-        return self._format_push(branch, author, data["commits"],
-            data["forced"], single_url, range_url)
+        return (yield from self._format_push(branch, author, data["commits"],
+            data["forced"], single_url, range_url))
 
     def _format_push(self, branch, author, commits, forced, single_url,
             range_url):
@@ -236,15 +236,15 @@ class GitHub(object):
                 hash = commit["id"]
                 hash_colored = utils.irc.color(self._short_hash(hash), colors.COLOR_ID)
                 message = commit["message"].split("\n")[0].strip()
-                url = self._short_url(single_url % hash)
+                url = yield from self._short_url(single_url % hash)
 
                 outputs.append(
                     "%s %spushed %s to %s: %s - %s"
                     % (author, forced_str, hash_colored, branch, message, url))
         else:
+            url = yield from self._short_url(range_url)
             outputs.append("%s %spushed %d commits to %s - %s"
-                % (author, forced_str, len(commits), branch,
-                self._short_url(range_url)))
+                % (author, forced_str, len(commits), branch, url))
 
         return outputs
 
@@ -262,7 +262,7 @@ class GitHub(object):
         action = data["action"]
         commit = self._short_hash(data["comment"]["commit_id"])
         commenter = utils.irc.bold(data["comment"]["user"]["login"])
-        url = self._short_url(data["comment"]["html_url"])
+        url = yield from self._short_url(data["comment"]["html_url"])
         return ["[commit/%s] %s %s a comment - %s" % (commit, commenter,
             action, url)]
 
@@ -298,7 +298,7 @@ class GitHub(object):
             action_desc = "committed to %s" % identifier
 
             commits_url = data["pull_request"]["commits_url"]
-            commits = utils.http.request(commits_url).json()
+            commits = (yield utils.http.Request(commits_url)).json()
             if commits:
                 seen_before = False
                 new_commits = []
@@ -315,8 +315,8 @@ class GitHub(object):
                 if new_commits:
                     pr_identifier = "%s (%s)" % (
                         number, data["pull_request"]["title"])
-                    outputs = self._format_push(pr_identifier, author,
-                        new_commits, False, single_url, range_url)
+                    outputs = yield from self._format_push(pr_identifier,
+                        author, new_commits, False, single_url, range_url)
 
                     for i, output in enumerate(outputs):
                         outputs[i] = "[PR] %s" % output
@@ -328,7 +328,7 @@ class GitHub(object):
             action_desc = "renamed %s" % identifier
 
         pr_title = data["pull_request"]["title"]
-        url = self._short_url(data["pull_request"]["html_url"])
+        url = yield from self._short_url(data["pull_request"]["html_url"])
         return ["[PR] %s %s: %s - %s" % (
             sender, action_desc, pr_title, url)]
 
@@ -348,7 +348,7 @@ class GitHub(object):
         action = data["action"]
         pr_title = data["pull_request"]["title"]
         reviewer = utils.irc.bold(data["sender"]["login"])
-        url = self._short_url(data["review"]["html_url"])
+        url = yield from self._short_url(data["review"]["html_url"])
 
         state_desc = state
         if state == "approved":
@@ -367,7 +367,7 @@ class GitHub(object):
         action = data["action"]
         pr_title = data["pull_request"]["title"]
         sender = utils.irc.bold(data["sender"]["login"])
-        url = self._short_url(data["comment"]["html_url"])
+        url = yield from self._short_url(data["comment"]["html_url"])
         return ["[PR] %s %s on a review on %s: %s - %s" %
             (sender, COMMENT_ACTIONS[action], number, pr_title, url)]
 
@@ -383,7 +383,7 @@ class GitHub(object):
 
         issue_title = data["issue"]["title"]
         author = utils.irc.bold(data["sender"]["login"])
-        url = self._short_url(data["issue"]["html_url"])
+        url = yield from self._short_url(data["issue"]["html_url"])
         return ["[issue] %s %s: %s - %s" %
             (author, action_str, issue_title, url)]
     def issue_comment(self, full_name, data):
@@ -398,7 +398,7 @@ class GitHub(object):
         type = "PR" if "pull_request" in data["issue"] else "issue"
         title = data["issue"]["title"]
         commenter = utils.irc.bold(data["sender"]["login"])
-        url = self._short_url(data["comment"]["html_url"])
+        url = yield from self._short_url(data["comment"]["html_url"])
 
         body = ""
         if not action == "deleted":
@@ -413,7 +413,7 @@ class GitHub(object):
         ref_color = utils.irc.color(ref, colors.COLOR_BRANCH)
         type = data["ref_type"]
         sender = utils.irc.bold(data["sender"]["login"])
-        url = self._short_url(CREATE_URL % (full_name, ref))
+        url = yield from self._short_url(CREATE_URL % (full_name, ref))
         return ["%s created a %s: %s - %s" % (sender, type, ref_color, url)]
 
     def delete(self, full_name, data):
@@ -430,7 +430,7 @@ class GitHub(object):
         if name:
             name = ": %s" % name
         author = utils.irc.bold(data["release"]["author"]["login"])
-        url = self._short_url(data["release"]["html_url"])
+        url = yield from self._short_url(data["release"]["html_url"])
         return ["%s %s a release%s - %s" % (author, action, name, url)]
 
     def check_run(self, data):
@@ -441,7 +441,8 @@ class GitHub(object):
         url = ""
         if data["check_run"]["details_url"]:
             url = data["check_run"]["details_url"]
-            url = " - %s" % self.exports.get("shorturl-any")(url)
+            url = yield from self.exports.get("shorturl-any")(url)
+            url = " - %s" % url
 
         duration = ""
         if data["check_run"]["completed_at"]:
@@ -476,7 +477,7 @@ class GitHub(object):
         forker = utils.irc.bold(data["sender"]["login"])
         fork_full_name = utils.irc.color(data["forkee"]["full_name"],
             utils.consts.LIGHTBLUE)
-        url = self._short_url(data["forkee"]["html_url"])
+        url = yield from self._short_url(data["forkee"]["html_url"])
         return ["%s forked into %s - %s" %
             (forker, fork_full_name, url)]
 
@@ -48,7 +48,7 @@ class Module(ModuleManager.BaseModule):
 
     def _short_url(self, url):
         try:
-            page = utils.http.request("https://git.io", method="POST",
+            page = yield utils.http.Request("https://git.io", method="POST",
                 post_data={"url": url})
             return page.headers["Location"]
         except utils.http.HTTPTimeoutException:
@@ -71,27 +71,29 @@ class Module(ModuleManager.BaseModule):
         if not oauth2_token == None:
             headers["Authorization"] = "token %s" % oauth2_token
         request = utils.http.Request(url, headers=headers)
-        return utils.http.request(request)
+        return (yield request)
 
     def _commit(self, username, repository, commit):
-        page = self._get(API_COMMIT_URL % (username, repository, commit))
+        page = yield from self._get(
+            API_COMMIT_URL % (username, repository, commit))
         if page and page.code == 200:
             page = page.json()
             repo = utils.irc.color("%s/%s" % (username, repository), COLOR_REPO)
             sha = utils.irc.color(page["sha"][:8], COLOR_ID)
+            url = yield from self._short_url(page["html_url"])
             return "(%s@%s) %s - %s %s" % (repo, sha,
-                page["author"]["login"], page["commit"]["message"],
-                self._short_url(page["html_url"]))
+                page["author"]["login"], page["commit"]["message"], url)
     def _parse_commit(self, target, ref):
         username, repository, commit = self._parse_ref(target, ref, "@")
-        return self._commit(username, repository, commit)
+        return (yield from self._commit(username, repository, commit))
 
     @utils.hook("received.command.ghcommit")
     @utils.kwarg("min_args", 1)
     @utils.kwarg("help", "Get information for a given commit on github")
     @utils.kwarg("usage", "<organsation>/<repo>@<commit>")
     def github_commit(self, event):
-        out = self._parse_commit(event["target"], event["args_split"][0])
+        out = yield from self._parse_commit(event["target"],
+            event["args_split"][0])
         if not out == None:
             event["stdout"].write(out)
         else:
@@ -107,7 +109,7 @@ class Module(ModuleManager.BaseModule):
             ref = event["match"].group(0)
             if self._auto_github_cooldown(event["target"], ref):
                 try:
-                    out = self._parse_commit(event["target"], ref)
+                    out = yield from self._parse_commit(event["target"], ref)
                 except utils.EventError:
                     return
 
@@ -122,7 +124,7 @@ class Module(ModuleManager.BaseModule):
         if labels:
             labels_str = "[%s] " % ", ".join(labels)
 
-        url = self._short_url(page["html_url"])
+        url = yield from self._short_url(page["html_url"])
 
         state = page["state"]
         if state == "open":
@@ -133,7 +135,8 @@ class Module(ModuleManager.BaseModule):
         return "(%s issue%s, %s) %s %s%s" % (
             repo, number, state, page["title"], labels_str, url)
     def _get_issue(self, username, repository, number):
-        return self._get(API_ISSUE_URL % (username, repository, number))
+        return (yield from self._get(
+            API_ISSUE_URL % (username, repository, number)))
 
     @utils.hook("received.command.ghissue", min_args=1)
     def github_issue(self, event):
@@ -146,9 +149,10 @@ class Module(ModuleManager.BaseModule):
         if not number.isdigit():
             raise utils.EventError("Issue number must be a number")
 
-        page = self._get_issue(username, repository, number)
+        page = yield from self._get_issue(username, repository, number)
         if page and page.code == 200:
-            self._parse_issue(page.json(), username, repository, number)
+            yield from self._parse_issue(page.json(), username, repository,
+                number)
         else:
             event["stderr"].write("Could not find issue")
 
@@ -159,7 +163,7 @@ class Module(ModuleManager.BaseModule):
         branch_to = page["base"]["label"]
         added = self._added(page["additions"])
         removed = self._removed(page["deletions"])
-        url = self._short_url(page["html_url"])
+        url = yield from self._short_url(page["html_url"])
 
         state = page["state"]
         if page["merged"]:
@@ -173,7 +177,8 @@ class Module(ModuleManager.BaseModule):
             repo, number, state, branch_from, branch_to, added, removed,
             page["title"], url)
     def _get_pull(self, username, repository, number):
-        return self._get(API_PULL_URL % (username, repository, number))
+        return (yield from self._get(
+            API_PULL_URL % (username, repository, number)))
     @utils.hook("received.command.ghpull", min_args=1)
     def github_pull(self, event):
         if event["target"].get_setting("github-hide-prefix", False):
@@ -185,10 +190,11 @@ class Module(ModuleManager.BaseModule):
         if not number.isdigit():
             raise utils.EventError("PR number must be a number")
 
-        page = self._get_pull(username, repository, number)
+        page = yield from self._get_pull(username, repository, number)
 
         if page and page.code == 200:
-            self._parse_pull(page.json(), username, repository, number)
+            yield from self._parse_pull(page.json(), username, repository,
+                number)
         else:
             event["stderr"].write("Could not find pull request")
 
@@ -197,15 +203,16 @@ class Module(ModuleManager.BaseModule):
         if not number.isdigit():
             raise utils.EventError("PR number must be a number")
 
-        page = self._get_issue(username, repository, number)
+        page = yield from self._get_issue(username, repository, number)
         if page and page.code == 200:
             page = page.json()
             if "pull_request" in page:
-                pull = self._get_pull(username, repository, number)
-                return self._parse_pull(pull.json(), username, repository,
-                    number)
+                pull = yield from self._get_pull(username, repository, number)
+                return (yield from self._parse_pull(pull.json(), username,
+                    repository, number))
             else:
-                return self._parse_issue(page, username, repository, number)
+                return (yield from self._parse_issue(page, username,
+                    repository, number))
         else:
             return None
 
@@ -215,7 +222,8 @@ class Module(ModuleManager.BaseModule):
         if event["target"].get_setting("github-hide-prefix", False):
             event["stdout"].prefix = None
             event["stderr"].prefix = None
-        result = self._get_info(event["target"], event["args_split"][0])
+        result = yield from self._get_info(event["target"],
+            event["args_split"][0])
         if not result == None:
             event["stdout"].write(result)
         else:
@@ -227,8 +235,8 @@ class Module(ModuleManager.BaseModule):
         cooldown = channel.get_setting("auto-github-cooldown", None)
         if not cooldown == None:
             cache = self._cache_ref(ref)
-            if not self.bot.cache.has_item(cache):
-                self.bot.cache.temporary_cache(cache, True, cooldown)
+            if not self.cache.has_item(cache):
+                self.cache.temporary_cache(cache, True, cooldown)
                 return True
             else:
                 return False
@@ -246,7 +254,7 @@ class Module(ModuleManager.BaseModule):
                 event["match"].group(2), event["match"].group(4))
             if self._auto_github_cooldown(event["target"], ref):
                 try:
-                    result = self._get_info(event["target"], ref)
+                    result = yield from self._get_info(event["target"], ref)
                 except utils.EventError:
                     return
                 if result:
@@ -264,7 +272,7 @@ class Module(ModuleManager.BaseModule):
             ref = event["match"].group(0)
             if self._auto_github_cooldown(event["target"], ref):
                 try:
-                    result = self._get_info(event["target"],
+                    result = yield from self._get_info(event["target"],
                         event["match"].group(0))
                 except utils.EventError:
                     return
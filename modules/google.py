@@ -26,11 +26,11 @@ class Module(ModuleManager.BaseModule):
                 True)
             safe = "active" if safe_setting else "off"
 
-            page = utils.http.request(URL_GOOGLESEARCH, get_params={
+            page = (yield utils.http.Request(URL_GOOGLESEARCH, get_params={
                 "q": phrase, "prettyPrint": "true", "num": 1, "gl": "gb",
                 "key": self.bot.config["google-api-key"],
                 "cx": self.bot.config["google-search-id"],
-                "safe": safe}).json()
+                "safe": safe})).json()
             if page:
                 if "items" in page and len(page["items"]):
                     item = page["items"][0]
@@ -54,9 +54,9 @@ class Module(ModuleManager.BaseModule):
         """
         phrase = event["args"] or event["target"].buffer.get()
         if phrase:
-            page = utils.http.request(URL_GOOGLESUGGEST, get_params={
+            page = (yield utils.http.Request(URL_GOOGLESUGGEST, get_params={
                 "output": "json", "client": "hp", "gl": "gb", "q": phrase}
-                ).json()
+                )).json()
             if page:
                 # google gives us jsonp, so we need to unwrap it.
                 page = page.split("(", 1)[1][:-1]
@@ -10,8 +10,10 @@ class Module(ModuleManager.BaseModule):
     @utils.kwarg("schedule", "*/10")
     def ten_minutes(self, event):
         url = self.bot.config["healthcheck-url"]
-        try:
-            utils.http.request(url)
-        except Exception as e:
+        utils.http.request_async(utils.http.Request(url),
+            lambda response, error: self._called(url, error),
+            self.bot.trigger)
+    def _called(self, url, error):
+        if not error is None:
             self.log.error("Failed to call healthcheck-url (%s)", [url],
-                exc_info=True)
+                exc_info=error)
@@ -16,9 +16,9 @@ class Module(ModuleManager.BaseModule):
         :help: Search for a given title on IMDb
         :usage: <movie/tv title>
         """
-        page = utils.http.request(URL_OMDB, get_params={
+        page = (yield utils.http.Request(URL_OMDB, get_params={
             "apikey": self.bot.config["omdbapi-api-key"],
-            "t": event["args"]}).json()
+            "t": event["args"]})).json()
         if page:
             if "Title" in page:
                 event["stdout"].write("%s, %s (%s) %s (%s/10.0) %s" % (
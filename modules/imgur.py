@@ -33,8 +33,9 @@ class Module(ModuleManager.BaseModule):
     @utils.kwarg("pattern", REGEX_IMAGE)
     def _regex_image(self, event):
         if event["target"].get_setting("auto-imgur", False):
-            event["stdout"].write(self._parse_image(event["match"].group(1)))
             event.eat()
+            event["stdout"].write((yield from self._parse_image(
+                event["match"].group(1))))
 
     @utils.hook("command.regex")
     @utils.kwarg("ignore_action", False)
@@ -42,13 +43,14 @@ class Module(ModuleManager.BaseModule):
     @utils.kwarg("pattern", REGEX_GALLERY)
     def _regex_gallery(self, event):
         if event["target"].get_setting("auto-imgur", False):
-            event["stdout"].write(self._parse_gallery(event["match"].group(1)))
             event.eat()
+            event["stdout"].write((yield from self._parse_gallery(
+                event["match"].group(1))))
 
     def _parse_gallery(self, hash):
         api_key = self.bot.config["imgur-api-key"]
-        result = utils.http.request(URL_GALLERY % hash,
-            headers={"Authorization": "Client-ID %s" % api_key}).json()
+        result = (yield utils.http.Request(URL_GALLERY % hash,
+            headers={"Authorization": "Client-ID %s" % api_key})).json()
 
         if result and result["success"]:
             data = result["data"]
@@ -73,8 +75,8 @@ class Module(ModuleManager.BaseModule):
 
     def _parse_image(self, hash):
         api_key = self.bot.config["imgur-api-key"]
-        result = utils.http.request(URL_IMAGE % hash,
-            headers={"Authorization": "Client-ID %s" % api_key}).json()
+        result = (yield utils.http.Request(URL_IMAGE % hash,
+            headers={"Authorization": "Client-ID %s" % api_key})).json()
 
         if result and result["success"]:
             data = result["data"]
@@ -99,8 +101,8 @@ class Module(ModuleManager.BaseModule):
 
     def _image_info(self, hash):
         api_key = self.bot.config["imgur-api-key"]
-        result = utils.http.request(URL_IMAGE % hash,
-            headers={"Authorization": "Client-ID %s" % api_key}).json()
+        result = (yield utils.http.Request(URL_IMAGE % hash,
+            headers={"Authorization": "Client-ID %s" % api_key})).json()
 
         if result and result["success"]:
             data = result["data"]
@@ -116,8 +118,8 @@ class Module(ModuleManager.BaseModule):
 
     def _gallery_info(self, hash):
         api_key = self.bot.config["imgur-api-key"]
-        result = utils.http.request(URL_GALLERY % hash,
-            headers={"Authorization": "Client-ID %s" % api_key}).json()
+        result = (yield utils.http.Request(URL_GALLERY % hash,
+            headers={"Authorization": "Client-ID %s" % api_key})).json()
 
         if result and result["success"]:
             data = result["data"]
@@ -140,11 +142,12 @@ class Module(ModuleManager.BaseModule):
 
         result = None
         if image_match:
-            result = self._image_info(image_match.group(1))
+            result = yield from self._image_info(image_match.group(1))
         else:
             gallery_match = REGEX_GALLERY.match(event["args_split"][0])
             if gallery_match:
-                result = self._gallery_info(gallery_match.group(1))
+                result = yield from self._gallery_info(
+                    gallery_match.group(1))
 
         if result:
             event["stdout"].write(result)
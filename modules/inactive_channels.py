@@ -37,16 +37,15 @@ class Module(ModuleManager.BaseModule):
     def hourly(self, event):
         parts = []
         now = utils.datetime.utcnow()
-        botwide_days = self.bot.get_setting(SETTING_NAME, None)
-        botwide_mode_setting = self.bot.get_setting(MODE_SETTING_NAME, False)
 
         for server in self.bot.servers.values():
-            serverwide_days = server.get_setting(SETTING_NAME, botwide_days)
+            serverwide_days = self.bot.resolve_setting(SETTING_NAME,
+                server=server)
             if serverwide_days == None:
                 continue
 
-            mode_setting = server.get_setting(
-                MODE_SETTING_NAME, botwide_mode_setting)
+            mode_setting = self.bot.resolve_setting(MODE_SETTING_NAME,
+                server=server, default=False)
             our_user = server.get_user(server.nickname)
 
             for channel in server.channels:
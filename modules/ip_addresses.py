@@ -31,8 +31,8 @@ class Module(ModuleManager.BaseModule):
         args = event["args_split"][:]
         nameserver = None
         if self.bot.get_setting("configurable-nameservers", True):
-            nameserver = event["target"].get_setting("dns-nameserver",
-                event["server"].get_setting("dns-nameserver", None))
+            nameserver = self.bot.resolve_setting("dns-nameserver",
+                channel=event["target"], server=event["server"], bot=False)
             for i, arg in enumerate(args):
                 if arg[0] == "@":
                     nameserver = args.pop(i)[1:]
@@ -85,7 +85,8 @@ class Module(ModuleManager.BaseModule):
         :usage: <IP>
         :prefix: GeoIP
         """
-        page = utils.http.request(URL_GEOIP % event["args_split"][0]).json()
+        page = (yield utils.http.Request(
+            URL_GEOIP % event["args_split"][0])).json()
         if page:
             if page["status"] == "success":
                 data  = page["query"]
@@ -6,22 +6,37 @@ TAG = utils.irc.MessageTag(None, "draft/multiline-concat")
 
 @utils.export("cap", CAP)
 class Module(ModuleManager.BaseModule):
+    @utils.hook("received.cap.ack")
+    def on_cap_ack(self, event):
+        cap_name = CAP.available(event["capabilities"].keys())
+        if cap_name and event["server"].has_capability(CAP):
+            args = utils.parse.keyvalue(
+                event["server"].server_capabilities.get(cap_name) or "", ",")
+            max_bytes = args.get("max-bytes", None) or ""
+            max_lines = args.get("max-lines", None) or "0"
+            if max_bytes.isdigit() and max_lines.isdigit():
+                # messages to the same target in one go now get sent as
+                # multiline batches (see IRCServer.flush_coalesced)
+                event["server"].multiline_limits = (int(max_bytes),
+                    int(max_lines))
+
+    @utils.hook("received.cap.del")
+    def on_cap_del(self, event):
+        if CAP.available(event["capabilities"].keys()):
+            event["server"].multiline_limits = None
+
     @utils.hook("preprocess.send.privmsg")
     def preprocess_send_privmsg(self, event):
         if len(event["line"].args) > 1:
             if ("\n" in event["line"].args[1] and
-                    event["server"].has_capability(CAP)):
+                    event["server"].multiline_limits):
                 event["line"].invalidate()
 
                 target = event["line"].args[0]
-                lines = event["line"].args[1].split("\n")
-                batch = IRCLine.IRCSendBatch("draft/multiline",
-                    [target])
-                for line in lines:
-                    line = IRCLine.ParsedLine("PRIVMSG", [target, line])
-                    batch.add_line(line)
-                for line in batch.get_lines():
-                    event["server"].send(line)
+                tags = event["line"].tags
+                for line in event["line"].args[1].split("\n"):
+                    event["server"].send(IRCLine.ParsedLine("PRIVMSG",
+                        [target, line], tags=tags.copy()))
 
     @utils.hook("received.batch.end")
     def batch_end(self, event):
@@ -21,7 +21,7 @@ class Module(ModuleManager.BaseModule):
 
         response = None
         try:
-            response = utils.http.request(url)
+            response = yield utils.http.Request(url)
         except:
             raise utils.EventError("%s looks down to me" % url)
 
@@ -15,11 +15,11 @@ delay_setting = utils.IntSetting("kick-rejoin-delay",
 @utils.export("channelset", delay_setting)
 class Module(ModuleManager.BaseModule):
     def _should_rejoin(self, server, channel):
-        return channel.get_setting("kick-rejoin",
-            server.get_setting("kick-rejoin", False))
+        return self.bot.resolve_setting("kick-rejoin", channel=channel,
+            server=server, default=False, bot=False)
     def _get_delay(self, server, channel):
-        return channel.get_setting("kick-rejoin-delay",
-            server.get_setting("kick-rejoin-delay", DELAY))
+        return self.bot.resolve_setting("kick-rejoin-delay", channel=channel,
+            server=server, default=DELAY, bot=False)
 
     @utils.hook("self.kick")
     def on_kick(self, event):
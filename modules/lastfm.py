@@ -42,10 +42,10 @@ class Module(ModuleManager.BaseModule):
             lastfm_username = user.get_setting("lastfm", user.nickname)
             shown_username = user.nickname
 
-        page = utils.http.request(URL_SCROBBLER, get_params={
+        page = (yield utils.http.Request(URL_SCROBBLER, get_params={
             "method": "user.getrecenttracks", "user": lastfm_username,
             "api_key": self.bot.config["lastfm-api-key"],
-            "format": "json", "limit": "1"}).json()
+            "format": "json", "limit": "1"})).json()
         if page:
             if "recenttracks" in page and len(page["recenttracks"]["track"]):
                 now_playing = page["recenttracks"]["track"]
@@ -65,18 +65,18 @@ class Module(ModuleManager.BaseModule):
                 time_language = "is listening to" if np else "last listened to"
 
                 yt_url_str = ""
-                if event["server"].get_setting("lastfm-youtube",
-                        self.bot.get_setting("lastfm-youtube", False)):
-                    yt_url = self.exports.get("search-youtube")(
+                if self.bot.resolve_setting("lastfm-youtube",
+                        server=event["server"], default=False):
+                    yt_url = yield from self.exports.get("search-youtube")(
                         "%s - %s" % (artist, track_name))
                     if yt_url:
                         yt_url_str = " - %s" % yt_url
 
-                info_page = utils.http.request(URL_SCROBBLER, get_params={
-                    "method": "track.getInfo", "artist": artist,
+                info_page = (yield utils.http.Request(URL_SCROBBLER,
+                    get_params={"method": "track.getInfo", "artist": artist,
                     "track": track_name, "autocorrect": "1",
                     "api_key": self.bot.config["lastfm-api-key"],
-                    "user": lastfm_username, "format": "json"}).json()
+                    "user": lastfm_username, "format": "json"})).json()
 
                 track = info_page.get("track", {})
 
@@ -14,8 +14,8 @@ class Module(ModuleManager.BaseModule):
 
     @utils.export("get-location")
     def _get_location(self,  s):
-        page = utils.http.request(URL_OPENCAGE, get_params={"limit": "1",
-            "q": s, "key": self.bot.config["opencagedata-api-key"]}).json()
+        page = (yield utils.http.Request(URL_OPENCAGE, get_params={"limit": "1",
+            "q": s, "key": self.bot.config["opencagedata-api-key"]})).json()
         if page and page["results"]:
             result = page["results"][0]
             timezone = result["annotations"]["timezone"]["name"]
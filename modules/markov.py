@@ -47,7 +47,7 @@ class Module(ModuleManager.BaseModule):
         if not self._load_thread == None:
             raise utils.EventError("Log loading already in progress")
 
-        page = utils.http.request(event["args_split"][0])
+        page = yield utils.http.Request(event["args_split"][0])
         if page.code == 200:
             event["stdout"].write("Importing...")
             self._load_thread = threading.Thread(target=self._load_loop,
@@ -25,8 +25,8 @@ class Module(ModuleManager.BaseModule):
     def mumble(self, event):
         server = None
         if not event["args"]:
-            server = event["target"].get_setting("mumble-server",
-                event["server"].get_setting("mumble-server", None))
+            server = self.bot.resolve_setting("mumble-server",
+                channel=event["target"], server=event["server"], bot=False)
         elif event["args"]:
             server = event["args_split"][0]
         if not server:
@@ -1,7 +1,7 @@
 #--depends-on config
 
 import base64
-from src import EventManager, ModuleManager, utils
+from src import EventManager, IRCLine, ModuleManager, utils
 
 @utils.export("serverset", utils.SensitiveSetting("nickserv-password",
     "Set the nickserv password for this server", example="hunter2"))
@@ -11,4 +11,5 @@ class Module(ModuleManager.BaseModule):
         nickserv_password = event["server"].get_setting("nickserv-password")
         if nickserv_password:
             event["server"].send_message("nickserv",
-                "identify %s" % nickserv_password)
+                "identify %s" % nickserv_password,
+                priority=IRCLine.PRIORITY_URGENT)
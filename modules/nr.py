@@ -117,6 +117,7 @@ class Module(ModuleManager.BaseModule):
     def reduced_activities(self, string): return [a for a in self.activities(string) if a in self.PASSENGER_ACTIVITIES]
 
     @utils.hook("received.command.nrtrains", min_args=1)
+    @utils.kwarg("threaded", True)
     def trains(self, event):
         """
         :help: Get train/bus services for a station (Powered by NRE)
@@ -290,6 +291,7 @@ class Module(ModuleManager.BaseModule):
             event["stdout"].write("%s%s: %s" % (station_summary, " departures calling at %s" % filter["inter"] if filter["inter"] else '', trains_string))
 
     @utils.hook("received.command.nrservice", min_args=1)
+    @utils.kwarg("threaded", True)
     def service(self, event):
         """
         :help: Get train service information for a UID, headcode or RID
@@ -478,6 +480,7 @@ class Module(ModuleManager.BaseModule):
                 ", ".join([s["summary"] for s in stations_filtered])))
 
     @utils.hook("received.command.nrhead", min_args=1)
+    @utils.kwarg("threaded", True)
     def head(self, event):
         """
         :help: Get information for a given headcode/UID/RID (Powered by NRE)
@@ -500,6 +503,7 @@ class Module(ModuleManager.BaseModule):
             event["stdout"].write(", ".join(["h/%s r/%s u/%s rs/%s %s (%s) -> %s (%s)" % (a["trainid"], a["rid"], a["uid"], a["rsid"], a["originName"], a["originCrs"], a["destinationName"], a["destinationCrs"]) for a in services]))
 
     @utils.hook("received.command.nrcode", min_args=1)
+    @utils.kwarg("threaded", True)
     def service_code(self, event):
         """
         :help: Get the text for a given delay/cancellation code (Powered by NRE)
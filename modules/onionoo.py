@@ -10,8 +10,8 @@ URL_RELAY_SEARCH_SEARCH = "https://metrics.torproject.org/rs.html#search/"
 URL_RELAY_SEARCH_DETAILS = "https://metrics.torproject.org/rs.html#details/"
 
 def _get_relays_details(search):
-    page = utils.http.request(
-        URL_ONIONOO_DETAILS, get_params={"search": search}).json()
+    page = (yield utils.http.Request(
+        URL_ONIONOO_DETAILS, get_params={"search": search})).json()
     if page and "relays" in page:
         return page["relays"]
     raise utils.EventResultsError()
@@ -44,7 +44,7 @@ class Module(ModuleManager.BaseModule):
             event.eat()
             search = event["match"].group(0)
             try:
-                relays = _get_relays_details(search)
+                relays = yield from _get_relays_details(search)
                 event["stdout"].write(
                     _format_relay_summary_message(relays, search))
             except utils.EventError:
@@ -57,5 +57,5 @@ class Module(ModuleManager.BaseModule):
         :usage: <fingerprint|nickname>
         """
         search = event["args"]
-        relays = _get_relays_details(search)
+        relays = yield from _get_relays_details(search)
         event["stdout"].write(_format_relay_summary_message(relays, search))
@@ -2,7 +2,7 @@
 #--depends-on format_activity
 #--depends-on permissions
 
-from src import EventManager, ModuleManager, utils
+from src import EventManager, IRCLine, ModuleManager, utils
 
 @utils.export("channelset", utils.BoolSetting("relay-extras",
     "Whether or not to relay joins/parts/quits/modes/etc"))
@@ -50,7 +50,8 @@ class Module(ModuleManager.BaseModule):
 
     def _send_factory(self, server, channel_name, message):
         def _():
-            line = server.send_message(channel_name, message)
+            line = server.send_message(channel_name, message,
+                priority=IRCLine.PRIORITY_BULK)
             server._relay_ignore.append(line.parsed_line.id)
         return _
 
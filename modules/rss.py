@@ -2,7 +2,7 @@
 #--depends-on shorturl
 
 import difflib, hashlib, time
-from src import ModuleManager, utils
+from src import IRCLine, ModuleManager, utils
 import feedparser
 
 RSS_INTERVAL = 60 # 1 minute
@@ -32,8 +32,8 @@ class Module(ModuleManager.BaseModule):
         link = entry.get("link", None)
         if shorten:
             try:
-                link = self.exports.get("shorturl")(server, link)
-            except:
+                link = yield from self.exports.get("shorturl")(server, link)
+            except Exception:
                 pass
         link = " - %s" % link if link else ""
 
@@ -42,10 +42,16 @@ class Module(ModuleManager.BaseModule):
         return "%s%s%s%s" % (feed_title_str, title, author, link)
 
     def _timer(self, timer):
+        timer.redo()
+        utils.http.run_generator(self._poll(), self._polled, self.bot.trigger)
+    def _polled(self, error):
+        if not error is None:
+            self.log.error("Failed to poll RSS feeds", exc_info=error)
+
+    def _poll(self):
         start_time = time.monotonic()
         self.log.trace("Polling RSS feeds")
 
-        timer.redo()
         hook_settings = self.bot.database.channel_settings.find_by_setting(
             "rss-hooks")
         hooks = {}
@@ -54,8 +60,8 @@ class Module(ModuleManager.BaseModule):
             if server and channel_name in server.channels:
                 channel = server.channels.get(channel_name)
                 for url in urls:
-                    bindhost = channel.get_setting("rss-bindhost",
-                        server.get_setting("rss-bindhost", None))
+                    bindhost = self.bot.resolve_setting("rss-bindhost",
+                        channel=channel, server=server, bot=False)
 
                     if url.startswith("www."):
                         url = url.replace("www.", "", 1)
@@ -74,7 +80,7 @@ class Module(ModuleManager.BaseModule):
             requests.append(utils.http.Request(url, id=f"{url} {bindhost}",
                 bindhost=bindhost))
 
-        pages = utils.http.request_many(requests)
+        pages = yield requests
 
         for (url, bindhost), channels in hooks.items():
             key = f"{url} {bindhost}"
@@ -106,11 +112,12 @@ class Module(ModuleManager.BaseModule):
                     valid += 1
 
                     shorten = channel.get_setting("rss-shorten", False)
-                    output = self._format_entry(server, feed_title, entry,
-                        shorten)
+                    output = yield from self._format_entry(server, feed_title,
+                        entry, shorten)
 
                     self.events.on("send.stdout").call(target=channel,
-                        module_name="RSS", server=server, message=output)
+                        module_name="RSS", server=server, message=output,
+                        priority=IRCLine.PRIORITY_BULK)
                     seen_ids.append(entry_id_hash)
 
                 if len(seen_ids) > max_ids:
@@ -127,7 +134,7 @@ class Module(ModuleManager.BaseModule):
 
     def _get_entries(self, url, max: int=None):
         try:
-            feed = feedparser.parse(utils.http.request(url).data)
+            feed = feedparser.parse((yield utils.http.Request(url)).data)
         except Exception as e:
             self.log.warn("failed to parse RSS %s", [url], exc_info=True)
             feed = None
@@ -164,7 +171,7 @@ class Module(ModuleManager.BaseModule):
             if url in rss_hooks:
                 raise utils.EventError("That URL is already being watched")
 
-            title, entries = self._get_entries(url)
+            title, entries = yield from self._get_entries(url)
             if entries == None:
                 raise utils.EventError("Failed to read feed")
 
@@ -198,13 +205,13 @@ class Module(ModuleManager.BaseModule):
             else:
                 url = event["args_split"][1]
 
-            title, entries = self._get_entries(url)
+            title, entries = yield from self._get_entries(url)
             if not entries:
                 raise utils.EventError("Failed to get RSS entries")
 
             shorten = event["target"].get_setting("rss-shorten", False)
-            out = self._format_entry(event["server"], title, entries[0],
-                shorten)
+            out = yield from self._format_entry(event["server"], title,
+                entries[0], shorten)
             event["stdout"].write(out)
         else:
             raise utils.EventError("Unknown subcommand '%s'" % subcommand)
@@ -34,8 +34,8 @@ class Module(ModuleManager.BaseModule):
         args = API_ARGS.copy()
         args["code"] = FN_TEMPLATE % event["args"]
         try:
-            page = utils.http.request(EVAL_URL, post_data=args,
-                method="POST", content_type="application/json").json()
+            page = (yield utils.http.Request(EVAL_URL, post_data=args,
+                method="POST", content_type="application/json")).json()
         except socket.timeout:
             raise utils.EventError("%s: eval timed out" %
                 event["user"].nickname)
@@ -51,7 +51,7 @@ class Module(ModuleManager.BaseModule):
     def crate(self, event):
         query = event["args_split"][0]
         request = utils.http.Request(API_CRATE % query)
-        response = utils.http.request(request)
+        response = yield request
         if response.code == 200:
             crate = response.json()["crate"]
             name = crate["id"]
@@ -12,8 +12,8 @@ REGEX_SED = re.compile("^(?:(\\S+)[:,] )?s/")
     "Disable/Enable sed only looking at the messages sent by the user"))
 class Module(ModuleManager.BaseModule):
     def _closest_setting(self, event, setting, default):
-        return event["target"].get_setting(setting,
-            event["server"].get_setting(setting, default))
+        return self.bot.resolve_setting(setting, channel=event["target"],
+            server=event["server"], default=default, bot=False)
 
     @utils.hook("command.regex")
     @utils.kwarg("command", "sed")
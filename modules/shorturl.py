@@ -1,7 +1,7 @@
 #--depends-on commands
 #--depends-on config
 
-import re
+import inspect, re
 from src import ModuleManager, utils
 
 URL_BITLYSHORTEN = "https://api-ssl.bitly.com/v3/shorten"
@@ -34,6 +34,8 @@ class Module(ModuleManager.BaseModule):
             short_url = shortener(server, context, url)
         else:
             short_url = shortener(url)
+        if inspect.isgenerator(short_url):
+            short_url = yield from short_url
 
         if short_url == None:
             return None
@@ -41,23 +43,18 @@ class Module(ModuleManager.BaseModule):
 
     @utils.export("shorturl-any")
     def _shorturl_any(self, url):
-        return self._call_shortener(server, None, "bitly", url) or url
+        return (yield from self._call_shortener(server, None, "bitly", url)
+            ) or url
 
     @utils.export("shorturl")
     def _shorturl(self, server, url, context=None):
-        shortener_name = None
-        if context:
-            shortener_name = context.get_setting("url-shortener",
-                server.get_setting("url-shortener",
-                self.bot.get_setting("url-shortener", "bitly")))
-        else:
-            shortener_name = server.get_setting("url-shortener",
-                self.bot.get_setting("url-shortener", "bitly"))
+        shortener_name = self.bot.resolve_setting("url-shortener",
+            channel=context, server=server, default="bitly")
 
         if shortener_name == None:
             return url
-        return self._call_shortener(
-            server, context, shortener_name, url) or url
+        return (yield from self._call_shortener(
+            server, context, shortener_name, url)) or url
 
     @utils.export("shorturl-s-bitly")
     def _bitly(self, url):
@@ -66,8 +63,8 @@ class Module(ModuleManager.BaseModule):
 
         access_token = self.bot.config.get("bitly-api-key", None)
         if access_token:
-            page = utils.http.request(URL_BITLYSHORTEN, get_params={
-                "access_token": access_token, "longUrl": url}).json()
+            page = (yield utils.http.Request(URL_BITLYSHORTEN, get_params={
+                "access_token": access_token, "longUrl": url})).json()
 
             if page["data"]:
                 return page["data"]["url"]
@@ -95,15 +92,16 @@ class Module(ModuleManager.BaseModule):
         """
         url = self._find_url(event["target"], event["args_split"])
 
-        event["stdout"].write("Shortened URL: %s" % self._shorturl(
-            event["server"], url, context=event["target"]))
+        short_url = yield from self._shorturl(event["server"], url,
+            context=event["target"])
+        event["stdout"].write("Shortened URL: %s" % short_url)
 
     @utils.hook("received.command.unshorten")
     def unshorten(self, event):
         url = self._find_url(event["target"], event["args_split"])
 
         try:
-            response = utils.http.request(url, method="HEAD",
+            response = yield utils.http.Request(url, method="HEAD",
                 allow_redirects=False)
         except:
             response = None
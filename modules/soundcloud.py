@@ -43,9 +43,9 @@ class Module(ModuleManager.BaseModule):
         else:
             get_params["url"] = url
 
-        page = utils.http.request(
+        page = (yield utils.http.Request(
             URL_SOUNDCLOUD_TRACK if has_query else URL_SOUNDCLOUD_RESOLVE,
-            get_params=get_params).json()
+            get_params=get_params)).json()
 
         if page:
             if len(page):
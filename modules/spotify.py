@@ -22,9 +22,9 @@ class Module(ModuleManager.BaseModule):
             bearer = "%s:%s" % (client_id, client_secret)
             bearer = base64.b64encode(bearer.encode("utf8")).decode("utf8")
 
-            page = utils.http.request(URL_TOKEN, method="POST",
+            page = (yield utils.http.Request(URL_TOKEN, method="POST",
                 headers={"Authorization": "Basic %s" % bearer},
-                post_data={"grant_type": "client_credentials"}).json()
+                post_data={"grant_type": "client_credentials"})).json()
 
             token = page["access_token"]
             self._token = token
@@ -38,10 +38,10 @@ class Module(ModuleManager.BaseModule):
         :help: Search for a track on spotify
         :usage: <term>
         """
-        token = self._get_token()
-        page = utils.http.request(URL_SEARCH,
+        token = yield from self._get_token()
+        page = (yield utils.http.Request(URL_SEARCH,
             get_params={"type": "track", "limit": 1, "q": event["args"]},
-            headers={"Authorization": "Bearer %s" % token}).json()
+            headers={"Authorization": "Bearer %s" % token})).json()
         if page:
             if len(page["tracks"]["items"]):
                 item = page["tracks"]["items"][0]
@@ -63,6 +63,10 @@ class Module(ModuleManager.BaseModule):
                 (network_count, network_plural, total_channels, channel_plural,
                 total_users, user_plural))
 
+    @utils.hook("api.get.loop")
+    def loop_api(self, event):
+        return self.bot.loop_stats()
+
     @utils.hook("api.get.stats")
     def stats_api(self, event):
         networks, channels, users = self._stats()
@@ -78,6 +82,9 @@ class Module(ModuleManager.BaseModule):
             "users": len(server.users),
             "bytes-written": server.socket.bytes_written,
             "bytes-read": server.socket.bytes_read,
+            "queued-lines": {target or "*": depth for target, depth in
+                server.socket.queue_depths().items()},
+            "dropped-lines": server.socket.dropped_lines,
             "connected-since": server.socket.connect_time,
             "channels": {
                 c.name: self._channel_stats(c) for c in server.channels
@@ -173,3 +180,8 @@ class Module(ModuleManager.BaseModule):
     @utils.hook("api.get.modules")
     def modules_api(self, event):
         return list(self.bot.modules.modules.keys())
+
+    @utils.hook("api.get.profile")
+    def profile_api(self, event):
+        return {"enabled": self.events.is_profiling(),
+            "modules": self.bot.get_profile()}
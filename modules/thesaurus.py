@@ -14,7 +14,7 @@ class Module(ModuleManager.BaseModule):
         :usage: <word> [type]
         """
         phrase = event["args_split"][0]
-        page = utils.http.request(URL_THESAURUS % (
+        page = yield utils.http.Request(URL_THESAURUS % (
             self.bot.config["bighugethesaurus-api-key"], phrase))
         syn_ant = event["command"][:3]
         if page:
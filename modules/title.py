@@ -47,7 +47,7 @@ class Module(ModuleManager.BaseModule):
 
         request = utils.http.Request(url, check_hostname=True)
         try:
-            page = utils.http.request(request)
+            page = yield request
         except Exception as e:
             self.log.error("failed to get URL title for %s: %s", [url, str(e)])
             return -1, None
@@ -67,8 +67,8 @@ class Module(ModuleManager.BaseModule):
                     return -2, title
 
                 if channel.get_setting("title-shorten", False):
-                    short_url = self.exports.get("shorturl")(server, url,
-                        context=channel)
+                    short_url = yield from self.exports.get("shorturl")(
+                        server, url, context=channel)
                     return page.code, "%s - %s" % (title, short_url)
             return page.code, title
         else:
@@ -83,7 +83,8 @@ class Module(ModuleManager.BaseModule):
         if event["target"].get_setting("auto-title", False):
             event.eat()
             url = utils.http.url_sanitise(event["match"].group(0))
-            code, title = self._get_title(event["server"], event["target"], url)
+            code, title = yield from self._get_title(event["server"],
+                event["target"], url)
 
             if code == 200 and title:
                 message = title
@@ -128,7 +129,8 @@ class Module(ModuleManager.BaseModule):
         channel = None
         if event["is_channel"]:
             channel = event["target"]
-        code, title = self._get_title(event["server"], channel, url)
+        code, title = yield from self._get_title(event["server"], channel,
+            url)
 
         if title:
             event["stdout"].write(title)
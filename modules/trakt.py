@@ -22,7 +22,7 @@ class Module(ModuleManager.BaseModule):
         else:
             username = event["user"].get_setting("trakt",
                 event["user"].nickname)
-        page = utils.http.request(URL_TRAKT % username, headers={
+        page = yield utils.http.Request(URL_TRAKT % username, headers={
             "Content-Type": "application/json",
             "trakt-api-version": "2", "trakt-api-key":
             self.bot.config["trakt-api-key"]})
@@ -29,7 +29,7 @@ class Module(ModuleManager.BaseModule):
                 target_language = language_match.group(2)
             phrase = phrase.split(" ", 1)[1]
 
-        page = utils.http.request(URL_TRANSLATE, get_params={
+        page = yield utils.http.Request(URL_TRANSLATE, get_params={
             "client": "gtx", "dt": "t", "q": phrase,
             "sl": source_language, "tl": target_language})
 
@@ -7,7 +7,7 @@
 #--require-config twitter-access-secret
 
 import json, re, threading
-from src import ModuleManager, utils
+from src import IRCLine, ModuleManager, utils
 from . import format
 import tweepy
 
@@ -38,9 +38,16 @@ class BitBotStreamListener(tweepy.StreamListener):
                         follows.append([server, server.channels.get(channel_name)])
 
         for server, channel in follows:
-            tweet = format._tweet(_exports, server, status)
-            _events.on("send.stdout").call(target=channel,
-                module_name="Tweets", server=server, message=tweet)
+            utils.http.run_generator(self._send(server, channel, status),
+                self._sent, _bot.trigger)
+    def _send(self, server, channel, status):
+        tweet = yield from format._tweet(_exports, server, status, False)
+        _events.on("send.stdout").call(target=channel,
+            module_name="Tweets", server=server, message=tweet,
+            priority=IRCLine.PRIORITY_BULK)
+    def _sent(self, error):
+        if not error is None:
+            _log.error("Failed to send tweet from stream", exc_info=error)
 
 @utils.export("channelset", utils.BoolSetting("auto-tweet",
     "Enable/disable automatically getting tweet info"))
@@ -166,8 +173,8 @@ class Module(ModuleManager.BaseModule):
                 tweet = self._from_username(target)
 
             if tweet:
-                tweet_str = format._tweet(self.exports, event["server"], tweet,
-                    from_url=not url_match==None)
+                tweet_str = yield from format._tweet(self.exports,
+                    event["server"], tweet, from_url=not url_match==None)
                 event["stdout"].write(tweet_str)
             else:
                 event["stderr"].write("Invalid tweet identifiers provided")
@@ -184,7 +191,7 @@ class Module(ModuleManager.BaseModule):
             tweet_id = event["match"].group(1)
             tweet = self._from_id(tweet_id)
             if tweet:
-                tweet_str = format._tweet(self.exports, event["server"], tweet,
-                    from_url=True)
+                tweet_str = yield from format._tweet(self.exports,
+                    event["server"], tweet, from_url=True)
                 event["stdout"].write(tweet_str)
 
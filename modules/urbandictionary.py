@@ -23,8 +23,8 @@ class Module(ModuleManager.BaseModule):
             term = term[:-1]
         term = " ".join(term)
 
-        page = utils.http.request(URL_URBANDICTIONARY,
-            get_params={"term": term}).json()
+        page = (yield utils.http.Request(URL_URBANDICTIONARY,
+            get_params={"term": term})).json()
         if page:
             if len(page["list"]):
                 if number > 0 and len(page["list"]) > number-1:
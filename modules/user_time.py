@@ -34,7 +34,7 @@ class Module(ModuleManager.BaseModule):
                     location["timezone"])
 
         if query:
-            location = self.exports.get("get-location")(query)
+            location = yield from self.exports.get("get-location")(query)
             if location:
                 return (LocationType.NAME, location["name"],
                     location["timezone"])
@@ -57,7 +57,7 @@ class Module(ModuleManager.BaseModule):
     @utils.kwarg("require_setting", "location")
     @utils.kwarg("require_setting_unless", "1")
     def time(self, event):
-        type, name, timezone = self._find_setting(event)
+        type, name, timezone = yield from self._find_setting(event)
 
         if not timezone == None:
             human = self._timezoned(datetime.datetime.now(), timezone)
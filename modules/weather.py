@@ -45,7 +45,7 @@ class Module(ModuleManager.BaseModule):
 
 
         if location == None and query:
-            location_info = self.exports.get("get-location")(query)
+            location_info = yield from self.exports.get("get-location")(query)
             if not location_info == None:
                 location = [location_info["lat"], location_info["lon"],
                     location_info.get("name", None)]
@@ -56,7 +56,7 @@ class Module(ModuleManager.BaseModule):
         args["lat"] = lat
         args["lon"] = lon
 
-        page = utils.http.request(URL_WEATHER, get_params=args).json()
+        page = (yield utils.http.Request(URL_WEATHER, get_params=args)).json()
         if page:
             if "weather" in page:
                 if location_name:
@@ -11,10 +11,10 @@ class Module(ModuleManager.BaseModule):
     @utils.kwarg("help", "Get information from wikipedia")
     @utils.spec("!<term>lstring")
     def wikipedia(self, event):
-        page = utils.http.request(URL_WIKIPEDIA, get_params={
+        page = (yield utils.http.Request(URL_WIKIPEDIA, get_params={
             "action": "query", "prop": "extracts|info", "inprop": "url",
             "titles": event["spec"][0], "exintro": "", "explaintext": "",
-            "exchars": "500", "redirects": "", "format": "json"}).json()
+            "exchars": "500", "redirects": "", "format": "json"})).json()
 
         if page:
             pages = page["query"]["pages"]
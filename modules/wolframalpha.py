@@ -18,10 +18,10 @@ class Module(ModuleManager.BaseModule):
         """
         query = event["args"].strip()
         try:
-            page = utils.http.request(URL_WA, timeout=10, get_params={
+            page = (yield utils.http.Request(URL_WA, timeout=10, get_params={
                 "input": query, "format": "plaintext",
                 "output": "JSON", "reinterpret": "true", "units": "metric",
-                "appid": self.bot.config["wolframalpha-api-key"]}).json()
+                "appid": self.bot.config["wolframalpha-api-key"]})).json()
         except utils.http.HTTPTimeoutException:
             page = None
 
@@ -24,11 +24,11 @@ class Module(ModuleManager.BaseModule):
         if not setting == None:
             shortener_url, token = setting
 
-            page = utils.http.request(shortener_url, get_params={
+            page = (yield utils.http.Request(shortener_url, get_params={
                 "signature": token,
                 "action": "shorturl",
                 "url": url,
-                "format": "json"}).json()
+                "format": "json"})).json()
             if page:
                 return page["shorturl"]
             return None
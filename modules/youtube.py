@@ -26,16 +26,16 @@ class Module(ModuleManager.BaseModule):
     def get_video_page(self, video_id):
         self.log.debug("youtube API request: "
             "videos.list [contentDetails,snippet,statistics]")
-        return utils.http.request(URL_YOUTUBEVIDEO, get_params={
+        return (yield utils.http.Request(URL_YOUTUBEVIDEO, get_params={
             "part": "contentDetails,snippet,statistics",
-            "id": video_id, "key": self.bot.config["google-api-key"]}).json()
+            "id": video_id, "key": self.bot.config["google-api-key"]})).json()
 
     def _number(self, n):
         if n:
             return "{:,}".format(int(n))
 
     def video_details(self, video_id):
-        page = self.get_video_page(video_id)
+        page = yield from self.get_video_page(video_id)
         if page["items"]:
             item = page["items"][0]
             snippet = item["snippet"]
@@ -81,11 +81,11 @@ class Module(ModuleManager.BaseModule):
         self.log.debug("youtube API request: "
             "playlists.list [contentDetails,snippet]")
 
-        return utils.http.request(URL_YOUTUBEPLAYLIST, get_params={
+        return (yield utils.http.Request(URL_YOUTUBEPLAYLIST, get_params={
             "part": "contentDetails,snippet", "id": playlist_id,
-            "key": self.bot.config["google-api-key"]}).json()
+            "key": self.bot.config["google-api-key"]})).json()
     def playlist_details(self, playlist_id):
-        page = self.get_playlist_page(playlist_id)
+        page = yield from self.get_playlist_page(playlist_id)
         if page["items"]:
             item = page["items"][0]
             snippet = item["snippet"]
@@ -102,13 +102,14 @@ class Module(ModuleManager.BaseModule):
         query = urllib.parse.parse_qs(parsed.query)
 
         if parsed.hostname == "youtu.be" and parsed.path:
-            return self.video_details(parsed.path[1:])
+            return (yield from self.video_details(parsed.path[1:]))
         elif parsed.path == "/watch" and "v" in query:
-            return self.video_details(query["v"][0])
+            return (yield from self.video_details(query["v"][0]))
         elif parsed.path.startswith("/embed/"):
-            return self.video_details(parsed.path.split("/embed/", 1)[1])
+            return (yield from self.video_details(
+                parsed.path.split("/embed/", 1)[1]))
         elif parsed.path == "/playlist" and "list" in query:
-            return self.playlist_details(query["list"][0])
+            return (yield from self.playlist_details(query["list"][0]))
 
     @utils.export("search-youtube")
     def _search_youtube(self, query):
@@ -116,10 +117,10 @@ class Module(ModuleManager.BaseModule):
 
         self.log.debug("youtube API request: search.list (A) [snippet]")
 
-        search_page = utils.http.request(URL_YOUTUBESEARCH,
+        search_page = (yield utils.http.Request(URL_YOUTUBESEARCH,
             get_params={"q": query, "part": "snippet",
             "maxResults": "1", "type": "video",
-            "key": self.bot.config["google-api-key"]}).json()
+            "key": self.bot.config["google-api-key"]})).json()
 
         if search_page:
             if search_page["pageInfo"]["totalResults"] > 0:
@@ -154,10 +155,10 @@ class Module(ModuleManager.BaseModule):
 
             self.log.debug("youtube API request: search.list (B) [snippet]")
 
-            search_page = utils.http.request(URL_YOUTUBESEARCH,
+            search_page = (yield utils.http.Request(URL_YOUTUBESEARCH,
                 get_params={"q": search, "part": "snippet", "maxResults": "1",
                 "type": "video", "key": self.bot.config["google-api-key"],
-                "safeSearch": safe}).json()
+                "safeSearch": safe})).json()
             if search_page:
                 if search_page["pageInfo"]["totalResults"] > 0:
                     url = URL_VIDEO % search_page["items"][0]["id"]["videoId"]
@@ -167,7 +168,7 @@ class Module(ModuleManager.BaseModule):
                 raise utils.EventResultsError()
 
         if url:
-            out = self._from_url(url)
+            out = yield from self._from_url(url)
             if not out == None:
                 out, short_url = out
                 if not from_url:
@@ -184,9 +185,9 @@ class Module(ModuleManager.BaseModule):
     @utils.kwarg("pattern", REGEX_YOUTUBE)
     def channel_message(self, event):
         if event["target"].get_setting("auto-youtube", False):
+            event.eat()
             url = utils.http.url_sanitise(event["match"].group(0))
-            out = self._from_url(url)
+            out = yield from self._from_url(url)
             if not out == None:
                 out, short_url = out
-                event.eat()
                 event["stdout"].write(out)
@@ -1,66 +1,167 @@
-import hashlib, time, typing, uuid
+import collections, heapq, itertools, time, typing
 from src import PollHook
 
+CACHE_SIZE = 10000
+COMPACT_MINIMUM = 64
+
 class Cache(PollHook.PollHook):
-    def __init__(self):
-        self._items = {}
+    def __init__(self, max_items: int=CACHE_SIZE):
+        self._max_items = max_items
+        # key -> [value, expiration, sequence], least recently used first.
+        # only these count towards (and are evicted for) max_items
+        self._items: typing.Dict[typing.Any, typing.List[typing.Any]
+            ] = collections.OrderedDict()
+        # key -> [value, None, sequence] for cache()d items, which are only
+        # ever removed explicitly
+        self._permanent: typing.Dict[typing.Any, typing.List[typing.Any]
+            ] = {}
+        # (expiration, sequence, key). entries for removed or re-cached keys
+        # are left behind and skipped when they reach the top
+        self._expirations: typing.List[typing.Tuple[float, int, typing.Any]
+            ] = []
+        self._sequence = itertools.count()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._items)+len(self._permanent)
+    def max_items(self) -> int:
+        return self._max_items
 
-        self._cached_expiration = None
+    def cache_key(self, key: typing.Any) -> typing.Any:
+        return key
 
-    def cache_key(self, key: str):
-        return "sha1:%s" % hashlib.sha1(key.encode("utf8")).hexdigest()
+    def namespace(self, name: str) -> "CacheNamespace":
+        return CacheNamespace(self, name)
 
-    def cache(self, key: str, value: typing.Any) -> str:
+    def cache(self, key: typing.Any, value: typing.Any) -> typing.Any:
         return self._cache(key, value, None)
-    def temporary_cache(self, key: str, value: typing.Any, timeout: float
-            )-> str:
+    def temporary_cache(self, key: typing.Any, value: typing.Any,
+            timeout: float) -> typing.Any:
         return self._cache(key, value, time.time()+timeout)
-    def _cache(self, key: str, value: typing.Any,
-            expiration: typing.Optional[float]) -> str:
-        id = self.cache_key(key)
-        self._cached_expiration = None
-        self._items[id] = [key, value, expiration]
-        return id
+    def _cache(self, key: typing.Any, value: typing.Any,
+            expiration: typing.Optional[float]) -> typing.Any:
+        sequence = next(self._sequence)
+        if expiration == None:
+            self._items.pop(key, None)
+            self._permanent[key] = [value, expiration, sequence]
+            return key
 
-    def next(self) -> typing.Optional[float]:
-        if not self._cached_expiration == None:
-            return self._cached_expiration
+        self._permanent.pop(key, None)
+        self._items[key] = [value, expiration, sequence]
+        self._items.move_to_end(key) # type: ignore
 
-        expirations = [value[-1] for value in self._items.values()]
-        expirations = list(filter(None, expirations))
-        if not expirations:
-            return None
-        now = time.time()
-        expirations = [e-now for e in expirations]
+        heapq.heappush(self._expirations, (expiration, sequence, key))
+        if len(self._expirations) > max(COMPACT_MINIMUM, len(self._items)*2):
+            self._compact()
 
-        expiration = max(min(expirations), 0)
-        self._cached_expiration = expiration
-        return expiration
+        while len(self._items) > self._max_items:
+            self._items.popitem(last=False) # type: ignore
+            self.evictions += 1
+        return key
+
+    def _compact(self):
+        self._expirations = [(item[1], item[2], key)
+            for key, item in self._items.items()]
+        heapq.heapify(self._expirations)
+
+    def _pop_stale(self):
+        while self._expirations:
+            expiration, sequence, key = self._expirations[0]
+            item = self._items.get(key, None)
+            if item is None or not item[2] == sequence:
+                heapq.heappop(self._expirations)
+            else:
+                break
+
+    def next(self) -> typing.Optional[float]:
+        self._pop_stale()
+        if not self._expirations:
+            return None
+        return max(self._expirations[0][0]-time.time(), 0)
 
     def call(self):
         now = time.time()
-        expired = []
-        for id in self._items.keys():
-            key, value, expiration = self._items[id]
-            if expiration and expiration <= now:
-                expired.append(id)
-        for id in expired:
-            self._cached_expiration = None
-            del self._items[id]
+        self._pop_stale()
+        while self._expirations and self._expirations[0][0] <= now:
+            expiration, sequence, key = heapq.heappop(self._expirations)
+            del self._items[key]
+            self.expired += 1
+            self._pop_stale()
+
+    def _get_item(self, key: typing.Any
+            ) -> typing.Optional[typing.List[typing.Any]]:
+        item = self._permanent.get(key, None)
+        if not item is None:
+            self.hits += 1
+            return item
+
+        item = self._items.get(key, None)
+        if not item is None:
+            expiration = item[1]
+            if expiration <= time.time():
+                # expired but call() hasn't got to it yet
+                del self._items[key]
+                self.expired += 1
+                item = None
+
+        if item is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._items.move_to_end(key) # type: ignore
+        return item
 
     def has_item(self, key: typing.Any) -> bool:
-        return self.cache_key(key) in self._items
+        return not self._get_item(key) is None
 
-    def get(self, key: str) -> typing.Any:
-        key, value, expiration = self._items[self.cache_key(key)]
-        return value
-    def remove(self, key: str):
-        self._cached_expiration = None
-        del self._items[self.cache_key(key)]
+    def get(self, key: typing.Any) -> typing.Any:
+        item = self._get_item(key)
+        if item is None:
+            raise KeyError(key)
+        return item[0]
+    def remove(self, key: typing.Any):
+        if key in self._permanent:
+            del self._permanent[key]
+        else:
+            del self._items[key]
 
     def get_expiration(self, key: typing.Any) -> float:
-        key, value, expiration = self._items[self.cache_key(key)]
-        return expiration
+        return self._items[key][1]
     def until_expiration(self, key: typing.Any) -> float:
         expiration = self.get_expiration(key)
         return expiration-time.time()
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {"items": len(self._items),
+            "permanent-items": len(self._permanent),
+            "max-items": self._max_items,
+            "hits": self.hits, "misses": self.misses,
+            "evictions": self.evictions, "expired": self.expired}
+
+class CacheNamespace(object):
+    def __init__(self, cache: Cache, name: str):
+        self._cache = cache
+        self._name = name
+
+    def _key(self, key: typing.Any) -> typing.Tuple[str, typing.Any]:
+        return (self._name, key)
+
+    def cache(self, key: typing.Any, value: typing.Any) -> typing.Any:
+        return self._cache.cache(self._key(key), value)
+    def temporary_cache(self, key: typing.Any, value: typing.Any,
+            timeout: float) -> typing.Any:
+        return self._cache.temporary_cache(self._key(key), value, timeout)
+    def has_item(self, key: typing.Any) -> bool:
+        return self._cache.has_item(self._key(key))
+    def get(self, key: typing.Any) -> typing.Any:
+        return self._cache.get(self._key(key))
+    def remove(self, key: typing.Any):
+        self._cache.remove(self._key(key))
+    def get_expiration(self, key: typing.Any) -> float:
+        return self._cache.get_expiration(self._key(key))
+    def until_expiration(self, key: typing.Any) -> float:
+        return self._cache.until_expiration(self._key(key))
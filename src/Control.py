@@ -52,6 +52,11 @@ class Control(PollSource.PollSource):
             if client.log_level is not None and client.log_level <= levelno:
                 self._send_action(client, "log", line)
 
+    def _update_log_level(self):
+        levels = [client.log_level for client in self._clients.values()
+            if client.log_level is not None]
+        self._bot.log.set_hook_level(min(levels) if levels else None)
+
     def bind(self):
         if os.path.exists(self._filename):
             os.remove(self._filename)
@@ -72,6 +77,7 @@ class Control(PollSource.PollSource):
             if lines is None:
                 client.disconnect()
                 del self._clients[fileno]
+                self._update_log_level()
             else:
                 for line in lines:
                     response = self._parse_line(client, line)
@@ -93,6 +99,7 @@ class Control(PollSource.PollSource):
             client.version = int(data)
         elif command == "log":
             client.log_level = Logging.LEVELS[data.lower()]
+            self._update_log_level()
         elif command == "rehash":
             self._bot.log.info("Reloading config file")
             self._bot.config.load()
@@ -104,6 +111,12 @@ class Control(PollSource.PollSource):
             keepalive = False
         elif command == "stop":
             self._bot.stop()
+        elif command == "stats":
+            response_data = self._stats()
+            keepalive = False
+        elif command == "profile":
+            response_data = self._profile(data.lower())
+            keepalive = False
         elif command == "command" and data:
             subcommand, _, data = data.partition(" ")
             output = self._bot._events.on("control").on(subcommand
@@ -116,6 +129,61 @@ class Control(PollSource.PollSource):
         if not keepalive:
             client.disconnect()
 
+    def _stats(self) -> str:
+        settings_cache = self._bot.database.settings_cache
+        lookups = settings_cache.hits+settings_cache.misses
+        hit_rate = (settings_cache.hits/lookups)*100 if lookups else 0.0
+        lines = [("settings cache: %d hits, %d misses (%.1f%% hit rate), "
+            "%d/%d entries") % (settings_cache.hits, settings_cache.misses,
+            hit_rate, len(settings_cache), settings_cache.max_size())]
+
+        cache = self._bot.cache.stats()
+        lines.append(("cache: %d hits, %d misses, %d evicted, %d expired, "
+            "%d/%d entries (+%d permanent)") % (cache["hits"],
+            cache["misses"], cache["evictions"], cache["expired"],
+            cache["items"], cache["max-items"], cache["permanent-items"]))
+
+        loop = self._bot.loop_stats()
+        lines.append(("event loop: %d iterations, %d events (%d max per "
+            "wakeup), %d queued (%d max), %.2fms average, %.2fms max") % (
+            loop["iterations"], loop["events"], loop["max-batch"],
+            loop["queue-depth"], loop["max-queue-depth"],
+            loop["average-time"]*1000, loop["max-time"]*1000))
+
+        for server in self._bot.servers.values():
+            depths = server.socket.queue_depths()
+            busiest = sorted(depths.items(), key=lambda item: item[1],
+                reverse=True)[:5]
+            lines.append("%s: %d queued%s, %d dropped" % (str(server),
+                sum(depths.values()), "".join(" (%s: %d)" % (target or "*",
+                depth) for target, depth in busiest),
+                server.socket.dropped_lines))
+        return "\n".join(lines)
+
+    def _profile(self, action: str) -> str:
+        events = self._bot._events
+        if action == "on":
+            events.set_profiling(True)
+            return "Hook profiling enabled"
+        elif action == "off":
+            events.set_profiling(False)
+            return "Hook profiling disabled"
+        elif action == "reset":
+            events.reset_profile()
+            return "Hook profile reset"
+
+        profile = sorted(self._bot.get_profile().items(),
+            key=lambda item: item[1]["total"], reverse=True)
+        lines = ["profiling is %s" % ("on" if events.is_profiling() else "off"),
+            "%-24s %10s %12s %10s %10s %10s" % ("module", "calls",
+            "total (ms)", "max", "p50", "p99")]
+        for name, module_profile in profile:
+            lines.append("%-24s %10d %12.2f %10.2f %10.3f %10.3f" % (name,
+                module_profile["calls"], module_profile["total"],
+                module_profile["max"], module_profile["p50"],
+                module_profile["p99"]))
+        return "\n".join(lines)
+
     def _send_action(self, client: ControlClient, action: str,
             data: typing.Optional[str], id: typing.Optional[str]=None):
         try:
@@ -1,13 +1,114 @@
-import json, os, threading, time, typing, urllib.parse
-from src import Logging, utils
+import collections, contextlib, json, os, re, threading, time, typing
+import urllib.parse
+from src import Logging, PollHook, utils
 
 from .DatabaseEngines import DatabaseEngine, DatabaseEngineCursor
 from .DatabaseEngines import SQLite3Engine
 
+# SQLite's default SQLITE_MAX_VARIABLE_NUMBER is 999
+MAX_PARAMS = 500
+SETTINGS_CACHE_SIZE = 10000
+# tables whose deletes cascade (through foreign keys) on to other tables, so
+# a delete from one has to see pending writes to any of the tables it reaches
+CASCADES = {
+    "servers": ["server_settings", "channels", "users", "channel_settings",
+        "user_settings", "user_channel_settings"],
+    "channels": ["channel_settings", "user_channel_settings"],
+    "users": ["user_settings", "user_channel_settings"]
+}
+
+class SettingsCache(object):
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        # key -> (decoded value, json if the value is mutable) or None for a
+        # setting that doesn't exist
+        self._items: typing.Dict[typing.Tuple, typing.Optional[
+            typing.Tuple[typing.Any, typing.Optional[str]]]
+            ] = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+    def max_size(self) -> int:
+        return self._max_size
+
+    def lookup(self, key: typing.Tuple
+            ) -> typing.Tuple[bool, bool, typing.Any]:
+        # returns (cached, exists, value)
+        if not key in self._items:
+            self.misses += 1
+            return False, False, None
+        self.hits += 1
+
+        self._items.move_to_end(key) # type: ignore
+        item = self._items[key]
+        if item is None:
+            return True, False, None
+
+        value, value_json = item
+        if not value_json is None:
+            # hand out a fresh copy so callers can't mutate our cached one
+            value = json.loads(value_json)
+        return True, True, value
+
+    def set(self, key: typing.Tuple, value_json: typing.Optional[str],
+            value: typing.Any=None):
+        if value_json is None:
+            self._items[key] = None
+        elif isinstance(value, (list, dict)):
+            self._items[key] = (None, value_json)
+        else:
+            self._items[key] = (value, None)
+        self._items.move_to_end(key) # type: ignore
+
+        while len(self._items) > self._max_size:
+            self._items.popitem(last=False) # type: ignore
+    def clear(self):
+        self._items.clear()
+
 class Table(object):
     def __init__(self, database):
         self.database = database
 
+class SettingsTable(Table):
+    _table: str
+
+    def _set(self, key: typing.Tuple, query: str, params: typing.List,
+            value: typing.Any):
+        value_json = json.dumps(value)
+        self.database.write_behind(self._table, key, query,
+            params+[value_json], value_json)
+        self.database.settings_cache.set(key, value_json, value)
+    def _delete(self, key: typing.Tuple, query: str, params: typing.List):
+        self.database.write_behind(self._table, key, query, params, None)
+        self.database.settings_cache.set(key, None)
+    def _get(self, key: typing.Tuple, query: str, params: typing.List,
+            default: typing.Any):
+        cached, exists, value = self.database.settings_cache.lookup(key)
+        if cached:
+            return value if exists else default
+
+        found, value_json = self.database.get_pending(key)
+        if not found:
+            row = self.database.execute_fetchone(query, params, flush=False)
+            value_json = row[0] if row else None
+
+        if value_json is None:
+            self.database.settings_cache.set(key, None)
+            return default
+
+        value = json.loads(value_json)
+        self.database.settings_cache.set(key, value_json, value)
+        if isinstance(value, (list, dict)):
+            # the cache must not share a mutable value with our caller
+            return json.loads(value_json)
+        return value
+
+def _chunks(items: typing.List[typing.Any], n: int
+        ) -> typing.List[typing.List[typing.Any]]:
+    return [items[i:i+n] for i in range(0, len(items), n)]
+
 class Servers(Table):
     def add(self, alias: str, hostname: str, port: int, password: str,
             tls: bool, bindhost: str, nickname: str, username: str=None,
@@ -52,21 +153,45 @@ class Servers(Table):
             "UPDATE servers SET %s=? WHERE server_id=?" % column, [value, id])
     def delete(self, id: int):
         self.database.execute("DELETE FROM servers WHERE server_id=?", [id])
+        self.database.settings_cache.clear()
+        # the delete cascaded to this server's channels and users
+        for table in [self.database.channels, self.database.users]:
+            table._ids = {k: v for k, v in table._ids.items()
+                if not k[0] == id}
 
 class Channels(Table):
+    def __init__(self, database):
+        Table.__init__(self, database)
+        # (server_id, name) -> channel_id, filled in lazily
+        self._ids: typing.Dict[typing.Tuple[int, str], int] = {}
+
     def add(self, server_id: int, name: str):
         self.database.execute("""INSERT OR IGNORE INTO channels
             (server_id, name) VALUES (?, ?)""",
             [server_id, name.lower()])
         return self.database.execute_fetchone(
             "SELECT channel_id FROM channels ORDER BY channel_id DESC LIMIT 1")[0]
+    def get_or_add(self, server_id: int, name: str) -> int:
+        key = (server_id, name.lower())
+        if not key in self._ids:
+            self.add(server_id, name)
+            return typing.cast(int, self.get_id(server_id, name))
+        return self._ids[key]
     def delete(self, channel_id: int):
         self.database.execute("DELETE FROM channels WHERE channel_id=?",
             [channel_id])
+        self.database.settings_cache.clear()
+        self._ids = {k: v for k, v in self._ids.items() if not v == channel_id}
     def get_id(self, server_id: int, name: str):
+        key = (server_id, name.lower())
+        if key in self._ids:
+            return self._ids[key]
+
         value = self.database.execute_fetchone("""SELECT channel_id FROM
             channels WHERE server_id=? AND name=?""",
             [server_id, name.lower()])
+        if not value == None:
+            self._ids[key] = value[0]
         return value if value == None else value[0]
     def by_id(self, channel_id: int):
         value = self.database.execute_fetchone(
@@ -76,19 +201,64 @@ class Channels(Table):
     def rename(self, channel_id: int, new_name: str):
         self.database.execute("UPDATE channels SET name=? where channel_id=?",
             [new_name.lower(), channel_id])
+        self._ids = {k: v for k, v in self._ids.items() if not v == channel_id}
 
 class Users(Table):
+    def __init__(self, database):
+        Table.__init__(self, database)
+        # (server_id, nickname) -> user_id, filled in lazily
+        self._ids: typing.Dict[typing.Tuple[int, str], int] = {}
+
     def add(self, server_id: int, nickname: str):
         self.database.execute("""INSERT OR IGNORE INTO users
             (server_id, nickname) VALUES (?, ?)""",
             [server_id, nickname])
+    def get_or_add(self, server_id: int, nickname: str) -> int:
+        key = (server_id, nickname)
+        if not key in self._ids:
+            self.add(server_id, nickname)
+            return typing.cast(int, self.get_id(server_id, nickname))
+        return self._ids[key]
+    def get_or_add_many(self, server_id: int, nicknames: typing.List[str]
+            ) -> typing.Dict[str, int]:
+        ids: typing.Dict[str, int] = {}
+        missing: typing.List[str] = []
+        for nickname in set(nicknames):
+            key = (server_id, nickname)
+            if key in self._ids:
+                ids[nickname] = self._ids[key]
+            else:
+                missing.append(nickname)
+
+        if missing:
+            with self.database.transaction():
+                self.database.execute_many("""INSERT OR IGNORE INTO users
+                    (server_id, nickname) VALUES (?, ?)""",
+                    [[server_id, nickname] for nickname in missing])
+                for chunk in _chunks(missing, MAX_PARAMS):
+                    rows = self.database.execute_fetchall("""SELECT nickname,
+                        user_id FROM users WHERE server_id=? AND nickname IN
+                        (%s)""" % ", ".join("?"*len(chunk)),
+                        [server_id]+chunk)
+                    for nickname, user_id in rows:
+                        self._ids[(server_id, nickname)] = user_id
+                        ids[nickname] = user_id
+        return ids
     def delete(self, user_id: int):
         self.database.execute("DELETE FROM users WHERE user_id=?",
             [user_id])
+        self.database.settings_cache.clear()
+        self._ids = {k: v for k, v in self._ids.items() if not v == user_id}
     def get_id(self, server_id: int, nickname: str):
+        key = (server_id, nickname)
+        if key in self._ids:
+            return self._ids[key]
+
         value = self.database.execute_fetchone(
             "SELECT user_id FROM users WHERE server_id=? and nickname=?",
             [server_id, nickname])
+        if not value == None:
+            self._ids[key] = value[0]
         return value if value == None else value[0]
     def by_id(self, user_id: int):
         return self.database.execute_fetchone(
@@ -100,18 +270,17 @@ class Users(Table):
             [server_id, user_id])
         return (value or [None])[0]
 
-class BotSettings(Table):
+class BotSettings(SettingsTable):
+    _table = "bot_settings"
+
     def set(self, setting: str, value: typing.Any):
-        self.database.execute(
+        self._set(("bot", setting.lower()),
             "INSERT OR REPLACE INTO bot_settings VALUES (?, ?)",
-            [setting.lower(), json.dumps(value)])
+            [setting.lower()], value)
     def get(self, setting: str, default: typing.Any=None):
-        value = self.database.execute_fetchone(
+        return self._get(("bot", setting.lower()),
             "SELECT value FROM bot_settings WHERE setting=?",
-            [setting.lower()])
-        if value:
-            return json.loads(value[0])
-        return default
+            [setting.lower()], default)
     def find(self, pattern: str, default: typing.Any=[]):
         values = self.database.execute_fetchall(
             "SELECT setting, value FROM bot_settings WHERE setting LIKE ?",
@@ -124,23 +293,22 @@ class BotSettings(Table):
     def find_prefix(self, prefix: str, default: typing.Any=[]):
         return self.find("%s%%" % prefix, default)
     def delete(self, setting: str):
-        self.database.execute(
+        self._delete(("bot", setting.lower()),
             "DELETE FROM bot_settings WHERE setting=?",
             [setting.lower()])
 
-class ServerSettings(Table):
+class ServerSettings(SettingsTable):
+    _table = "server_settings"
+
     def set(self, server_id: int, setting: str, value: typing.Any):
-        self.database.execute(
+        self._set(("server", server_id, setting.lower()),
             "INSERT OR REPLACE INTO server_settings VALUES (?, ?, ?)",
-            [server_id, setting.lower(), json.dumps(value)])
+            [server_id, setting.lower()], value)
     def get(self, server_id: int, setting: str, default: typing.Any=None):
-        value = self.database.execute_fetchone(
+        return self._get(("server", server_id, setting.lower()),
             """SELECT value FROM server_settings WHERE
             server_id=? AND setting=?""",
-            [server_id,setting.lower()])
-        if value:
-            return json.loads(value[0])
-        return default
+            [server_id,setting.lower()], default)
     def find(self, server_id: int, pattern: str, default: typing.Any=[]):
         values = self.database.execute_fetchall(
             """SELECT setting, value FROM server_settings WHERE
@@ -154,22 +322,22 @@ class ServerSettings(Table):
     def find_prefix(self, server_id: int, prefix: str, default: typing.Any=[]):
         return self.find(server_id, "%s%%" % prefix, default)
     def delete(self, server_id: int, setting: str):
-        self.database.execute(
+        self._delete(("server", server_id, setting.lower()),
             "DELETE FROM server_settings WHERE server_id=? AND setting=?",
             [server_id, setting.lower()])
 
-class ChannelSettings(Table):
+class ChannelSettings(SettingsTable):
+    _table = "channel_settings"
+
     def set(self, channel_id: int, setting: str, value: typing.Any):
-        self.database.execute(
+        self._set(("channel", channel_id, setting.lower()),
             "INSERT OR REPLACE INTO channel_settings VALUES (?, ?, ?)",
-            [channel_id, setting.lower(), json.dumps(value)])
+            [channel_id, setting.lower()], value)
     def get(self, channel_id: int, setting: str, default: typing.Any=None):
-        value = self.database.execute_fetchone(
+        return self._get(("channel", channel_id, setting.lower()),
             """SELECT value FROM channel_settings WHERE
-            channel_id=? AND setting=?""", [channel_id, setting.lower()])
-        if value:
-            return json.loads(value[0])
-        return default
+            channel_id=? AND setting=?""", [channel_id, setting.lower()],
+            default)
     def find(self, channel_id: int, pattern: str, default: typing.Any=[]):
         values = self.database.execute_fetchall(
             """SELECT setting, value FROM channel_settings WHERE
@@ -183,7 +351,7 @@ class ChannelSettings(Table):
         return self.find(channel_id, "%s%%" % prefix,
             default)
     def delete(self, channel_id: int, setting: str):
-        self.database.execute(
+        self._delete(("channel", channel_id, setting.lower()),
             """DELETE FROM channel_settings WHERE channel_id=?
             AND setting=?""", [channel_id, setting.lower()])
 
@@ -200,18 +368,17 @@ class ChannelSettings(Table):
             return values
         return default
 
-class UserSettings(Table):
+class UserSettings(SettingsTable):
+    _table = "user_settings"
+
     def set(self, user_id: int, setting: str, value: typing.Any):
-        self.database.execute(
+        self._set(("user", user_id, setting.lower()),
             "INSERT OR REPLACE INTO user_settings VALUES (?, ?, ?)",
-            [user_id, setting.lower(), json.dumps(value)])
+            [user_id, setting.lower()], value)
     def get(self, user_id: int, setting: str, default: typing.Any=None):
-        value = self.database.execute_fetchone(
+        return self._get(("user", user_id, setting.lower()),
             """SELECT value FROM user_settings WHERE
-            user_id=? and setting=?""", [user_id, setting.lower()])
-        if value:
-            return json.loads(value[0])
-        return default
+            user_id=? and setting=?""", [user_id, setting.lower()], default)
     def find_all_by_setting(self, server_id: int, setting: str,
             default: typing.Any=[]):
         values = self.database.execute_fetchall(
@@ -237,26 +404,26 @@ class UserSettings(Table):
     def find_prefix(self, user_id: int, prefix: str, default: typing.Any=[]):
         return self.find(user_id, "%s%%" % prefix, default)
     def delete(self, user_id: int, setting: str):
-        self.database.execute(
+        self._delete(("user", user_id, setting.lower()),
             """DELETE FROM user_settings WHERE
             user_id=? AND setting=?""", [user_id, setting.lower()])
 
-class UserChannelSettings(Table):
+class UserChannelSettings(SettingsTable):
+    _table = "user_channel_settings"
+
     def set(self, user_id: int, channel_id: int, setting: str,
             value: typing.Any):
-        self.database.execute(
+        self._set(("user_channel", user_id, channel_id, setting.lower()),
             """INSERT OR REPLACE INTO user_channel_settings VALUES
             (?, ?, ?, ?)""",
-            [user_id, channel_id, setting.lower(), json.dumps(value)])
+            [user_id, channel_id, setting.lower()], value)
     def get(self, user_id: int, channel_id: int, setting: str,
             default: typing.Any=None):
-        value = self.database.execute_fetchone(
+        return self._get(("user_channel", user_id, channel_id,
+            setting.lower()),
             """SELECT value FROM user_channel_settings WHERE
             user_id=? AND channel_id=? AND setting=?""",
-            [user_id, channel_id, setting.lower()])
-        if value:
-            return json.loads(value[0])
-        return default
+            [user_id, channel_id, setting.lower()], default)
     def find(self, user_id: int, channel_id: int, pattern: str,
             default: typing.Any=[]):
         values = self.database.execute_fetchall(
@@ -301,15 +468,48 @@ class UserChannelSettings(Table):
             return values
         return default
     def delete(self, user_id: int, channel_id: int, setting: str):
-        self.database.execute(
+        self._delete(("user_channel", user_id, channel_id, setting.lower()),
             """DELETE FROM user_channel_settings WHERE
             user_id=? AND channel_id=? AND setting=?""",
             [user_id, channel_id, setting.lower()])
 
-class Database(object):
+class Timers(Table):
+    def add(self, timer_id: str, name: str, delay: float, next_due: float,
+            kwargs: dict):
+        kwargs_json = json.dumps(kwargs)
+        self.database.write_behind("timers", ("timer", timer_id),
+            "INSERT OR REPLACE INTO timers VALUES (?, ?, ?, ?, ?)",
+            [timer_id, name, delay, next_due, kwargs_json], kwargs_json)
+    def delete(self, timer_id: str):
+        self.database.write_behind("timers", ("timer", timer_id),
+            "DELETE FROM timers WHERE timer_id=?", [timer_id], None)
+
+    def _rows(self, where: str, params: typing.List
+            ) -> typing.List[typing.Tuple[str, str, float, float, dict]]:
+        values = self.database.execute_fetchall(
+            """SELECT timer_id, name, delay, next_due, kwargs FROM timers
+            WHERE %s ORDER BY next_due""" % where, params)
+        return [(id, name, delay, next_due, json.loads(kwargs))
+            for id, name, delay, next_due, kwargs in values]
+    def get_due(self, after: typing.Optional[float], before: float
+            ) -> typing.List[typing.Tuple[str, str, float, float, dict]]:
+        if after is None:
+            return self._rows("next_due<=?", [before])
+        return self._rows("next_due>? AND next_due<=?", [after, before])
+    def get_by_name(self, name: str
+            ) -> typing.List[typing.Tuple[str, str, float, float, dict]]:
+        return self._rows("name=?", [name])
+    def next_due_after(self, after: float) -> typing.Optional[float]:
+        return self.database.execute_fetchone(
+            "SELECT MIN(next_due) FROM timers WHERE next_due>?", [after])[0]
+
+class Database(PollHook.PollHook):
     _engine: DatabaseEngine
 
-    def __init__(self, log: "Logging.Log", database: str):
+    def __init__(self, log: "Logging.Log", database: str,
+            flush_interval: float=0.0,
+            options: typing.Dict[str, str]={},
+            settings_cache_size: int=SETTINGS_CACHE_SIZE):
         db_parts = urllib.parse.urlparse(database)
 
         if db_parts.scheme == "sqlite3":
@@ -318,11 +518,23 @@ class Database(object):
             raise ValueError("Unknown database engine '%s'" % db_parts.scheme)
         self._engine.config(hostname=db_parts.hostname, port=db_parts.port,
             path=db_parts.path, username=db_parts.username,
-            password=db_parts.password)
+            password=db_parts.password, options=options)
         self._engine.connect()
 
         self.log = log
         self._lock = threading.Lock()
+        self._transaction_depth = 0
+
+        # key -> (table, query, params, json value or None for a delete)
+        self._pending: typing.Dict[typing.Tuple,
+            typing.Tuple[str, str, typing.List, typing.Optional[str]]
+            ] = collections.OrderedDict()
+        self._pending_since: typing.Optional[float] = None
+        # tables that have pending writes, e.g. "channel_settings"
+        self._pending_tables: typing.Set[str] = set()
+        self._flush_interval = flush_interval
+
+        self.settings_cache = SettingsCache(settings_cache_size)
 
         self.make_servers_table()
         self.make_channels_table()
@@ -332,6 +544,7 @@ class Database(object):
         self.make_channel_settings_table()
         self.make_user_settings_table()
         self.make_user_channel_settings_table()
+        self.make_timers_table()
 
         self.servers = Servers(self)
         self.channels = Channels(self)
@@ -341,14 +554,103 @@ class Database(object):
         self.channel_settings = ChannelSettings(self)
         self.user_settings = UserSettings(self)
         self.user_channel_settings = UserChannelSettings(self)
+        self.timers = Timers(self)
+
+    def write_behind(self, table: str, key: typing.Tuple, query: str,
+            params: typing.List, value: typing.Optional[str]):
+        if not utils.is_main_thread():
+            raise RuntimeError("Can't access Database outside of main thread")
+
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        self._pending_tables.add(table)
+        # a later write to the same key supersedes an earlier one
+        self._pending.pop(key, None)
+        self._pending[key] = (table, query, params, value)
+    def get_pending(self, key: typing.Tuple
+            ) -> typing.Tuple[bool, typing.Optional[str]]:
+        if key in self._pending:
+            return True, self._pending[key][3]
+        return False, None
+
+    def _sees_pending(self, query: str) -> bool:
+        if not self._pending:
+            return False
+        tables = list(self._pending_tables)
+        if query.lstrip()[:6].upper() == "DELETE":
+            tables.extend(parent for parent, children in CASCADES.items()
+                if not self._pending_tables.isdisjoint(children))
+        return bool(re.search(r"\b(%s)\b" % "|".join(tables), query,
+            re.I))
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = collections.OrderedDict()
+        self._pending_since = None
+        self._pending_tables = set()
+
+        grouped: typing.Dict[str, typing.List[typing.Tuple[typing.Tuple,
+            typing.Tuple[str, str, typing.List, typing.Optional[str]]]]
+            ] = collections.OrderedDict()
+        for key, write in pending.items():
+            grouped.setdefault(write[1], []).append((key, write))
+
+        start = time.monotonic()
+        try:
+            with self.transaction():
+                for query, writes in grouped.items():
+                    self.execute_many(query, [w[2] for _, w in writes])
+        except Exception as e:
+            self.log.warn("Failed to flush %d writes, retrying per query: %s",
+                [len(pending), str(e)])
+            self._flush_groups(grouped)
+        total_milliseconds = (time.monotonic() - start) * 1000
+        self.log.trace("flushed %d writes in %fms",
+            [len(pending), total_milliseconds])
+
+    def _flush_groups(self, grouped):
+        # one failing query shouldn't lose every other write with it, so
+        # each query gets its own transaction and those that still fail are
+        # put back to be tried again next flush
+        failed = []
+        error: typing.Optional[Exception] = None
+        for query, writes in grouped.items():
+            try:
+                with self.transaction():
+                    self.execute_many(query, [w[2] for _, w in writes])
+            except Exception as e:
+                error = error or e
+                failed.extend(writes)
+
+        if failed:
+            for key, write in failed:
+                self.write_behind(write[0], key, *write[1:])
+            raise typing.cast(Exception, error)
+
+    def next(self) -> typing.Optional[float]:
+        if self._pending_since is None:
+            return None
+        due = self._pending_since+self._flush_interval
+        return max(0.0, due-time.monotonic())
+    def call(self):
+        try:
+            self.flush()
+        except Exception as e:
+            self.log.error("Failed to flush database writes: %s", [str(e)],
+                exc_info=True)
 
     def _execute_fetch(self, query: str,
             fetch_func: typing.Callable[[DatabaseEngineCursor], typing.Any],
-            params: typing.List=[]):
+            params: typing.List=[], flush: bool=True):
         if not utils.is_main_thread():
             raise RuntimeError("Can't access Database outside of main thread")
+        if flush and self._sees_pending(query):
+            # this query might see (or trip over foreign keys for) pending
+            # writes
+            self.flush()
 
-        printable_query = " ".join(query.split())
         start = time.monotonic()
 
         cursor = self._engine.cursor()
@@ -357,17 +659,62 @@ class Database(object):
         value = fetch_func(cursor)
 
         end = time.monotonic()
-        total_milliseconds = (end - start) * 1000
-        self.log.trace("executed query in %fms: \"%s\" (params: %s)",
-            [total_milliseconds, printable_query, params])
+        if self.log.trace_enabled():
+            total_milliseconds = (end - start) * 1000
+            printable_query = " ".join(query.split())
+            self.log.trace("executed query in %fms: \"%s\" (params: %s)",
+                [total_milliseconds, printable_query, params])
 
         return value
-    def execute_fetchall(self, query: str, params: typing.List=[]):
+    def execute_many(self, query: str, params: typing.List[typing.List]):
+        if not utils.is_main_thread():
+            raise RuntimeError("Can't access Database outside of main thread")
+        if self._sees_pending(query):
+            self.flush()
+
+        start = time.monotonic()
+
+        cursor = self._engine.cursor()
+        with self._lock:
+            cursor.executemany(query, params)
+
+        if self.log.trace_enabled():
+            total_milliseconds = (time.monotonic() - start) * 1000
+            printable_query = " ".join(query.split())
+            self.log.trace("executed query %d times in %fms: \"%s\"",
+                [len(params), total_milliseconds, printable_query])
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # nested transactions are folded in to the outermost one
+        outermost = self._transaction_depth == 0
+        if outermost:
+            # pending writes get their own transaction, before ours starts
+            self.flush()
+            self._execute_fetch("BEGIN", lambda cursor: None, flush=False)
+        try:
+            self._transaction_depth += 1
+            yield
+        except:
+            if outermost:
+                self._execute_fetch("ROLLBACK", lambda cursor: None,
+                    flush=False)
+            raise
+        else:
+            if outermost:
+                self._execute_fetch("COMMIT", lambda cursor: None,
+                    flush=False)
+        finally:
+            self._transaction_depth -= 1
+
+    def execute_fetchall(self, query: str, params: typing.List=[],
+            flush: bool=True):
         return self._execute_fetch(query,
-            lambda cursor: cursor.fetchall(), params)
-    def execute_fetchone(self, query: str, params: typing.List=[]):
+            lambda cursor: cursor.fetchall(), params, flush)
+    def execute_fetchone(self, query: str, params: typing.List=[],
+            flush: bool=True):
         return self._execute_fetch(query,
-            lambda cursor: cursor.fetchone(), params)
+            lambda cursor: cursor.fetchone(), params, flush)
     def execute(self, query: str, params: typing.List=[]):
         return self._execute_fetch(query, lambda cursor: None, params)
 
@@ -441,3 +788,29 @@ class Database(object):
                 setting))""")
             self.execute("""CREATE INDEX user_channel_settings_index
                 ON user_channel_settings (user_id, channel_id, setting)""")
+    def make_timers_table(self):
+        if not self.has_table("timers"):
+            self.execute("""CREATE TABLE timers
+                (timer_id TEXT PRIMARY KEY, name TEXT, delay REAL,
+                next_due REAL, kwargs TEXT)""")
+            self.execute("CREATE INDEX timers_next_due ON timers (next_due)")
+            self.execute("CREATE INDEX timers_name ON timers (name)")
+            self._migrate_timers()
+    def _migrate_timers(self):
+        # persistent timers used to be "timer-<id>" bot settings
+        old_timers = self.execute_fetchall(
+            "SELECT setting, value FROM bot_settings WHERE setting LIKE ?",
+            ["timer-%"])
+        if old_timers:
+            with self.transaction():
+                self.execute_many(
+                    "INSERT OR REPLACE INTO timers VALUES (?, ?, ?, ?, ?)",
+                    [self._migrate_timer(setting, json.loads(value))
+                    for setting, value in old_timers])
+                self.execute("DELETE FROM bot_settings WHERE setting LIKE ?",
+                    ["timer-%"])
+            self.log.info("Migrated %d timers to the timers table",
+                [len(old_timers)])
+    def _migrate_timer(self, setting: str, timer: dict) -> typing.List:
+        return [setting.split("timer-", 1)[1], timer["name"],
+            timer["delay"], timer["next-due"], json.dumps(timer["kwargs"])]
@@ -4,6 +4,8 @@ import sqlite3
 class DatabaseEngineCursor(object):
     def execute(self, query: str, args: typing.List[str]):
         pass
+    def executemany(self, query: str, args: typing.List[typing.List[str]]):
+        pass
     def fetchone(self) -> typing.Any:
         pass
     def fetchall(self) -> typing.List[typing.Any]:
@@ -11,12 +13,14 @@ class DatabaseEngineCursor(object):
 
 class DatabaseEngine(object):
     def config(self, hostname: str=None, port: int=None, path: str=None,
-            username: str=None, password: str=None):
+            username: str=None, password: str=None,
+            options: typing.Dict[str, str]={}):
         self.hostname = hostname
         self.port = port
         self.path = path
         self.username = username
         self.password = password
+        self.options = options
 
     def database_name(self):
         return self.path
@@ -39,10 +43,14 @@ class SQLite3Cursor(DatabaseEngineCursor):
         self._cursor = cursor
     def execute(self, query: str, args: typing.List[str]):
         self._cursor.execute(query, args)
+    def executemany(self, query: str, args: typing.List[typing.List[str]]):
+        self._cursor.executemany(query, args)
     def fetchone(self):
         return self._cursor.fetchone()
     def fetchall(self):
         return self._cursor.fetchall()
+SQLITE_SYNCHRONOUS = ["OFF", "NORMAL", "FULL", "EXTRA"]
+
 class SQLite3Engine(DatabaseEngine):
     _connection: sqlite3.Connection
 
@@ -53,6 +61,23 @@ class SQLite3Engine(DatabaseEngine):
             detect_types=sqlite3.PARSE_DECLTYPES)
         self._connection.execute("PRAGMA foreign_keys = ON")
 
+        # WAL means readers don't block on our writes and means a commit is
+        # an append rather than a rewrite of the rollback journal
+        self._connection.execute("PRAGMA journal_mode = WAL")
+
+        synchronous = self.options.get("synchronous", "NORMAL").upper()
+        if not synchronous in SQLITE_SYNCHRONOUS:
+            raise ValueError("Unknown sqlite synchronous mode '%s'" %
+                synchronous)
+        self._connection.execute("PRAGMA synchronous = %s" % synchronous)
+
+        if "cache-size" in self.options:
+            self._connection.execute("PRAGMA cache_size = %d" %
+                int(self.options["cache-size"]))
+        if "mmap-size" in self.options:
+            self._connection.execute("PRAGMA mmap_size = %d" %
+                int(self.options["mmap-size"]))
+
     def has_table(self, name: str):
         cursor = self.cursor()
         cursor.execute(
@@ -1,4 +1,4 @@
-import itertools, time, traceback, typing
+import collections, difflib, heapq, itertools, time, traceback, typing
 from src import Logging, utils
 
 PRIORITY_URGENT = 0
@@ -10,6 +10,8 @@ PRIORITY_MONITOR = 4
 DEFAULT_PRIORITY = PRIORITY_MEDIUM
 DEFAULT_EVENT_DELIMITER = "."
 DEFAULT_MULTI_DELIMITER = "|"
+# how many child handles each Events object remembers
+HANDLE_CACHE_SIZE = 512
 
 class Event(object):
     def __init__(self, name: str, kwargs):
@@ -27,6 +29,63 @@ class Event(object):
 
 CALLBACK_TYPE = typing.Callable[[Event], typing.Any]
 
+# profile histograms split each power of two (in microseconds) in to 8 buckets,
+# so percentiles are accurate to within 1/8th
+PROFILE_SUB_BITS = 3
+PROFILE_SUB = 1 << PROFILE_SUB_BITS
+PROFILE_EXACT = PROFILE_SUB*2
+
+def _profile_bucket(micros: int) -> int:
+    if micros < PROFILE_EXACT:
+        return micros
+    shift = micros.bit_length()-PROFILE_SUB_BITS-1
+    return PROFILE_EXACT+((shift-1)*PROFILE_SUB)+((micros>>shift)-PROFILE_SUB)
+def _profile_bucket_max(index: int) -> int:
+    if index < PROFILE_EXACT:
+        return index
+    shift, sub = divmod(index-PROFILE_EXACT, PROFILE_SUB)
+    shift += 1
+    return ((sub+PROFILE_SUB+1) << shift)-1
+
+class HookProfile(object):
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets: typing.Dict[int, int] = {}
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        bucket = _profile_bucket(int(seconds*1_000_000))
+        self._buckets[bucket] = self._buckets.get(bucket, 0)+1
+
+    def merge(self, other: "HookProfile"):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for bucket, count in other._buckets.items():
+            self._buckets[bucket] = self._buckets.get(bucket, 0)+count
+
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        needed = self.count*(percent/100)
+        seen = 0
+        for bucket in sorted(self._buckets.keys()):
+            seen += self._buckets[bucket]
+            if seen >= needed:
+                break
+        return min(_profile_bucket_max(bucket)/1_000_000, self.max)
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        # times in milliseconds
+        return {"calls": self.count, "total": self.total*1000,
+            "max": self.max*1000, "p50": self.percentile(50)*1000,
+            "p99": self.percentile(99)*1000}
+
 class EventHook(object):
     def __init__(self, event_name: str, func: CALLBACK_TYPE,
             context: typing.Optional[str], priority: int,
@@ -38,6 +97,7 @@ class EventHook(object):
         self.docstring = utils.parse.docstring(func.__doc__ or "")
 
         self.call_count = 0
+        self.profile = HookProfile()
         self._kwargs: typing.Dict[str, typing.Any] = {}
         self._multi_kwargs: typing.Dict[str, typing.List[typing.Any]] = {}
         for key, value in kwargs:
@@ -65,12 +125,76 @@ class EventHook(object):
     def get_kwarg(self, key: str, default: typing.Any=None) -> typing.Any:
         return (self.get_kwargs(key) or [default])[0]
 
+class ChildIndex(object):
+    def __init__(self):
+        self._children: typing.Set[str] = set([])
+        # lazily (re)built when the set of children changes
+        self._lengths: typing.Optional[typing.Dict[int,
+            typing.List[typing.Tuple[str, typing.Counter[str]]]]] = None
+
+    def __contains__(self, child: str) -> bool:
+        return child in self._children
+    def __len__(self) -> int:
+        return len(self._children)
+
+    def add(self, child: str):
+        self._children.add(child)
+        self._lengths = None
+    def remove(self, child: str):
+        self._children.discard(child)
+        self._lengths = None
+
+    def get_all(self) -> typing.List[str]:
+        return list(self._children)
+
+    def _get_lengths(self):
+        if self._lengths is None:
+            self._lengths = {}
+            for child in self._children:
+                if not len(child) in self._lengths:
+                    self._lengths[len(child)] = []
+                self._lengths[len(child)].append(
+                    (child, collections.Counter(child)))
+        return self._lengths
+
+    def close_matches(self, word: str, n: int, cutoff: float
+            ) -> typing.List[str]:
+        # same results as difflib.get_close_matches(), but only comparing
+        # children of a length and character makeup that could possibly meet
+        # `cutoff`
+        word_len = len(word)
+        word_chars = collections.Counter(word)
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(word)
+
+        results: typing.List[typing.Tuple[float, str]] = []
+        for length, children in self._get_lengths().items():
+            total = word_len+length
+            if not total or 2.0*min(word_len, length)/total < cutoff:
+                continue
+
+            for child, child_chars in children:
+                common = sum((word_chars&child_chars).values())
+                if 2.0*common/total < cutoff:
+                    continue
+
+                matcher.set_seq1(child)
+                ratio = matcher.ratio()
+                if ratio >= cutoff:
+                    results.append((ratio, child))
+
+        return [child for ratio, child in heapq.nlargest(n, results)]
+
 class Events(object):
     def __init__(self, root: "EventRoot", path: typing.List[str],
             context: typing.Optional[str]):
         self._root = root
         self._path = path
+        self._path_str = root._path_str(path)
         self._context = context
+        # subname -> Events, so hot paths like .on("raw.received").on(command)
+        # don't split and lowercase the same path on every call
+        self._handles: typing.Dict[str, "Events"] = {}
 
     def new_root(self):
         return self._root._new_root()
@@ -79,13 +203,19 @@ class Events(object):
         return self._root._new_context(context)
 
     def make_event(self, **kwargs):
-        return self._root._make_event(self._path, kwargs)
+        return self._root._make_event(self._path_str, kwargs)
 
     def on(self, subname):
-        parts = subname.split(DEFAULT_EVENT_DELIMITER)
-        new_path = self._path + parts
+        handle = self._handles.get(subname, None)
+        if handle is None:
+            parts = subname.split(DEFAULT_EVENT_DELIMITER)
+            handle = Events(self._root, self._path + parts, self._context)
 
-        return Events(self._root, new_path, self._context)
+            if len(self._handles) >= HANDLE_CACHE_SIZE:
+                # subnames can come from user input, don't grow forever
+                self._handles.clear()
+            self._handles[subname] = handle
+        return handle
 
     def hook(self, func: CALLBACK_TYPE, priority: int = DEFAULT_PRIORITY,
             **kwargs):
@@ -96,15 +226,15 @@ class Events(object):
             if key == "priority":
                 priority = value
                 break
-        self._root._hook(self._path, func, self._context, priority, kwargs)
+        self._root._hook(self._path_str, func, self._context, priority, kwargs)
 
     def call(self, **kwargs):
-        return self._root._call(self._path, kwargs, True, self._context, None)
+        return self._root._call(self._path_str, kwargs, True, self._context, None)
     def call_unsafe(self, **kwargs):
-        return self._root._call(self._path, kwargs, False, self._context, None)
+        return self._root._call(self._path_str, kwargs, False, self._context, None)
 
     def _call_limited(self, maximum: int, safe: bool, kwargs):
-        return self._root._call(self._path, kwargs, safe, self._context,
+        return self._root._call(self._path_str, kwargs, safe, self._context,
             maximum)
     def call_limited(self, maximum: int, **kwargs):
         return self._call_limited(maximum, True, kwargs)
@@ -117,13 +247,31 @@ class Events(object):
         return (self._call_limited(1, False, kwargs) or [default])[0]
 
     def get_children(self):
-        return self._root._get_children(self._path)
+        return self._root._get_children(self._path_str)
+    def has_child(self, name: str) -> bool:
+        return self._root._has_child(self._path_str, name)
+    def get_close_children(self, name: str, n: int=3, cutoff: float=0.6
+            ) -> typing.List[str]:
+        return self._root._get_close_children(self._path_str, name, n, cutoff)
     def get_hooks(self):
-        return self._root._get_hooks(self._path)
+        return self._root._get_hooks(self._path_str)
 
     def purge_context(self, context: str):
         self._root._purge_context(context)
 
+    def get_generation(self) -> int:
+        return self._root._generation
+
+    def set_profiling(self, enabled: bool):
+        self._root._profiling = enabled
+    def is_profiling(self) -> bool:
+        return self._root._profiling
+    def reset_profile(self):
+        self._root._reset_profile()
+    def get_profile(self) -> typing.Dict[typing.Optional[str],
+            typing.Tuple[HookProfile, typing.List[EventHook]]]:
+        return self._root._get_profile()
+
     def all_hooks(self):
         return self._root.all_hooks()
 
@@ -131,9 +279,14 @@ class EventRoot(object):
     def __init__(self, log: Logging.Log):
         self.log = log
         self._hooks: typing.Dict[str, typing.List[EventHook]] = {}
+        # "a.b" -> {"c", "c.d"} for hooked "a.b.c" and "a.b.c.d"
+        self._children: typing.Dict[str, ChildIndex] = {}
+        # changes whenever any hook is added or removed
+        self._generation = 0
+        self._profiling = False
 
-    def _make_event(self, path: typing.List[str], kwargs: dict):
-        return Event(self._path_str(path), kwargs)
+    def _make_event(self, path_str: str, kwargs: dict):
+        return Event(path_str, kwargs)
 
     def _new_context(self, context: str):
         return Events(self, [], context)
@@ -147,16 +300,18 @@ class EventRoot(object):
         path_lower = [p.lower() for p in path]
         return DEFAULT_EVENT_DELIMITER.join(path_lower)
 
-    def _hook(self, path: typing.List[str], func: CALLBACK_TYPE,
+    def _hook(self, path_str: str, func: CALLBACK_TYPE,
             context: typing.Optional[str], priority: int,
             kwargs: typing.List[typing.Tuple[str, typing.Any]] = []
             ) -> EventHook:
-        path_str = self._path_str(path)
         new_hook = EventHook(path_str, func, context, priority, kwargs)
+        self._generation += 1
 
         if not path_str in self._hooks:
-            self._hooks[path_str] = []
-        hook_array = self._hooks[path_str]
+            self._index_path(path_str)
+        # hook arrays are copy-on-write so _call() can iterate them without
+        # taking a copy first
+        hook_array = self._hooks.get(path_str, []).copy()
 
         hooked = False
         for i, other_hook in enumerate(hook_array):
@@ -166,41 +321,53 @@ class EventRoot(object):
                 break
         if not hooked:
             hook_array.append(new_hook)
+        self._hooks[path_str] = hook_array
         return new_hook
 
-    def _call(self, path: typing.List[str], kwargs: dict, safe: bool,
+    def _call(self, path_str: str, kwargs: dict, safe: bool,
             context: typing.Optional[str], maximum: typing.Optional[int]
             ) -> typing.List[typing.Any]:
         if not utils.is_main_thread():
             raise RuntimeError("Can't call events outside of main thread")
 
         returns: typing.List[typing.Any] = []
-        path_str = self._path_str(path)
-        if not path_str in self._hooks:
-            self.log.trace("not calling non-hooked event \"%s\" (params: %s)",
-                [path_str, str(kwargs)])
+        trace = self.log.trace_enabled()
+
+        hooks = self._hooks.get(path_str, None)
+        if hooks is None:
+            if trace:
+                self.log.trace(
+                    "not calling non-hooked event \"%s\" (params: %s)",
+                    [path_str, str(kwargs)])
             return returns
 
-        self.log.trace("calling event: \"%s\" (params: %s)",
-            [path_str, str(kwargs)])
-        start = time.monotonic()
+        if trace:
+            self.log.trace("calling event: \"%s\" (params: %s)",
+                [path_str, str(kwargs)])
+            start = time.monotonic()
 
-        # .copy() hooks so we don't call new hooks in this loop
-        mutable_hooks = self._hooks[path_str]
-        hooks = mutable_hooks.copy()
-        if maximum:
-            hooks = hooks[:maximum]
-        event = self._make_event(path, kwargs)
+        # hooks added while we're handling this event go in to a new array,
+        # so won't be called by this loop. if anything has been unhooked, we
+        # need to check each hook is still hooked before calling it
+        generation = self._generation
+        profiling = self._profiling
+        event = Event(path_str, kwargs)
 
-        for hook in hooks:
-            if event.eaten:
+        for i, hook in enumerate(hooks):
+            if event.eaten or (maximum and i >= maximum):
                 break
-            if not hook in mutable_hooks:
+            if (not generation == self._generation and
+                    not hook in self._hooks.get(path_str, [])):
                 # this hook has been removed while handling this event
                 continue
 
             try:
-                returned = hook.call(event)
+                if profiling:
+                    hook_start = time.perf_counter()
+                    returned = hook.call(event)
+                    hook.profile.add(time.perf_counter()-hook_start)
+                else:
+                    returned = hook.call(event)
             except Exception as e:
                 if safe:
                     self.log.error("failed to call event \"%s\"",
@@ -210,38 +377,83 @@ class EventRoot(object):
                     raise
             returns.append(returned)
 
-        total_milliseconds = (time.monotonic() - start) * 1000
-        self.log.trace("event \"%s\" called in %fms",
-            [path_str, total_milliseconds])
+        if trace:
+            total_milliseconds = (time.monotonic() - start) * 1000
+            self.log.trace("event \"%s\" called in %fms",
+                [path_str, total_milliseconds])
 
         return returns
 
     def _purge_context(self, context: str):
-        context_hooks: typing.Dict[str, typing.List[EventHook]] = {}
-        for path in self._hooks.keys():
-            for hook in self._hooks[path]:
-                if hook.context == context:
-                    if not path in context_hooks:
-                        context_hooks[path] = []
-                    context_hooks[path].append(hook)
-        for path in context_hooks:
-            for hook in context_hooks[path]:
-                self._hooks[path].remove(hook)
-                if not self._hooks[path]:
-                    del self._hooks[path]
-
-    def _get_children(self, path):
-        path_prefix = "%s%s" % (self._path_str(path), DEFAULT_EVENT_DELIMITER)
-        matches = []
-        for key in self._hooks.keys():
-            if key.startswith(path_prefix):
-                matches.append(key.replace(path_prefix, "", 1))
-        return matches
-    def _get_hooks(self, path):
-        path_str = self._path_str(path)
+        for path_str, hooks in list(self._hooks.items()):
+            new_hooks = [hook for hook in hooks if not hook.context == context]
+            if len(new_hooks) == len(hooks):
+                continue
+
+            self._generation += 1
+            if new_hooks:
+                self._hooks[path_str] = new_hooks
+            else:
+                del self._hooks[path_str]
+                self._unindex_path(path_str)
+
+    def _path_parents(self, path_str: str
+            ) -> typing.List[typing.Tuple[str, str]]:
+        parts = path_str.split(DEFAULT_EVENT_DELIMITER)
+        parents = []
+        for i in range(1, len(parts)):
+            parents.append((DEFAULT_EVENT_DELIMITER.join(parts[:i]),
+                DEFAULT_EVENT_DELIMITER.join(parts[i:])))
+        return parents
+    def _index_path(self, path_str: str):
+        for parent, child in self._path_parents(path_str):
+            if not parent in self._children:
+                self._children[parent] = ChildIndex()
+            self._children[parent].add(child)
+    def _unindex_path(self, path_str: str):
+        for parent, child in self._path_parents(path_str):
+            if parent in self._children:
+                self._children[parent].remove(child)
+                if not self._children[parent]:
+                    del self._children[parent]
+
+    def _get_children(self, path_str: str):
+        if path_str in self._children:
+            return self._children[path_str].get_all()
+        return []
+    def _has_child(self, path_str: str, name: str) -> bool:
+        return (path_str in self._children and
+            name.lower() in self._children[path_str])
+    def _get_close_children(self, path_str: str, name: str, n: int,
+            cutoff: float) -> typing.List[str]:
+        if path_str in self._children:
+            return self._children[path_str].close_matches(name.lower(), n,
+                cutoff)
+        return []
+    def _get_hooks(self, path_str: str):
         if path_str in self._hooks:
             return self._hooks[path_str][:]
         return []
 
     def all_hooks(self):
         return self._hooks.copy()
+
+    def _reset_profile(self):
+        for hooks in self._hooks.values():
+            for hook in hooks:
+                hook.profile = HookProfile()
+    def _get_profile(self) -> typing.Dict[typing.Optional[str],
+            typing.Tuple[HookProfile, typing.List[EventHook]]]:
+        # context -> (all of the context's hooks merged, each called hook)
+        contexts: typing.Dict[typing.Optional[str],
+            typing.Tuple[HookProfile, typing.List[EventHook]]] = {}
+        for hooks in self._hooks.values():
+            for hook in hooks:
+                if not hook.profile.count:
+                    continue
+                if not hook.context in contexts:
+                    contexts[hook.context] = (HookProfile(), [])
+                merged, context_hooks = contexts[hook.context]
+                merged.merge(hook.profile)
+                context_hooks.append(hook)
+        return contexts
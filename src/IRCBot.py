@@ -4,11 +4,23 @@ with open("VERSION", "r") as version_file:
 SOURCE: str = "https://git.io/bitbot"
 URL: str = "https://bitbot.dev"
 
-import enum, queue, os, queue, select, socket, sys, threading, time, traceback
-import typing, uuid
+import enum, queue, os, queue, select, selectors, socket, sys, threading, time
+import traceback, typing, uuid
 from src import Config, EventManager, Exports, IRCServer, Logging
 from src import ModuleManager, PollHook, PollSource, Socket, Timers, utils
 
+# marks "setting not found" so stored null values still count as found
+SETTING_UNSET = object()
+
+# "threads": separate read and write threads feeding the main thread.
+# "selectors": everything on the main thread, multiplexed with epoll/kqueue/
+# poll (whichever selectors.DefaultSelector picks)
+IO_BACKENDS = ["threads", "selectors"]
+
+# most time to spend running queued events before doing housekeeping
+# (_check(), flushing coalesced lines) again
+EVENT_BATCH_SECONDS = 0.05
+
 class TriggerResult(enum.Enum):
     Return = 1
     Exception = 2
@@ -55,6 +67,12 @@ class Bot(object):
         self.reconnections = {}
 
         self._event_queue = queue.Queue() # type: typing.Queue[TriggerEvent]
+        self._loop_iterations = 0
+        self._loop_events = 0
+        self._loop_max_batch = 0
+        self._loop_max_depth = 0
+        self._loop_time = 0.0
+        self._loop_max_time = 0.0
 
         self._read_poll = select.poll()
         self._write_poll = select.poll()
@@ -62,8 +80,10 @@ class Bot(object):
         self._rtrigger_server, self._rtrigger_client = socket.socketpair()
         self._read_poll.register(self._rtrigger_server.fileno(), select.POLLIN)
 
-        self._rtrigger_lock = threading.Lock()
+        # reentrant so a signal handler can trigger while we're holding it
+        self._rtrigger_lock = threading.RLock()
         self._rtriggered = False
+        self._select_io = False
         self._write_condition = threading.Condition()
 
         self._read_thread = None
@@ -102,6 +122,12 @@ class Bot(object):
                 self._rtriggered = True
                 self._rtrigger_client.send(b"TRIGGER")
     def trigger_write(self):
+        if self._select_io:
+            # the select loop works out what to write each time around, it
+            # only needs waking when we're not already on it
+            if not utils.is_main_thread():
+                self.trigger_read()
+            return
         with self._write_condition:
             self._write_condition.notify()
 
@@ -128,6 +154,9 @@ class Bot(object):
             func_queue.put([type, returned])
         event_item = TriggerEvent(TriggerEventType.Action, _action)
         self._event_queue.put(event_item)
+        if self._select_io:
+            # the select loop only looks at the queue when it wakes up
+            self.trigger_read()
 
         type, returned = func_queue.get(block=True)
 
@@ -265,6 +294,38 @@ class Bot(object):
     def del_setting(self, setting: str):
         self.database.bot_settings.delete(setting)
 
+    def resolve_setting(self, setting: str, channel: typing.Any=None,
+            server: typing.Optional[IRCServer.Server]=None,
+            default: typing.Any=None, bot: bool=True) -> typing.Any:
+        # channel (or user, for private messages), then server, then bot,
+        # stopping at the first one that has the setting
+        for context in [channel, server, self if bot else None]:
+            if not context == None:
+                value = context.get_setting(setting, SETTING_UNSET)
+                if not value is SETTING_UNSET:
+                    return value
+        return default
+
+    def get_profile(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        # per-hook timings (in milliseconds) grouped by the module that
+        # hooked them. hooks made outside of modules are under "*"
+        profile = {}
+        for context, (merged, hooks) in self._events.get_profile().items():
+            name = "*"
+            if not context == None:
+                module = self.modules.from_context(context)
+                if not module == None:
+                    name = module.name
+
+            module_profile = merged.as_dict()
+            module_profile["hooks"] = {}
+            for hook in hooks:
+                hook_name = "%s:%s" % (hook.event_name,
+                    hook.function.__name__)
+                module_profile["hooks"][hook_name] = hook.profile.as_dict()
+            profile[name] = module_profile
+        return profile
+
     def _daemon_thread(self, target: typing.Callable[[], None]):
         thread = threading.Thread(target=target)
         thread.daemon = True
@@ -275,6 +336,15 @@ class Bot(object):
         self._writing = True
         self._reading = True
 
+        io_backend = self.config.get("io-backend", "threads")
+        if not io_backend in IO_BACKENDS:
+            self.log.warn("Unknown io-backend '%s', using 'threads'",
+                [io_backend])
+        elif io_backend == "selectors":
+            self._select_io = True
+            self._select_loop()
+            return
+
         self._read_thread = self._daemon_thread(
             lambda: self._loop_catch("read", self._read_loop))
         self._write_thread = self._daemon_thread(
@@ -305,12 +375,34 @@ class Bot(object):
                 not self._event_queue.empty()):
             try:
                 item = self._event_queue.get(block=True,
-                    timeout=self.get_poll_timeout())
+                    timeout=self.get_poll_timeout()
+                    ) # type: typing.Optional[TriggerEvent]
             except queue.Empty:
                 # caused by timeout being hit.
-                continue
-            finally:
-                self._check()
+                item = None
+
+            started = time.monotonic()
+            if not self._run_events(item):
+                break
+            self._check()
+            self._flush_coalesced()
+            self._loop_timed(time.monotonic()-started)
+
+    def _run_events(self, item: typing.Optional[TriggerEvent]) -> bool:
+        # run everything that's queued (for up to EVENT_BATCH_SECONDS) so we
+        # only do housekeeping once per wakeup, not once per event
+        deadline = time.monotonic()+EVENT_BATCH_SECONDS
+        depth = self._event_queue.qsize()+(0 if item is None else 1)
+        self._loop_max_depth = max(self._loop_max_depth, depth)
+
+        ran = 0
+        while True:
+            if item is None:
+                try:
+                    item = self._event_queue.get(block=False)
+                except queue.Empty:
+                    break
+            ran += 1
 
             if item.type == TriggerEventType.Action:
                 try:
@@ -318,11 +410,132 @@ class Bot(object):
                 except:
                     self._kill()
                     raise
+                self._flush_coalesced()
             elif item.type == TriggerEventType.Kill:
                 self._kill()
                 if not item.callback == None:
                     item.callback()
+                return False
+
+            item = None
+            if time.monotonic() >= deadline:
+                break
+
+        self._loop_events += ran
+        self._loop_max_batch = max(self._loop_max_batch, ran)
+        return True
+
+    def _loop_timed(self, taken: float):
+        self._loop_iterations += 1
+        self._loop_time += taken
+        self._loop_max_time = max(self._loop_max_time, taken)
+
+    def loop_stats(self) -> typing.Dict[str, typing.Any]:
+        iterations = self._loop_iterations
+        return {"iterations": iterations, "events": self._loop_events,
+            "queue-depth": self._event_queue.qsize(),
+            "max-queue-depth": self._loop_max_depth,
+            "max-batch": self._loop_max_batch,
+            "average-time": self._loop_time/iterations if iterations else 0.0,
+            "max-time": self._loop_max_time}
+
+    def _select_loop(self):
+        selector = selectors.DefaultSelector()
+        trigger_fd = self._rtrigger_server.fileno()
+        trigger_wanted = (self._rtrigger_server, selectors.EVENT_READ)
+
+        while ((self._writing or self._reading) or
+                not self._event_queue.empty()):
+            started = time.monotonic()
+            if not self._run_events(None):
                 break
+            self._check()
+            self._flush_coalesced()
+
+            # fd: (owner, mask)
+            wanted = {trigger_fd: trigger_wanted
+                } # type: typing.Dict[int, typing.Tuple[typing.Any, int]]
+            poll_sources = {} # type: typing.Dict[int, PollSource.PollSource]
+            for fd, server in self.servers.items():
+                mask = 0
+                if self._reading:
+                    mask |= selectors.EVENT_READ
+                if self._writing and server.socket.waiting_immediate_send():
+                    mask |= selectors.EVENT_WRITE
+                if mask:
+                    wanted[fd] = (server.socket, mask)
+            for poll_source in self._poll_sources:
+                for fd in poll_source.get_readables():
+                    wanted[fd] = (poll_source,
+                        wanted.get(fd, (None, 0))[1]|selectors.EVENT_READ)
+                    poll_sources[fd] = poll_source
+                for fd in poll_source.get_writables():
+                    wanted[fd] = (poll_source,
+                        wanted.get(fd, (None, 0))[1]|selectors.EVENT_WRITE)
+                    poll_sources[fd] = poll_source
+            self._select_register(selector, wanted)
+
+            timeout = 0.0
+            if self._event_queue.empty():
+                timeout = self.get_poll_timeout()
+
+            # don't count time spent waiting in select()
+            busy = time.monotonic()-started
+            ready = selector.select(timeout)
+            woken = time.monotonic()
+
+            for key, mask in ready:
+                fd = key.fd
+                if fd == trigger_fd:
+                    with self._rtrigger_lock:
+                        self._rtrigger_server.recv(1024)
+                        self._rtriggered = False
+                elif fd in self.servers:
+                    server = self.servers[fd]
+                    if mask & selectors.EVENT_WRITE:
+                        try:
+                            sent_lines = server._send()
+                        except:
+                            self.log.error("Failed to write to %s",
+                                [str(server)])
+                            raise
+                        server._post_send(sent_lines)
+                    if mask & selectors.EVENT_READ:
+                        lines = server.read()
+                        if lines == None:
+                            server.disconnect()
+                        else:
+                            server._post_read(typing.cast(typing.List[str],
+                                lines))
+                    self._flush_coalesced()
+                elif fd in poll_sources:
+                    if mask & selectors.EVENT_READ:
+                        poll_sources[fd].is_readable(fd)
+                    if mask & selectors.EVENT_WRITE:
+                        poll_sources[fd].is_writable(fd)
+            self._loop_timed(busy+(time.monotonic()-woken))
+        selector.close()
+
+    def _select_register(self, selector: selectors.BaseSelector,
+            wanted: typing.Dict[int, typing.Tuple[typing.Any, int]]):
+        # registrations are checked against what owns the fd, not just the
+        # fd number: a server can disconnect and reconnect between two
+        # select()s and get its old fd number back for a new socket, while
+        # epoll forgot the old registration when the old socket closed
+        registered = selector.get_map()
+        for fd, key in list(registered.items()):
+            if not fd in wanted or not key.data is wanted[fd][0]:
+                selector.unregister(fd)
+        for fd, (owner, mask) in wanted.items():
+            current = registered.get(fd)
+            if current is None:
+                selector.register(fd, mask, owner)
+            elif not current.events == mask:
+                selector.modify(fd, mask, owner)
+
+    def _flush_coalesced(self):
+        for server in self.servers.values():
+            server.flush_coalesced()
 
     def _post_send_factory(self, server, lines):
         return lambda: server._post_send(lines)
@@ -375,7 +588,7 @@ class Bot(object):
                         self._event_queue.put(event_item)
                     elif fd in poll_sources:
                         def _trigger(source, fd):
-                            return lambda: source.is_writeable(fd)
+                            return lambda: source.is_writable(fd)
                         self.trigger(_trigger(poll_sources[fd], fd))
 
     def _read_loop(self):
@@ -27,7 +27,8 @@ class Channels(object):
 
     def get_id(self, channel_name: str, create: bool=True) -> int:
         if create:
-            self._bot.database.channels.add(self._server.id, channel_name)
+            return self._bot.database.channels.get_or_add(self._server.id,
+                channel_name)
         return self._bot.database.channels.get_id(self._server.id, channel_name)
 
     def _name_lower(self, channel_name: str) -> str:
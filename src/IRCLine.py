@@ -1,9 +1,26 @@
-import codecs, datetime, typing, uuid
+import datetime, functools, re, sys, typing, uuid
 from src import EventManager, IRCObject, utils
 
 LINE_MAX = 510
+SOURCE_CACHE_SIZE = 4096
+
+# throttled lines are sent in this order, lowest first
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+PRIORITIES = [PRIORITY_URGENT, PRIORITY_NORMAL, PRIORITY_BULK]
+
+# protocol lines that shouldn't wait behind anything else
+URGENT_COMMANDS = set(["PING", "PONG", "CAP", "AUTHENTICATE", "NICK", "PASS",
+    "USER"])
+
+def command_priority(command: str) -> int:
+    if command.upper() in URGENT_COMMANDS:
+        return PRIORITY_URGENT
+    return PRIORITY_NORMAL
 
 class IRCArgs(object):
+    __slots__ = ["_args"]
     def __init__(self, args: typing.List[str]):
         self._args = args
 
@@ -28,6 +45,7 @@ class IRCArgs(object):
         self._args.append(value)
 
 class Hostmask(object):
+    __slots__ = ["nickname", "username", "hostname", "hostmask"]
     def __init__(self, nickname: str, username: str, hostname: str,
             hostmask: str):
         self.nickname = nickname
@@ -44,29 +62,79 @@ def parse_hostmask(hostmask: str) -> Hostmask:
     username, _, hostname = username.partition("@")
     return Hostmask(nickname, username, hostname, hostmask)
 
+@functools.lru_cache(maxsize=SOURCE_CACHE_SIZE)
+def _parse_source(source: str) -> Hostmask:
+    # the same few sources send most lines, so share their Hostmasks
+    return parse_hostmask(sys.intern(source))
+
 MESSAGE_TAG_ESCAPED = [r"\:", r"\s", r"\\", r"\r", r"\n"]
 MESSAGE_TAG_UNESCAPED = [";", " ", "\\", "\r", "\n"]
+# single pass, so escaping "\\" doesn't then escape the escapes
+MESSAGE_TAG_ESCAPE = str.maketrans(dict(zip(MESSAGE_TAG_UNESCAPED,
+    MESSAGE_TAG_ESCAPED)))
+MESSAGE_TAG_UNESCAPE = dict((e[1], u) for e, u in zip(MESSAGE_TAG_ESCAPED,
+    MESSAGE_TAG_UNESCAPED))
+RE_MESSAGE_TAG_ESCAPE = re.compile(r"\\(.?)", re.S)
+
 def message_tag_escape(s):
-    return utils.irc.multi_replace(s, MESSAGE_TAG_UNESCAPED,
-        MESSAGE_TAG_ESCAPED)
+    return s.translate(MESSAGE_TAG_ESCAPE)
+def _tag_unescape_char(match: typing.Match) -> str:
+    # unknown escapes drop the backslash, as does a trailing backslash
+    return MESSAGE_TAG_UNESCAPE.get(match.group(1), match.group(1))
 def message_tag_unescape(s):
-    unescaped = utils.irc.multi_replace(s, MESSAGE_TAG_ESCAPED,
-        MESSAGE_TAG_UNESCAPED)
-    return unescaped.replace("\\", "")
+    if not "\\" in s:
+        return s
+    return RE_MESSAGE_TAG_ESCAPE.sub(_tag_unescape_char, s)
+
+def _parse_tags(tags_prefix: str) -> typing.Dict[str, typing.Any]:
+    tags = {} # type: typing.Dict[str, typing.Any]
+    for tag in filter(None, tags_prefix.split(";")):
+        tag, sep, value = tag.partition("=")
+        if value:
+            tags[tag] = message_tag_unescape(value)
+        else:
+            tags[tag] = None
+    return tags
 
 class ParsedLine(object):
+    __slots__ = ["_id", "command", "_args", "args", "source", "_tags",
+        "_tags_raw", "_valid", "_assured"]
+
     def __init__(self, command: str, args: typing.List[str],
             source: Hostmask=None,
             tags: typing.Dict[str, str]=None):
-        self.id = str(uuid.uuid4())
+        self._id = None # type: typing.Optional[str]
         self.command = command
         self._args = args
         self.args = IRCArgs(args)
         self.source = source
-        self.tags = tags or {} # type: typing.Dict[str, str]
+        self._tags = tags or {} # type: typing.Optional[typing.Dict[str, str]]
+        self._tags_raw = None # type: typing.Optional[str]
         self._valid = True
         self._assured = False
 
+    # most lines never need an id, so don't generate one until asked
+    @property
+    def id(self) -> str:
+        if self._id is None:
+            self._id = str(uuid.uuid4())
+        return self._id
+    @id.setter
+    def id(self, value: str):
+        self._id = value
+
+    # tags from the wire are parsed the first time they're looked at
+    @property
+    def tags(self) -> typing.Dict[str, str]:
+        if self._tags is None:
+            self._tags = _parse_tags(typing.cast(str, self._tags_raw))
+            self._tags_raw = None
+        return self._tags
+    @tags.setter
+    def tags(self, value: typing.Dict[str, str]):
+        self._tags = value
+        self._tags_raw = None
+
     def __repr__(self):
         return "ParsedLine(%s)" % self.__str__()
     def __str__(self):
@@ -85,7 +153,7 @@ class ParsedLine(object):
     def add_tag(self, tag: str, value: str=None):
         self.tags[tag] = value or ""
     def has_tag(self, tag: str) -> bool:
-        return "tag" in self.tags
+        return tag in self.tags
     def get_tag(self, tag: str) -> typing.Optional[str]:
         return self.tags[tag]
 
@@ -105,8 +173,11 @@ class ParsedLine(object):
     def _format(self) -> typing.Tuple[str, str]:
         pieces = []
         tags = ""
-        if self.tags:
-            tags = self._tag_str(self.tags)
+        if self._tags is None:
+            # never looked at, so the raw tags are still accurate
+            tags = "@%s" % self._tags_raw
+        elif self._tags:
+            tags = self._tag_str(self._tags)
 
         if self.source:
             pieces.append(":%s" % str(self.source))
@@ -130,6 +201,7 @@ class ParsedLine(object):
             return line
 
 class SendableLine(ParsedLine):
+    __slots__ = ["_margin"]
     def __init__(self, command: str, args: typing.List[str],
             margin: int=0, tags: typing.Dict[str, str]=None):
         ParsedLine.__init__(self, command, args, None, tags)
@@ -147,36 +219,31 @@ class SendableLine(ParsedLine):
 
         overflow: typing.Optional[str] = None
 
-        if (n+len(arg.encode("utf8"))) > LINE_MAX:
-            for i, char in enumerate(codecs.iterencode(arg, "utf8")):
-                n += len(char)
-                if n > LINE_MAX:
-                    arg, overflow = arg[:i], arg[i:]
-                    if human_trunc and not overflow[0] == " ":
-                        new_arg, sep, new_overflow = arg.rpartition(" ")
-                        if sep:
-                            arg = new_arg
-                            overflow = new_overflow+overflow
-                    break
+        arg_bytes = arg.encode("utf8")
+        if (n+len(arg_bytes)) > LINE_MAX:
+            cut = max(LINE_MAX-n, 0)
+            # step back out of the middle of a multi-byte character
+            while cut and (arg_bytes[cut]&0xC0) == 0x80:
+                cut -= 1
+            arg = arg_bytes[:cut].decode("utf8")
+            overflow = arg_bytes[cut:].decode("utf8")
+            if human_trunc and not overflow[0] == " ":
+                new_arg, sep, new_overflow = arg.rpartition(" ")
+                if sep:
+                    arg = new_arg
+                    overflow = new_overflow+overflow
         if arg:
             self.args[-1] = last_arg+arg
         return overflow
 
 def parse_line(line: str) -> ParsedLine:
-    tags = {} # type: typing.Dict[str, typing.Any]
+    tags_prefix = None # type: typing.Optional[str]
     source = None # type: typing.Optional[Hostmask]
     command = None
 
     if line[0] == "@":
         tags_prefix, line = line[1:].split(" ", 1)
 
-        for tag in filter(None, tags_prefix.split(";")):
-            tag, sep, value = tag.partition("=")
-            if value:
-                tags[tag] = message_tag_unescape(value)
-            else:
-                tags[tag] = None
-
     line, trailing_separator, trailing_split = line.partition(" :")
 
     trailing = None # type: typing.Optional[str]
@@ -185,7 +252,7 @@ def parse_line(line: str) -> ParsedLine:
 
     if line[0] == ":":
         source_str, line = line[1:].split(" ", 1)
-        source = parse_hostmask(source_str)
+        source = _parse_source(source_str)
 
     command, sep, line = line.partition(" ")
     args = [] # type: typing.List[str]
@@ -195,7 +262,12 @@ def parse_line(line: str) -> ParsedLine:
 
     if not trailing == None:
         args.append(typing.cast(str, trailing))
-    return ParsedLine(command, args, source, tags)
+
+    parsed_line = ParsedLine(command, args, source)
+    if tags_prefix:
+        parsed_line._tags = None
+        parsed_line._tags_raw = tags_prefix
+    return parsed_line
 
 def is_human(line: str):
     return len(line) > 1 and line[0] == "/"
@@ -208,11 +280,13 @@ def parse_human(line: str) -> typing.Optional[ParsedLine]:
 
 class SentLine(IRCObject.Object):
     def __init__(self, events: "EventManager.Events",
-            send_time: datetime.datetime, hostmask: str, line: ParsedLine):
+            send_time: datetime.datetime, hostmask: str, line: ParsedLine,
+            priority: int=PRIORITY_NORMAL):
         self.events = events
         self.send_time = send_time
         self._hostmask = hostmask
         self.parsed_line = line
+        self.priority = priority
 
     def __repr__(self) -> str:
         return "IRCLine.SentLine(%s)" % self.__str__()
@@ -249,6 +323,7 @@ class IRCSendBatch(IRCBatch):
             lines.append(line)
 
         lines.insert(0, ParsedLine("BATCH",
-            ["+%s" % self.identifier, self.type]))
+            ["+%s" % self.identifier, self.type]+self.args,
+            tags=self.tags.copy()))
         lines.append(ParsedLine("BATCH", ["-%s" % self.identifier]))
         return lines
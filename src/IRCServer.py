@@ -5,6 +5,12 @@ from src import IRCObject, IRCSocket, IRCUser, utils
 READ_TIMEOUT_SECONDS = 120
 PING_INTERVAL_SECONDS = 30
 
+MULTILINE_BATCH = "draft/multiline"
+COALESCE_COMMANDS = set(["PRIVMSG", "NOTICE"])
+# (command, target, priority, sorted tags)
+CoalesceKey = typing.Tuple[str, str, int, typing.Tuple[typing.Tuple[str, str],
+    ...]]
+
 class Server(IRCObject.Object):
     def __init__(self,
             bot: "IRCBot.Bot",
@@ -28,6 +34,8 @@ class Server(IRCObject.Object):
         self.username = None # type: typing.Optional[str]
         self.realname = None # type: typing.Optional[str]
         self.hostname = None # type: typing.Optional[str]
+        self._hostmask_margin = (None, 0
+            ) # type: typing.Tuple[typing.Optional[typing.Tuple], int]
 
         self.capability_queue = {
             } # type: typing.Dict[str, utils.irc.Capability]
@@ -40,6 +48,9 @@ class Server(IRCObject.Object):
         self.batches = {} # type: typing.Dict[str, IRCLine.IRCBatch]
 
         self.users = {} # type: typing.Dict[str, IRCUser.User]
+        # users that have no channels as of their last change, pruned after
+        # each line is handled
+        self._orphaned_users: typing.Set[IRCUser.User] = set([])
         self.channels = IRCChannels.Channels(self, self.bot, self.events)
         self.own_modes = {} # type: typing.Dict[str, typing.Optional[str]]
 
@@ -69,6 +80,19 @@ class Server(IRCObject.Object):
         self.ping_sent = False
         self.send_enabled = True
 
+        # (max-bytes, max-lines) when we can send multiline batches, max-lines
+        # being 0 when there isn't one. set by the ircv3_multiline module
+        self.multiline_limits: typing.Optional[typing.Tuple[int, int]] = None
+        # messages sent this loop iteration, to be merged in to batches. a
+        # run is consecutive messages with the same (command, target,
+        # priority, tags); only runs are merged so PRIVMSGs and NOTICEs to the
+        # same target stay in the order they were sent
+        self._coalescing: typing.List[typing.Tuple[CoalesceKey,
+            typing.List[IRCLine.SentLine]]] = []
+        # (target, priority): that target's latest run
+        self._coalescing_runs: typing.Dict[typing.Tuple[str, int],
+            typing.Tuple[CoalesceKey, typing.List[IRCLine.SentLine]]] = {}
+
     def __repr__(self) -> str:
         return "IRCServer.Server(%s)" % self.__str__()
     def __str__(self) -> str:
@@ -80,10 +104,19 @@ class Server(IRCObject.Object):
     def hostmask(self):
         return "%s!%s@%s" % (self.nickname, self.username, self.hostname)
 
+    def hostmask_margin(self) -> int:
+        # space taken by ":nick!user@host " when the server relays our lines
+        key = (self.nickname, self.username, self.hostname)
+        cached_key, margin = self._hostmask_margin
+        if not key == cached_key:
+            margin = len((":%s " % self.hostmask()).encode("utf8"))
+            self._hostmask_margin = (key, margin)
+        return margin
+
     def new_line(self, command: str, args: typing.List[str]=None,
             tags: typing.Dict[str, str]=None) -> IRCLine.SendableLine:
         return IRCLine.SendableLine(command, args or [],
-            len((":%s " % self.hostmask()).encode("utf8")), tags)
+            self.hostmask_margin(), tags)
 
     def connect(self):
         self.socket = IRCSocket.Socket(
@@ -180,6 +213,7 @@ class Server(IRCObject.Object):
             user_id = self.get_user_id(nickname)
             new_user = IRCUser.User(nickname, user_id, self, self.bot)
             self.users[new_user.nickname_lower] = new_user
+            self._orphaned_users.add(new_user)
 
         user = self.users.get(self.irc_lower(nickname), None)
         if user:
@@ -192,9 +226,12 @@ class Server(IRCObject.Object):
         return user
 
     def get_user_id(self, nickname: str) -> int:
-        nickname_lower = self.irc_lower(nickname)
-        self.bot.database.users.add(self.id, nickname_lower)
-        return self.bot.database.users.get_id(self.id, nickname_lower)
+        return self.bot.database.users.get_or_add(self.id,
+            self.irc_lower(nickname))
+    def get_user_ids(self, nicknames: typing.List[str]
+            ) -> typing.Dict[str, int]:
+        return self.bot.database.users.get_or_add_many(self.id,
+            [self.irc_lower(nickname) for nickname in nicknames])
     def has_user_id(self, nickname: str) -> bool:
         id = self.bot.database.users.get_id(self.id, self.irc_lower(nickname))
         return not id == None
@@ -204,8 +241,11 @@ class Server(IRCObject.Object):
 
     def remove_user(self, user: IRCUser.User):
         del self.users[user.nickname_lower]
+        self._orphaned_users.discard(user)
         for channel in user.channels:
             channel.remove_user(user)
+    def orphan_user(self, user: IRCUser.User):
+        self._orphaned_users.add(user)
 
     def quit_user(self, user: IRCUser.User):
         self.remove_user(user)
@@ -243,12 +283,12 @@ class Server(IRCObject.Object):
                 line=IRCLine.parse_line(line))
             self.check_users()
     def check_users(self):
-        prune: typing.List[IRCUser.User] = []
-        for user in self.users.values():
-            if not len(user.channels):
-                prune.append(user)
-        for user in prune:
-            self.remove_user(user)
+        orphaned_users = self._orphaned_users
+        self._orphaned_users = set([])
+        for user in orphaned_users:
+            if (not len(user.channels) and
+                    self.users.get(user.nickname_lower, None) is user):
+                self.remove_user(user)
 
     def until_next_ping(self) -> typing.Optional[float]:
         if self.ping_sent:
@@ -283,7 +323,8 @@ class Server(IRCObject.Object):
             self.events.on("raw.send").call_unsafe(server=self,
                 line=line.parsed_line)
 
-    def send(self, line_parsed: IRCLine.ParsedLine, immediate: bool=False
+    def send(self, line_parsed: IRCLine.ParsedLine, immediate: bool=False,
+            priority: typing.Optional[int]=None
             ) -> typing.Optional[IRCLine.SentLine]:
         if not self.send_enabled:
             return None
@@ -296,16 +337,96 @@ class Server(IRCObject.Object):
             line=line_parsed, events=line_events)
 
         if line_parsed.valid() or line_parsed.assured():
-            line = line_parsed.format()
+            if priority == None:
+                priority = IRCLine.command_priority(line_parsed.command)
+
             line_obj = IRCLine.SentLine(line_events, datetime.datetime.utcnow(),
-                self.hostmask(), line_parsed)
-            self.socket.send(line_obj, immediate=immediate)
+                self.hostmask(), line_parsed, typing.cast(int, priority))
+
+            if not immediate and self._coalescable(line_parsed):
+                key = (line_parsed.command.upper(), line_parsed.args[0],
+                    typing.cast(int, priority),
+                    tuple(sorted(line_parsed.tags.items())))
+                run = self._coalescing_runs.get(key[1:3])
+                if run is None or not run[0] == key:
+                    run = (key, [])
+                    self._coalescing.append(run)
+                    self._coalescing_runs[key[1:3]] = run
+                run[1].append(line_obj)
+            else:
+                # keep things in the order they were sent
+                self.flush_coalesced()
+                self.socket.send(line_obj, immediate=immediate)
 
             if immediate:
                 self.bot.trigger_write()
 
             return line_obj
         return None
+    def _coalescable(self, line: IRCLine.ParsedLine) -> bool:
+        # only client-only tags can go on a multiline batch, and they go on
+        # its opening BATCH rather than on the lines in it
+        if (self.multiline_limits == None or
+                not line.command.upper() in COALESCE_COMMANDS or
+                not len(line.args) == 2 or
+                not all(tag.startswith("+") for tag in line.tags.keys())):
+            return False
+        message = line.args[1]
+        return (not message.startswith("\x01") and
+            len(message.encode("utf8")) <= self.multiline_limits[0])
+
+    def _multiline_groups(self, lines: typing.List[IRCLine.SentLine]
+            ) -> typing.List[typing.List[IRCLine.SentLine]]:
+        max_bytes, max_lines = typing.cast(typing.Tuple[int, int],
+            self.multiline_limits)
+        groups = [] # type: typing.List[typing.List[IRCLine.SentLine]]
+        group = [] # type: typing.List[IRCLine.SentLine]
+        group_bytes = 0
+        for line in lines:
+            # +1 for the newline each line becomes once the batch is joined
+            line_bytes = len(line.parsed_line.args[1].encode("utf8"))+1
+            if group and ((group_bytes+line_bytes-1) > max_bytes or
+                    (max_lines and len(group) == max_lines)):
+                groups.append(group)
+                group = []
+                group_bytes = 0
+            group.append(line)
+            group_bytes += line_bytes
+        if group:
+            groups.append(group)
+        return groups
+
+    def flush_coalesced(self):
+        if not self._coalescing:
+            return
+        coalescing = self._coalescing
+        self._coalescing = []
+        self._coalescing_runs = {}
+
+        for (command, target, priority, tags), lines in coalescing:
+            if self.multiline_limits == None:
+                # lost the capability while these were waiting
+                groups = [[line] for line in lines]
+            else:
+                groups = self._multiline_groups(lines)
+
+            for group in groups:
+                if len(group) == 1:
+                    self.socket.send(group[0])
+                    continue
+
+                batch = IRCLine.IRCSendBatch(MULTILINE_BATCH, [target],
+                    dict(tags))
+                for line in group:
+                    line.parsed_line.tags = {}
+                    batch.add_line(line.parsed_line)
+                batch_lines = batch.get_lines()
+                now = datetime.datetime.utcnow()
+                start, end = [IRCLine.SentLine(self.events.new_root(), now,
+                    self.hostmask(), l, priority)
+                    for l in [batch_lines[0], batch_lines[-1]]]
+                self.socket.send_batch([start]+group+[end], target, priority)
+
     def send_raw(self, line: str):
         return self.send(IRCLine.parse_line(line))
 
@@ -387,17 +508,21 @@ class Server(IRCObject.Object):
             ) -> typing.Optional[IRCLine.SentLine]:
         return self.send(self._line("QUIT", [reason]))
 
-    def send_message(self, target: str, message: str, tags: dict={}
+    def send_message(self, target: str, message: str, tags: dict={},
+            priority: typing.Optional[int]=None
             ) -> typing.Optional[IRCLine.SentLine]:
-        return self.send(self._line("PRIVMSG", [target, message], tags=tags))
+        return self.send(self._line("PRIVMSG", [target, message], tags=tags),
+            priority=priority)
     def send_action(self, target: str, message: str, tags: dict={}
             ) -> typing.Optional[IRCLine.SentLine]:
         return self.send(self._line("PRIVMSG",
             [target, f"\x01ACTION {message}\x01"], tags=tags))
 
-    def send_notice(self, target: str, message: str, tags: dict={}
+    def send_notice(self, target: str, message: str, tags: dict={},
+            priority: typing.Optional[int]=None
             ) -> typing.Optional[IRCLine.SentLine]:
-        return self.send(self._line("NOTICE", [target, message], tags=tags))
+        return self.send(self._line("NOTICE", [target, message], tags=tags),
+            priority=priority)
 
     def send_tagmsg(self, target: str, tags: dict):
         return self.send(self._line("TARGMSG", [], tags=tags))
@@ -1,10 +1,75 @@
-import datetime, socket, ssl, time, threading, typing
+import collections, datetime, select, socket, ssl, time, threading, typing
 from src import IRCLine, Logging, IRCObject, utils
 
 THROTTLE_LINES = 4
 THROTTLE_SECONDS = 1
 UNTHROTTLED_MAX_LINES = 10
 
+READ_SIZE_MIN = 4096
+READ_SIZE_MAX = 65536
+# stop draining a socket after this much so other servers get a look in
+READ_DRAIN_MAX = 1048576
+
+# most lines we'll hand to one sendmsg() call (well under any IOV_MAX)
+SEND_MAX_LINES = 64
+
+# commands whose first arg is who the line is going to
+TARGETED_COMMANDS = set(["PRIVMSG", "NOTICE", "TAGMSG"])
+
+# lines that go out together (e.g. a whole BATCH) and cost one throttle token
+QUEUED_LINE = typing.Tuple[float, typing.List[IRCLine.SentLine]]
+
+def line_target(line: IRCLine.SentLine) -> typing.Optional[str]:
+    parsed_line = line.parsed_line
+    if parsed_line.command.upper() in TARGETED_COMMANDS and parsed_line.args:
+        return parsed_line.args[0]
+    return None
+
+class TargetQueue(object):
+    # lines are taken from each target in turn, so one busy target can't
+    # hold up everyone else
+    def __init__(self):
+        self._targets = collections.OrderedDict(
+            ) # type: typing.Dict[typing.Optional[str], typing.Deque[QUEUED_LINE]]
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def push(self, target: typing.Optional[str], queued_at: float,
+            lines: typing.List[IRCLine.SentLine]) -> int:
+        if not target in self._targets:
+            self._targets[target] = collections.deque()
+        queue = self._targets[target]
+        queue.append((queued_at, lines))
+        self._count += 1
+        return len(queue)
+
+    def pop(self) -> typing.Tuple[typing.Optional[str], QUEUED_LINE]:
+        target, queue = next(iter(self._targets.items()))
+        queued_line = queue.popleft()
+        self._count -= 1
+        if queue:
+            self._targets.move_to_end(target) # type: ignore
+        else:
+            del self._targets[target]
+        return target, queued_line
+
+    def drop_oldest(self, target: typing.Optional[str]) -> QUEUED_LINE:
+        queue = self._targets[target]
+        queued_line = queue.popleft()
+        self._count -= 1
+        if not queue:
+            del self._targets[target]
+        return queued_line
+
+    def clear(self):
+        self._targets.clear()
+        self._count = 0
+
+    def depths(self) -> typing.Dict[typing.Optional[str], int]:
+        return {target: len(queue) for target, queue in self._targets.items()}
+
 class Socket(IRCObject.Object):
     def __init__(self, log: Logging.Log, encoding: str, fallback_encoding: str,
             hostname: str, port: int, bindhost: str, tls: bool,
@@ -27,12 +92,29 @@ class Socket(IRCObject.Object):
 
         self.connected = False
 
-        self._write_buffer = b""
+        # encoded lines waiting to be written, oldest first, and how much of
+        # the oldest one has already been written
+        self._write_buffer = collections.deque(
+            ) # type: typing.Deque[typing.Tuple[bytes, IRCLine.SentLine]]
+        self._write_offset = 0
+        self._write_buffer_size = 0
         self._write_buffer_lock = threading.Lock()
-        self._queued_lines = [] # type: typing.List[IRCLine.SentLine]
-        self._buffered_lines = [] # type: typing.List[IRCLine.SentLine]
-        self._read_buffer = b""
-        self._recent_sends = [] # type: typing.List[float]
+        # one queue per IRCLine.PRIORITY_*, emptied highest priority first
+        self._queued_lines = [TargetQueue() for p in IRCLine.PRIORITIES]
+        self._queued_count = 0
+        # limits for PRIORITY_BULK lines. 0 means no limit
+        self._bulk_max_queued = 0
+        self._bulk_deadline = 0.0
+        self.dropped_lines = 0
+        self._read_buffer = bytearray()
+        self._read_size = READ_SIZE_MIN
+        self._recv_buffer = memoryview(bytearray(READ_SIZE_MAX))
+        # a socket with a timeout waits out the timeout before a recv() that
+        # has nothing to read (even with MSG_DONTWAIT) so check first
+        self._drain_poll = None # type: typing.Optional[typing.Any]
+        # token bucket; a token is spent for each line leaving the queues
+        self._throttle_tokens = float(THROTTLE_LINES)
+        self._throttle_refilled = time.monotonic()
         self.cached_fileno = None # type: typing.Optional[int]
         self.bytes_written = 0
         self.bytes_read = 0
@@ -76,6 +158,8 @@ class Socket(IRCObject.Object):
 
         self.connect_time = time.time()
         self.cached_fileno = self._socket.fileno()
+        self._drain_poll = select.poll()
+        self._drain_poll.register(self.cached_fileno, select.POLLIN)
         self.connected = True
 
     def disconnect(self):
@@ -89,129 +173,262 @@ class Socket(IRCObject.Object):
         except:
             pass
 
+    def _recv(self) -> int:
+        size = self._read_size
+        read = self._socket.recv_into(self._recv_buffer[:size], size)
+        self._read_buffer += self._recv_buffer[:read]
+
+        if read == size:
+            self._read_size = min(size*2, READ_SIZE_MAX)
+        elif read < size//4:
+            self._read_size = max(size//2, READ_SIZE_MIN)
+        return read
+
+    def _drain(self) -> int:
+        drained = 0
+        tls = isinstance(self._socket, ssl.SSLSocket)
+        while drained < READ_DRAIN_MAX:
+            try:
+                if tls:
+                    # already decrypted data doesn't show up in poll()
+                    if not self._socket.pending():
+                        break
+                    read = self._recv()
+                elif self._drain_poll and self._drain_poll.poll(0):
+                    read = self._recv()
+                else:
+                    break
+            except (BlockingIOError, ssl.SSLWantReadError, socket.timeout):
+                break
+            except OSError:
+                # leave it for the next read() to find
+                break
+            if not read:
+                break
+            drained += read
+        return drained
+
+    def _decode(self, data: bytearray) -> typing.Optional[str]:
+        try:
+            return data.decode(self._encoding)
+        except UnicodeDecodeError:
+            self.log.trace("can't decode line with '%s', falling back: %s",
+                [self._encoding, data])
+            try:
+                return data.decode(self._fallback_encoding)
+            except UnicodeDecodeError:
+                return None
+
     def read(self) -> typing.Optional[typing.List[str]]:
-        data = b""
         try:
-            data = self._socket.recv(4096)
+            read = self._recv()
         except (ConnectionResetError, socket.timeout, OSError):
             self.disconnect()
             return None
-        if not data:
+        if not read:
             self.disconnect()
             return None
-        self.bytes_read += len(data)
-        data = self._read_buffer+data
-        self._read_buffer = b""
+        read += self._drain()
+        self.bytes_read += read
+        self.last_read = time.monotonic()
 
-        data_lines = [line.strip(b"\r") for line in data.split(b"\n")]
-        if data_lines[-1]:
-            self._read_buffer = data_lines[-1]
+        end = self._read_buffer.rfind(b"\n")
+        if end == -1:
             self.log.trace("recevied and buffered non-complete line: %s",
-                [data_lines[-1]])
+                [bytes(self._read_buffer)])
+            return []
 
-        data_lines.pop(-1)
-        decoded_lines = []
-
-        for line in data_lines:
-            try:
-                decoded_line = line.decode(self._encoding)
-            except UnicodeDecodeError:
-                self.log.trace("can't decode line with '%s', falling back: %s",
-                    [self._encoding, line])
-                try:
-                    decoded_line = line.decode(self._fallback_encoding)
-                except UnicodeDecodeError:
-                    continue
-            decoded_lines.append(decoded_line)
+        data = self._read_buffer[:end]
+        del self._read_buffer[:end+1]
+        if self._read_buffer:
+            self.log.trace("recevied and buffered non-complete line: %s",
+                [bytes(self._read_buffer)])
 
-        self.last_read = time.monotonic()
+        decoded_lines = [] # type: typing.List[str]
+        try:
+            # the common case: every line decodes, do them all at once
+            decoded = data.decode(self._encoding)
+        except UnicodeDecodeError:
+            for line in data.split(b"\n"):
+                decoded_line = self._decode(line.strip(b"\r"))
+                if not decoded_line is None:
+                    decoded_lines.append(decoded_line)
+        else:
+            decoded_lines = [line.strip("\r") for line in decoded.split("\n")]
         return decoded_lines
 
     def _immediate_buffer(self, line: IRCLine.SentLine):
-        self._write_buffer += line.for_wire()
-        self._buffered_lines.append(line)
+        data = line.for_wire()
+        self._write_buffer.append((data, line))
+        self._write_buffer_size += len(data)
 
     def send(self, line: IRCLine.SentLine, immediate: bool=False):
         with self._write_buffer_lock:
             if immediate:
+                # skips the queues but not the bucket, it just goes in to
+                # debt that queued lines then wait out
+                if self._write_throttling:
+                    self.throttle_refill()
+                    self._throttle_tokens -= 1
                 self._immediate_buffer(line)
             else:
-                self._queued_lines.append(line)
+                self._queue([line], line_target(line), line.priority)
+
+    def send_batch(self, lines: typing.List[IRCLine.SentLine],
+            target: typing.Optional[str], priority: int):
+        with self._write_buffer_lock:
+            self._queue(lines, target, priority)
+
+    def _queue(self, lines: typing.List[IRCLine.SentLine],
+            target: typing.Optional[str], priority: int):
+        queue = self._queued_lines[priority]
+        queued = queue.push(target, time.monotonic(), lines)
+        self._queued_count += 1
+
+        if (priority == IRCLine.PRIORITY_BULK and self._bulk_max_queued and
+                queued > self._bulk_max_queued):
+            queue.drop_oldest(target)
+            self._queued_count -= 1
+            self._line_dropped(target, "queue full")
 
     def _fill_throttle(self):
         with self._write_buffer_lock:
-            if not self._write_buffer and self._throttle_when_empty:
+            if not self._write_buffer_size and self._throttle_when_empty:
                 self._throttle_when_empty = False
                 self._write_throttling = True
-                self._recent_sends.clear()
+                self._throttle_tokens = float(self._throttle_lines)
+                self._throttle_refilled = time.monotonic()
 
             throttle_space = self.throttle_space()
-            if not self._buffered_lines and throttle_space:
-                to_buffer = self._queued_lines[:throttle_space]
-                self._queued_lines = self._queued_lines[throttle_space:]
-                for line in to_buffer:
-                    self._immediate_buffer(line)
+            if not self._write_buffer and throttle_space:
+                now = time.monotonic()
+                to_buffer = throttle_space
+                for priority, queue in enumerate(self._queued_lines):
+                    while queue and to_buffer > 0:
+                        target, (queued_at, lines) = queue.pop()
+                        self._queued_count -= 1
+
+                        if (priority == IRCLine.PRIORITY_BULK and
+                                self._bulk_deadline and
+                                (now-queued_at) > self._bulk_deadline):
+                            self._line_dropped(target, "too old")
+                            continue
+
+                        for line in lines:
+                            self._immediate_buffer(line)
+                        # a multiline batch costs a token per line of
+                        # content, not for its BATCH +/- framing. it's sent
+                        # whole, which can leave the bucket in debt
+                        cost = max(1, len([line for line in lines
+                            if not line.parsed_line.command == "BATCH"]))
+                        to_buffer -= cost
+                        if self._write_throttling:
+                            self._throttle_tokens -= cost
+
+    def _line_dropped(self, target: typing.Optional[str], reason: str):
+        self.dropped_lines += 1
+        self.log.debug("dropped queued line for %s (%s)", [target, reason])
+
+    def _write(self, buffers: typing.List[typing.Any]) -> int:
+        if len(buffers) > 1 and hasattr(self._socket, "sendmsg"
+                ) and not isinstance(self._socket, ssl.SSLSocket):
+            return self._socket.sendmsg(buffers)
+        # SSLSocket.sendmsg() isn't implemented
+        return self._socket.send(b"".join(buffers))
 
     def _send(self) -> typing.List[IRCLine.SentLine]:
         sent_lines = [] # type: typing.List[IRCLine.SentLine]
         with self._write_buffer_lock:
-            bytes_written_i = self._socket.send(self._write_buffer)
-            bytes_written = self._write_buffer[:bytes_written_i]
-
-            sent_lines_count = bytes_written.count(b"\n")
-            for i in range(sent_lines_count):
-                sent_lines.append(self._buffered_lines.pop(0))
-
-            self._write_buffer = self._write_buffer[bytes_written_i:]
+            buffers = [] # type: typing.List[typing.Any]
+            for data, line in self._write_buffer:
+                if not buffers and self._write_offset:
+                    buffers.append(memoryview(data)[self._write_offset:])
+                else:
+                    buffers.append(data)
+                if len(buffers) == SEND_MAX_LINES:
+                    break
+
+            bytes_written_i = self._write(buffers)
+            self._write_buffer_size -= bytes_written_i
+
+            # a line only counts as sent once its last byte is written
+            written = bytes_written_i+self._write_offset
+            while self._write_buffer:
+                data, line = self._write_buffer[0]
+                if written < len(data):
+                    break
+                written -= len(data)
+                self._write_buffer.popleft()
+                sent_lines.append(line)
+            self._write_offset = written
 
         self.bytes_written += bytes_written_i
-
-        now = time.monotonic()
-        self._recent_sends.extend([now]*sent_lines_count)
-        self.last_send = now
+        self.last_send = time.monotonic()
 
         return sent_lines
 
     def clear_send_buffer(self):
-        self._queued_lines.clear()
+        with self._write_buffer_lock:
+            for queue in self._queued_lines:
+                queue.clear()
+            self._queued_count = 0
+
+    def queue_depths(self) -> typing.Dict[typing.Optional[str], int]:
+        depths = collections.Counter(
+            ) # type: typing.Dict[typing.Optional[str], int]
+        with self._write_buffer_lock:
+            for queue in self._queued_lines:
+                depths.update(queue.depths())
+        return dict(depths)
+
+    def set_bulk_limits(self, max_queued: int, deadline: float):
+        self._bulk_max_queued = max_queued
+        self._bulk_deadline = deadline
 
     def waiting_throttled_send(self) -> bool:
-        return bool(len(self._queued_lines))
+        return bool(self._queued_count)
     def waiting_immediate_send(self) -> bool:
-        return bool(len(self._write_buffer))
+        return bool(self._write_buffer_size)
 
     def throttle_done(self) -> bool:
         return self.send_throttle_timeout() == 0
 
-    def throttle_prune(self):
+    def _throttle_rate(self) -> float:
+        # tokens per second
+        return self._throttle_lines/self._throttle_seconds
+
+    def throttle_refill(self):
         now = time.monotonic()
-        popped = 0
-        for i, recent_send in enumerate(self._recent_sends[:]):
-            time_since = now-recent_send
-            if time_since >= self._throttle_seconds:
-                self._recent_sends.pop(i-popped)
-                popped += 1
+        if self._throttle_seconds > 0:
+            tokens = (self._throttle_tokens+
+                (now-self._throttle_refilled)*self._throttle_rate())
+        else:
+            tokens = self._throttle_lines
+        self._throttle_tokens = min(tokens, self._throttle_lines)
+        self._throttle_refilled = now
 
     def throttle_space(self) -> int:
         if not self._write_throttling:
             return UNTHROTTLED_MAX_LINES
-        return max(0, self._throttle_lines-len(self._recent_sends))
+        self.throttle_refill()
+        return max(0, int(self._throttle_tokens))
 
     def send_throttle_timeout(self) -> float:
-        if len(self._write_buffer) or not self._write_throttling:
+        if self._write_buffer_size or not self._write_throttling:
             return 0
 
-        self.throttle_prune()
         if self.throttle_space() > 0:
             return 0
-
-        time_left = self._recent_sends[0]+self._throttle_seconds
-        time_left = time_left-time.monotonic()
-        return time_left
+        elif not self._throttle_lines:
+            # "0 lines" never refills, just check back every so often
+            return max(self._throttle_seconds, THROTTLE_SECONDS)
+        return (1-self._throttle_tokens)/self._throttle_rate()
 
     def enable_write_throttle(self):
         self._throttle_when_empty = True
 
     def set_throttle(self, lines: int, seconds: int):
+        self.throttle_refill()
         self._throttle_lines = lines
         self._throttle_seconds = seconds
+        self._throttle_tokens = min(self._throttle_tokens, lines)
@@ -50,6 +50,8 @@ class User(IRCObject.Object):
         self.channels.add(channel)
     def part_channel(self, channel: "IRCChannel.Channel"):
         self.channels.remove(channel)
+        if not self.channels:
+            self.server.orphan_user(self)
 
     def set_setting(self, setting: str, value: typing.Any):
         self.bot.database.user_settings.set(self.get_id(), setting, value)
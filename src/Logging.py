@@ -9,6 +9,7 @@ LEVELS = {
     "error": logging.ERROR,
     "critical": logging.CRITICAL
 }
+NO_LEVEL = logging.CRITICAL+1
 
 class BitBotFormatter(logging.Formatter):
     def formatTime(self, record, datefmt=None):
@@ -49,10 +50,11 @@ class Log(object):
         stdout_handler.setFormatter(formatter)
         self.logger.addHandler(stdout_handler)
 
-        hook_handler = HookedHandler(self._on_log)
-        hook_handler.setLevel(LEVELS["trace"])
-        hook_handler.setFormatter(formatter)
-        self.logger.addHandler(hook_handler)
+        # nothing is listening to hooked logs until set_hook_level() is called
+        self._hook_handler = HookedHandler(self._on_log)
+        self._hook_handler.setLevel(NO_LEVEL)
+        self._hook_handler.setFormatter(formatter)
+        self.logger.addHandler(self._hook_handler)
 
         if to_file:
             if "TRACE" in file_levels:
@@ -78,8 +80,20 @@ class Log(object):
                 warn_handler.setFormatter(formatter)
                 self.logger.addHandler(warn_handler)
 
+        self._update_level()
+
+    def _update_level(self):
+        # let the logger drop records no handler wants before they're
+        # formatted
+        self.logger.setLevel(min(h.level for h in self.logger.handlers))
+    def trace_enabled(self) -> bool:
+        return self.logger.isEnabledFor(LEVELS["trace"])
+
     def hook(self, func: typing.Callable[[int, str], None]):
         self._hooks.append(func)
+    def set_hook_level(self, level: typing.Optional[int]):
+        self._hook_handler.setLevel(NO_LEVEL if level is None else level)
+        self._update_level()
     def _on_log(self, levelno, line):
         for func in self._hooks:
             func(levelno, line)
@@ -1,6 +1,7 @@
 import dataclasses, datetime, enum, gc, glob, importlib, importlib.util, io
 import inspect, os, sys, typing, uuid
-from src import Config, EventManager, Exports, IRCBot, Logging, Timers, utils
+from src import Cache, Config, EventManager, Exports, IRCBot, Logging, Timers
+from src import utils
 
 class ModuleException(Exception):
     pass
@@ -52,6 +53,8 @@ class BaseModule(object):
     exports: Exports.Exports
     timers: Timers.Timers
     log: Logging.Log
+    # the bot's cache, with keys scoped to this module
+    cache: Cache.CacheNamespace
 
     def on_load(self):
         pass
@@ -250,7 +253,8 @@ class ModuleManager(object):
         context_exports = self.exports.new_context(context)
         context_timers = self.timers.new_context(context)
         module_object = module_object_pointer(definition, bot, context_events,
-            context_exports, context_timers, self.log)
+            context_exports, context_timers, self.log,
+            bot.cache.namespace(definition.name))
         module_object.on_load()
 
         module_title = (getattr(module_object, "_name", None) or
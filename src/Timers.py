@@ -1,7 +1,11 @@
-import time, typing, uuid
+import heapq, itertools, time, typing, uuid
 from src import Database, EventManager, Logging, PollHook
 
 T_CALLBACK = typing.Callable[["Timer"], None]
+COMPACT_MINIMUM = 64
+# persistent timers due further away than this are left in the database until
+# they get closer
+LOAD_HORIZON = 60.0*60.0 # 1 hour
 
 class Timer(object):
     def __init__(self, id: str, context: typing.Optional[str], name: str,
@@ -17,6 +21,7 @@ class Timer(object):
             self.set_next_due()
         self.kwargs = kwargs
         self.callback = callback
+        self.persist = False
         self._done = False
 
     def set_next_due(self):
@@ -43,30 +48,72 @@ class Timers(PollHook.PollHook):
         self.database = database
         self.events = events
         self.log = log
-        self.timers = [] # type: typing.List[Timer]
-        self.context_timers = {} # type: typing.Dict[str, typing.List[Timer]]
+
+        self._timers = {} # type: typing.Dict[str, Timer]
+        self._context_timers = {} # type: typing.Dict[str, typing.Set[Timer]]
+        self._by_name = {} # type: typing.Dict[str, typing.Dict[str, Timer]]
+
+        # (next_due, sequence, timer). cancelled, purged and rescheduled
+        # timers are left in the heap and dealt with when they're popped
+        self._heap = [] # type: typing.List[typing.Tuple[float, int, Timer]]
+        self._sequence = itertools.count()
+        self._compact_at = COMPACT_MINIMUM
+
+        self._loaded_until = None # type: typing.Optional[float]
+        self._next_unloaded = None # type: typing.Optional[float]
 
     def new_context(self, context: str) -> "TimersContext":
         return TimersContext(self, context)
 
-    def setup(self, timers: typing.List[typing.Tuple[str, dict]]):
-        for name, timer in timers:
-            id = name.split("timer-", 1)[1]
-            self._add(None, timer["name"], timer["delay"], timer[
-                "next-due"], id, False, timer["kwargs"])
+    def setup(self):
+        self._load_until(time.time()+LOAD_HORIZON)
+
+    def _load_rows(self, rows: typing.List[
+            typing.Tuple[str, str, float, float, dict]]):
+        for id, name, delay, next_due, kwargs in rows:
+            if not id in self._timers:
+                self._add(None, name, delay, next_due, id, False,
+                    kwargs).persist = True
+    def _load_until(self, until: float):
+        self._load_rows(self.database.timers.get_due(self._loaded_until,
+            until))
+        self._loaded_until = until
+        self._next_unloaded = self.database.timers.next_due_after(until)
 
     def _persist(self, timer: Timer):
-        self.database.bot_settings.set("timer-%s" % timer.id, {
-            "name": timer.name, "delay": timer.delay,
-            "next-due": timer.next_due, "kwargs": timer.kwargs})
+        self.database.timers.add(timer.id, timer.name, timer.delay,
+            timer.next_due, timer.kwargs)
     def _remove(self, timer: Timer):
-        if timer.context:
-            self.context_timers[timer.context].remove(timer)
-            if not self.context_timers[timer.context]:
-                del self.context_timers[timer.context]
-        else:
-            self.timers.remove(timer)
-        self.database.bot_settings.delete("timer-%s" % timer.id)
+        if not self._timers.get(timer.id) is timer:
+            # already removed, e.g. its context was purged
+            return
+        del self._timers[timer.id]
+
+        if timer.context in self._context_timers:
+            self._context_timers[timer.context].discard(timer)
+            if not self._context_timers[timer.context]:
+                del self._context_timers[timer.context]
+
+        name_lower = timer.name.lower()
+        del self._by_name[name_lower][timer.id]
+        if not self._by_name[name_lower]:
+            del self._by_name[name_lower]
+
+        if timer.persist:
+            self.database.timers.delete(timer.id)
+
+    def _schedule(self, timer: Timer):
+        heapq.heappush(self._heap,
+            (timer.next_due, next(self._sequence), timer))
+    def _compact(self):
+        # stop lazily-deleted entries piling up. runs at most once per
+        # doubling of the heap, so amortised O(1) per add
+        for timer in [t for t in self._timers.values() if t.done()]:
+            self._remove(timer)
+        self._heap = [(t.next_due, next(self._sequence), t)
+            for t in self._timers.values()]
+        heapq.heapify(self._heap)
+        self._compact_at = max(COMPACT_MINIMUM, len(self._heap)*2)
 
     def add(self, name: str, callback: T_CALLBACK, delay: float,
             next_due: float=None, **kwargs) -> Timer:
@@ -87,48 +134,85 @@ class Timers(PollHook.PollHook):
         timer = Timer(id, context, name, delay, next_due, kwargs,
             callback=callback)
         if persist:
+            timer.persist = True
             self._persist(timer)
 
         if context and not persist:
-            if not context in self.context_timers:
-                self.context_timers[context] = []
-            self.context_timers[context].append(timer)
-        else:
-            self.timers.append(timer)
+            if not context in self._context_timers:
+                self._context_timers[context] = set([])
+            self._context_timers[context].add(timer)
+
+        self._timers[timer.id] = timer
+        name_lower = name.lower()
+        if not name_lower in self._by_name:
+            self._by_name[name_lower] = {}
+        self._by_name[name_lower][timer.id] = timer
+
+        self._schedule(timer)
         return timer
 
+    def _pop_dead(self):
+        # drop finished timers from the top of the heap and move rescheduled
+        # ones to where they now belong
+        while self._heap:
+            due, _, timer = self._heap[0]
+            if timer.done() or not self._timers.get(timer.id) is timer:
+                heapq.heappop(self._heap)
+                self._remove(timer)
+            elif not due == timer.next_due:
+                heapq.heapreplace(self._heap,
+                    (timer.next_due, next(self._sequence), timer))
+            else:
+                break
+
     def next(self) -> typing.Optional[float]:
-        times = list(filter(None,
-            [timer.time_left() for timer in self.get_timers()]))
-        if not times:
+        if len(self._heap) >= self._compact_at:
+            self._compact()
+        self._pop_dead()
+
+        next_due = None # type: typing.Optional[float]
+        if self._heap:
+            next_due = self._heap[0][0]
+        if not self._next_unloaded is None:
+            next_due = min(next_due or self._next_unloaded,
+                self._next_unloaded)
+        if next_due is None:
             return None
-        return max(min(times), 0)
+        return max(next_due-time.time(), 0)
 
     def get_timers(self) -> typing.List[Timer]:
-        return self.timers + sum(self.context_timers.values(), [])
+        return list(self._timers.values())
 
     def find_all(self, name: str) -> typing.List[Timer]:
-        name_lower = name.lower()
-        timers = self.get_timers()
-        found = [] # type: typing.List[Timer]
-        for timer in timers:
-            if timer.name.lower() == name_lower:
-                found.append(timer)
-
-        return found
+        # we might not have loaded all the matching persistent timers yet
+        self._load_rows(self.database.timers.get_by_name(name))
+        return list(self._by_name.get(name.lower(), {}).values())
 
     def call(self):
-        for timer in self.get_timers():
-            if timer.due():
+        now = time.time()
+        if not self._next_unloaded is None and self._next_unloaded <= now:
+            self._load_until(now+LOAD_HORIZON)
+        due = [] # type: typing.List[Timer]
+        # take everything that's due before calling anything, so a callback
+        # that adds or redoes a zero-delay timer can't keep us here forever
+        while self._heap and self._heap[0][0] <= now:
+            self._pop_dead()
+            if self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+
+        for timer in due:
+            if not timer.done():
                 timer.finish()
                 timer.callback(timer)
             if timer.done():
                 self._remove(timer)
+            else:
+                self._schedule(timer)
 
     def purge_context(self, context: str):
-        if context in self.context_timers:
-            del self.context_timers[context]
-
+        if context in self._context_timers:
+            for timer in self._context_timers.pop(context):
+                self._remove(timer)
 class TimersContext(object):
     def __init__(self, parent: Timers, context: str):
         self._parent = parent
@@ -21,9 +21,11 @@ class Module(ModuleManager.BaseModule):
 
     def _get_alias(self, server, target, command):
         setting = "%s%s" % (SETTING_PREFIX, command)
-        command = self.bot.get_setting(setting,
-            server.get_setting(setting,
-            target.get_setting(setting, None)))
+        # bot-wide aliases take precedence over server and channel ones
+        for context in [self.bot, server, target]:
+            command = context.get_setting(setting, None)
+            if not command == None:
+                break
         if not command == None:
             command, _, args = command.partition(" ")
             return command, args
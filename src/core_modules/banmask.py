@@ -18,7 +18,7 @@ class Module(ModuleManager.BaseModule):
         return out
     @utils.export("ban-mask")
     def banmask(self, server, channel, user):
-        format = channel.get_setting("ban-format",
-            server.get_setting("ban-format", "*!${u}@${h}"))
+        format = self.bot.resolve_setting("ban-format", channel=channel,
+            server=server, default="*!${u}@${h}", bot=False)
         return self._format_hostmask(user, format)
 
@@ -1,8 +1,9 @@
 #--depends-on config
 
-import enum, re, shlex, string, traceback, typing
+import collections, enum, inspect, queue, re, shlex, string, threading
+import traceback, typing
 from src import EventManager, IRCLine, ModuleManager, utils
-from . import outs
+from . import matcher, outs
 
 COMMAND_METHOD = "command-method"
 COMMAND_METHODS = ["PRIVMSG", "NOTICE"]
@@ -14,6 +15,9 @@ WORD_BOUNDARIES = [" "]
 
 NON_ALPHANUMERIC = [char for char in string.printable if not char.isalnum()]
 
+THREADED_WORKERS = 4
+THREADED_TIMEOUT = 30.0
+
 class OutType(enum.Enum):
     OUT = 1
     ERR = 2
@@ -28,6 +32,12 @@ class CommandEvent(object):
         self.command = command
         self.args = args
 
+class PendingCommand(object):
+    def __init__(self, event_kwargs, done=False):
+        self.event_kwargs = event_kwargs
+        self.done = done
+        self.timer = None
+
 SETTING_COMMANDMETHOD = utils.OptionsSetting(COMMAND_METHODS, COMMAND_METHOD,
     "Set the method used to respond to commands")
 
@@ -46,6 +56,34 @@ SETTING_COMMANDMETHOD = utils.OptionsSetting(COMMAND_METHODS, COMMAND_METHOD,
 @utils.export("channelset", utils.BoolSetting("prefixed-commands",
     "Disable/enable responding to prefixed commands in-channel"))
 class Module(ModuleManager.BaseModule):
+    def on_load(self):
+        self._regex_matcher = None
+        self._regex_generation = -1
+
+        # postprocess waiting on a threaded command, per target, so responses
+        # go out in the order commands were received
+        self._pending = {}
+
+        self._work_queue = queue.Queue()
+        self._workers = []
+        for i in range(int(self.bot.config.get("command-workers",
+                THREADED_WORKERS))):
+            thread = threading.Thread(target=self._work_loop)
+            thread.daemon = True
+            thread.start()
+            self._workers.append(thread)
+
+    def unload(self):
+        for thread in self._workers:
+            self._work_queue.put(None)
+
+    def _work_loop(self):
+        while True:
+            func = self._work_queue.get(block=True)
+            if func is None:
+                break
+            func()
+
     @utils.hook("new.user")
     @utils.hook("new.channel")
     def new(self, event):
@@ -55,8 +93,7 @@ class Module(ModuleManager.BaseModule):
             target = event["channel"]
 
     def has_command(self, command):
-        return command.lower() in self.events.on("received").on(
-            "command").get_children()
+        return self.events.on("received.command").has_child(command)
     def get_hooks(self, command):
         return self.events.on("received.command").on(command
             ).get_hooks()
@@ -68,9 +105,8 @@ class Module(ModuleManager.BaseModule):
     def _command_method(self, server, target, is_channel):
         default = "PRIVMSG" if is_channel else "NOTICE"
 
-        return target.get_setting(COMMAND_METHOD,
-            server.get_setting(COMMAND_METHOD,
-            self.bot.get_setting(COMMAND_METHOD, default))).upper()
+        return self.bot.resolve_setting(COMMAND_METHOD, channel=target,
+            server=server, default=default).upper()
 
     def _find_command_hook(self, server, target, is_channel, command, user,
             command_prefix, args):
@@ -200,20 +236,101 @@ class Module(ModuleManager.BaseModule):
             new_event = self.events.on(hook.event_name).make_event(**event_kwargs)
             self.log.trace("calling command '%s': %s", [command, new_event.kwargs])
 
+            if hook.get_kwarg("threaded", False):
+                self._call_threaded(target, command, hook, new_event,
+                    event_kwargs)
+                return False
+
+            returned = None
             try:
-                hook.call(new_event)
+                returned = hook.call(new_event)
             except utils.EventError as e:
                 stderr.write(str(e))
             eaten = new_event.eaten
+
+            if inspect.isgenerator(returned):
+                # the hook is waiting on HTTP requests (see
+                # utils.http.run_generator). it runs up to its first request
+                # here, so it has had the chance to eat the event after this
+                self._call_generator(target, command, hook, returned,
+                    event_kwargs)
+                return new_event.eaten
         else:
             if check_message:
                 stderr.write("%s: %s" % (user.nickname, check_message))
 
-        self._check("postprocess", event_kwargs)
         # postprocess - send stdout/stderr and typing tag
+        if target in self._pending:
+            self._pending[target].append(PendingCommand(event_kwargs, True))
+        else:
+            self._check("postprocess", event_kwargs)
 
         return eaten
 
+    def _add_pending(self, target, command, hook, event_kwargs):
+        pending = PendingCommand(event_kwargs)
+        if not target in self._pending:
+            self._pending[target] = collections.deque()
+        self._pending[target].append(pending)
+
+        timeout = hook.get_kwarg("timeout", THREADED_TIMEOUT)
+        pending.timer = self.timers.add("command-timeout",
+            lambda timer: self._threaded_timeout(target, command, pending),
+            timeout)
+        return pending
+
+    def _call_generator(self, target, command, hook, generator,
+            event_kwargs):
+        pending = self._add_pending(target, command, hook, event_kwargs)
+
+        def _done(error):
+            if isinstance(error, utils.EventError):
+                event_kwargs["stderr"].write(str(error))
+            elif not error is None:
+                self.log.error("failed to call command '%s'", [command],
+                    exc_info=error)
+            self._threaded_done(target, pending)
+        utils.http.run_generator(generator, _done, self.bot.trigger)
+
+    def _call_threaded(self, target, command, hook, event, event_kwargs):
+        pending = self._add_pending(target, command, hook, event_kwargs)
+
+        def _work():
+            try:
+                hook.call(event)
+            except utils.EventError as e:
+                event_kwargs["stderr"].write(str(e))
+            except Exception:
+                self.log.error("failed to call threaded command '%s'",
+                    [command], exc_info=True)
+            self.bot.trigger(lambda: self._threaded_done(target, pending))
+        self._work_queue.put(_work)
+
+    def _threaded_done(self, target, pending):
+        if not pending.done:
+            pending.timer.cancel()
+            pending.done = True
+            self._flush_pending(target)
+    def _threaded_timeout(self, target, command, pending):
+        if not pending.done:
+            self.log.warn("command '%s' timed out", [command])
+            # the handler's thread can't be stopped, so give postprocess
+            # fresh outputs that the handler no longer has a reference to
+            stdout = pending.event_kwargs["stdout"]
+            stderr = outs.StdOut(stdout.prefix)
+            stderr.write("Command timed out")
+            pending.event_kwargs["stdout"] = outs.StdOut(stdout.prefix)
+            pending.event_kwargs["stderr"] = stderr
+            pending.done = True
+            self._flush_pending(target)
+
+    def _flush_pending(self, target):
+        pendings = self._pending[target]
+        while pendings and pendings[0].done:
+            self._check("postprocess", pendings.popleft().event_kwargs)
+        if not pendings:
+            del self._pending[target]
+
     @utils.hook("postprocess.command")
     @utils.kwarg("priority", EventManager.PRIORITY_LOW)
     def postprocess(self, event):
@@ -230,7 +347,8 @@ class Module(ModuleManager.BaseModule):
         self._out(event["server"], event["target"], event["target_str"],
             event["is_channel"], obj, type, event["tags"])
 
-    def _out(self, server, target, target_str, is_channel, obj, type, tags):
+    def _out(self, server, target, target_str, is_channel, obj, type, tags,
+            priority=None):
         if type == OutType.OUT:
             color = utils.consts.GREEN
         else:
@@ -258,7 +376,7 @@ class Module(ModuleManager.BaseModule):
 
         if obj._assured:
             line.assure()
-        server.send(line)
+        server.send(line, priority=priority)
 
     @utils.hook("preprocess.command")
     def _check_min_args(self, event):
@@ -274,8 +392,8 @@ class Module(ModuleManager.BaseModule):
             return utils.consts.PERMISSION_HARD_FAIL, error
 
     def _command_prefix(self, server, channel):
-        return channel.get_setting("command-prefix",
-            server.get_setting("command-prefix", "!"))
+        return self.bot.resolve_setting("command-prefix", channel=channel,
+            server=server, default="!", bot=False)
 
     @utils.hook("received.message.channel", priority=EventManager.PRIORITY_LOW)
     def channel_message(self, event):
@@ -328,28 +446,27 @@ class Module(ModuleManager.BaseModule):
                     command=command, command_prefix=command_prefix,
                     is_channel=True)
         else:
-            regex_hooks = self.events.on("command.regex").get_hooks()
-            for hook in regex_hooks:
-                if event["action"] and hook.get_kwarg("ignore_action", True):
-                    continue
-                if event["statusmsg"] and not hook.get_kwarg("statusmsg", False
-                        ):
-                    continue
+            matches = self._get_regex_matcher().match(event["message"],
+                event["action"], event["statusmsg"])
+            for regex_hook, match in matches:
+                res = self.command(event["server"], event["channel"],
+                    event["target_str"], True, event["user"],
+                    regex_hook.command, "", event["line"], regex_hook.hook,
+                    match=match, message=event["message"], command_prefix="",
+                    action=event["action"], expect_output=False,
+                    buffer_line=event["buffer_line"])
+
+                if res:
+                    break
 
-                pattern = hook.get_kwarg("pattern", None)
-                if pattern:
-                    match = re.search(pattern, event["message"])
-                    if match:
-                        command = hook.get_kwarg("command", "")
-                        res = self.command(event["server"], event["channel"],
-                            event["target_str"], True, event["user"], command,
-                            "", event["line"], hook, match=match,
-                            message=event["message"], command_prefix="",
-                            action=event["action"], expect_output=False,
-                            buffer_line=event["buffer_line"])
-
-                        if res:
-                            break
+    def _get_regex_matcher(self):
+        # only rebuild when hooks have changed (e.g. modules (un)loaded)
+        generation = self.events.get_generation()
+        if not generation == self._regex_generation:
+            self._regex_matcher = matcher.RegexMatcher(
+                self.events.on("command.regex").get_hooks())
+            self._regex_generation = generation
+        return self._regex_matcher
 
     @utils.hook("received.message.private", priority=EventManager.PRIORITY_LOW)
     def private_message(self, event):
@@ -412,7 +529,8 @@ class Module(ModuleManager.BaseModule):
             stdout.prefix = None
 
         target_str = event.get("target_str", target.name)
-        self._out(event["server"], target, target_str, True, stdout, type, {})
+        self._out(event["server"], target, target_str, True, stdout, type, {},
+            event.get("priority", None))
 
     @utils.hook("check.command.self")
     def check_command_self(self, event):
@@ -0,0 +1,104 @@
+import re, string, typing
+
+try:
+    import re._parser as sre_parse # type: ignore
+    from re._constants import (BRANCH, LITERAL, MAX_REPEAT, MIN_REPEAT,
+        SUBPATTERN) # type: ignore
+except ImportError:
+    import sre_parse # type: ignore
+    from sre_constants import (BRANCH, LITERAL, MAX_REPEAT, MIN_REPEAT,
+        SUBPATTERN) # type: ignore
+
+# ignore-case matching can fold letters in surprising ways (e.g. "s" matches
+# "ſ") so only trust non-letters as literals for ignore-case patterns
+CASELESS_SAFE = set(string.digits+string.punctuation+" ")
+
+LITERALS = typing.List[str]
+
+def _best(candidates: typing.List[LITERALS]) -> typing.Optional[LITERALS]:
+    best: typing.Optional[LITERALS] = None
+    for candidate in candidates:
+        if best is None or (min(len(c) for c in candidate) >
+                min(len(b) for b in best)):
+            best = candidate
+    return best
+
+def _required(parsed: typing.Any, ignorecase: bool
+        ) -> typing.Optional[LITERALS]:
+    # find strings, one of which must be in any string the pattern matches
+    candidates: typing.List[LITERALS] = []
+    run = ""
+
+    for op, value in parsed:
+        if op == LITERAL:
+            char = chr(value)
+            if not ignorecase or char in CASELESS_SAFE:
+                run += char
+                continue
+        if run:
+            candidates.append([run])
+            run = ""
+
+        found: typing.Optional[LITERALS] = None
+        if op == SUBPATTERN:
+            group, add_flags, del_flags, subparsed = value
+            found = _required(subparsed, (ignorecase or
+                bool(add_flags & re.I)) and not bool(del_flags & re.I))
+        elif op in [MAX_REPEAT, MIN_REPEAT]:
+            minimum, maximum, subparsed = value
+            if minimum > 0:
+                found = _required(subparsed, ignorecase)
+        elif op == BRANCH:
+            branches = [_required(b, ignorecase) for b in value[1]]
+            if all(branches):
+                found = [literal for branch in branches if branch
+                    for literal in branch]
+
+        if found:
+            candidates.append(found)
+    if run:
+        candidates.append([run])
+
+    return _best(candidates)
+
+def required_literals(pattern: typing.Pattern) -> typing.Optional[LITERALS]:
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    return _required(parsed, bool(pattern.flags & re.I))
+
+class RegexHook(object):
+    def __init__(self, hook: typing.Any, pattern: typing.Pattern):
+        self.hook = hook
+        self.pattern = pattern
+        self.command = hook.get_kwarg("command", "")
+        self.ignore_action = hook.get_kwarg("ignore_action", True)
+        self.statusmsg = hook.get_kwarg("statusmsg", False)
+        self.literals = required_literals(pattern)
+
+class RegexMatcher(object):
+    def __init__(self, hooks: typing.List[typing.Any]):
+        self._hooks: typing.List[RegexHook] = []
+        for hook in hooks:
+            pattern = hook.get_kwarg("pattern", None)
+            if pattern:
+                self._hooks.append(RegexHook(hook, re.compile(pattern)))
+
+    def match(self, message: str, action: bool, statusmsg: bool
+            ) -> typing.Generator[typing.Tuple[RegexHook, typing.Match],
+            None, None]:
+        for regex_hook in self._hooks:
+            if action and regex_hook.ignore_action:
+                continue
+            if statusmsg and not regex_hook.statusmsg:
+                continue
+
+            if (regex_hook.literals and
+                    not any(l in message for l in regex_hook.literals)):
+                # can't possibly match, don't bother searching
+                continue
+
+            match = regex_hook.pattern.search(message)
+            if match:
+                yield regex_hook, match
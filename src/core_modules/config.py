@@ -3,7 +3,7 @@
 #--depends-on commands
 #--depends-on permissions
 
-import enum
+import enum, inspect
 from src import ModuleManager, utils
 
 class ConfigInvalidValue(Exception):
@@ -119,6 +119,10 @@ class Module(ModuleManager.BaseModule):
             setting_object = export_settings[setting]
             try:
                 validated_value = setting_object.parse(value)
+                if inspect.isgenerator(validated_value):
+                    # validating needs HTTP requests (see
+                    # utils.http.run_generator)
+                    validated_value = yield from validated_value
             except utils.settings.SettingParseException as e:
                 raise ConfigInvalidValue(str(e))
 
@@ -210,7 +214,8 @@ class Module(ModuleManager.BaseModule):
                 raise utils.EventError("Setting not found")
 
             try:
-                result = self._config(export_settings, target, setting, value)
+                result = yield from self._config(export_settings, target,
+                    setting, value)
             except ConfigInvalidValue as e:
                 if not e.message == None:
                     raise utils.EventError("Invalid value: %s" % e.message)
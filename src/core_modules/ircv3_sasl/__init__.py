@@ -188,8 +188,8 @@ class Module(ModuleManager.BaseModule):
         self._end_sasl(event["server"])
 
     def _panic(self, server, message):
-        if server.get_setting("sasl-hard-fail",
-                self.bot.get_setting("sasl-hard-fail", False)):
+        if self.bot.resolve_setting("sasl-hard-fail", server=server,
+                default=False):
             message = "SASL panic for %s: %s" % (str(server), message)
             self.log.error(message)
             self.bot.disconnect(server)
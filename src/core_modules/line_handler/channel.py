@@ -34,6 +34,9 @@ def handle_353(event):
     if nicknames and not nicknames[-1]:
         nicknames.pop(-1)
 
+    userhost_in_names = event["server"].has_capability_str(
+        "userhost-in-names")
+    parsed = []
     for nickname in nicknames:
         modes = set([])
 
@@ -41,9 +44,19 @@ def handle_353(event):
             modes.add(event["server"].prefix_symbols[nickname[0]])
             nickname = nickname[1:]
 
-        if event["server"].has_capability_str("userhost-in-names"):
+        hostmask = None
+        if userhost_in_names:
             hostmask = IRCLine.parse_hostmask(nickname)
             nickname = hostmask.nickname
+        parsed.append((nickname, hostmask, modes))
+
+    # resolve ids for every user we've not seen before in one go, rather than
+    # two queries per user
+    event["server"].get_user_ids([nickname for nickname, _, _ in parsed
+        if not event["server"].has_user(nickname)])
+
+    for nickname, hostmask, modes in parsed:
+        if hostmask:
             user = event["server"].get_user(hostmask.nickname,
                 username=hostmask.username, hostname=hostmask.hostname)
         else:
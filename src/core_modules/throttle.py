@@ -8,6 +8,12 @@ def _parse(value):
 
 @utils.export("serverset", utils.FunctionSetting(_parse, "throttle",
     "Configure lines:seconds throttle for the current server", example="4:2"))
+@utils.export("serverset", utils.IntSetting("bulk-queue-max",
+    "Most low-priority lines (e.g. RSS) to keep queued per target",
+    example="20"))
+@utils.export("serverset", utils.IntSetting("bulk-queue-deadline",
+    "Drop queued low-priority lines (e.g. RSS) after this many seconds",
+    example="300"))
 class Module(ModuleManager.BaseModule):
     @utils.hook("received.001")
     def connect(self, event):
@@ -15,3 +21,7 @@ class Module(ModuleManager.BaseModule):
         if throttle:
             lines, seconds = throttle
             event["server"].socket.set_throttle(lines, seconds)
+
+        event["server"].socket.set_bulk_limits(
+            event["server"].get_setting("bulk-queue-max", 0),
+            event["server"].get_setting("bulk-queue-deadline", 0))
@@ -1,7 +1,8 @@
-import asyncio, codecs, dataclasses, ipaddress, re, signal, socket, traceback
-import typing, urllib.error, urllib.parse, uuid
+import codecs, concurrent.futures, dataclasses, functools, http.cookiejar
+import ipaddress, queue, re, socket, threading, time, traceback, typing
+import urllib.error, urllib.parse, uuid
 import json as _json
-import bs4, netifaces, requests, tornado.httpclient
+import bs4, netifaces, requests, requests.adapters
 from src import IRCBot, utils
 from requests_toolbelt.adapters import source
 
@@ -33,6 +34,7 @@ USERAGENT = "Mozilla/5.0 (compatible; BitBot/%s; +%s)" % (
     IRCBot.VERSION, IRCBot.URL)
 
 RESPONSE_MAX = (1024*1024)*100
+RESPONSE_CHUNK = 1024*64
 SOUP_CONTENT_TYPES = ["text/html", "text/xml", "application/xml"]
 UTF8_CONTENT_TYPES = ["application/json"]
 
@@ -178,68 +180,227 @@ class HostNameInvalidError(ValueError):
 class TooManyRedirectionsError(Exception):
     pass
 
-def _request(request_obj: Request) -> Response:
-    request_obj.validate()
+WORKERS = 4
+# a worker still busy this long after its request's deadline is stuck
+# somewhere the timeout doesn't reach (e.g. a DNS lookup) so it's abandoned
+# and replaced
+STUCK_GRACE = 5.0
+WATCH_INTERVAL = 1.0
+
+T_CALLBACK = typing.Callable[
+    [typing.Optional[Response], typing.Optional[Exception]], None]
+T_TRIGGER = typing.Callable[[typing.Callable[[], None]], typing.Any]
+
+class _Job(object):
+    def __init__(self, request: Request, timeout: float,
+            future: "concurrent.futures.Future[Response]",
+            callback: typing.Optional[T_CALLBACK],
+            trigger: typing.Optional[T_TRIGGER]):
+        self.request = request
+        self.timeout = timeout
+        self.future = future
+        self.callback = callback
+        self.trigger = trigger
+        self.deadline = 0.0
+        self.finished = False
+
+class Engine(object):
+    def __init__(self, workers: int=WORKERS):
+        self._workers = workers
+        self._threads: typing.List[threading.Thread] = []
+        self._busy: typing.Dict[threading.Thread, _Job] = {}
+        self._watcher: typing.Optional[threading.Thread] = None
+        self._queue: queue.Queue[_Job] = queue.Queue()
+        self._sessions: typing.Dict[typing.Optional[str],
+            requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self._workers:
+                thread = threading.Thread(target=self._loop)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch)
+                self._watcher.daemon = True
+                self._watcher.start()
+
+    def _session(self, bindhost: typing.Optional[str]) -> requests.Session:
+        # one keep-alive session per bindhost, each of which holds a
+        # connection pool per host
+        with self._lock:
+            if not bindhost in self._sessions:
+                session = requests.Session()
+                # cookies are passed in per-request, never share them between
+                # requests
+                session.cookies.set_policy(
+                    http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+
+                if bindhost is None:
+                    adapter = requests.adapters.HTTPAdapter(
+                        pool_maxsize=self._workers)
+                else:
+                    adapter = source.SourceAddressAdapter(bindhost,
+                        pool_maxsize=self._workers)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[bindhost] = session
+            return self._sessions[bindhost]
+
+    def submit(self, request_obj: Request,
+            callback: typing.Optional[T_CALLBACK]=None,
+            trigger: typing.Optional[T_TRIGGER]=None,
+            timeout: typing.Optional[float]=None
+            ) -> "concurrent.futures.Future[Response]":
+        request_obj.validate()
+        if not self._threads:
+            self._start()
+
+        if timeout is None:
+            timeout = request_obj.timeout
+
+        future: concurrent.futures.Future[Response] = \
+            concurrent.futures.Future()
+        self._queue.put(_Job(request_obj, timeout, future, callback, trigger))
+        return future
+
+    def _loop(self):
+        thread = threading.current_thread()
+        while True:
+            job = self._queue.get(block=True)
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            with self._lock:
+                job.deadline = time.monotonic()+job.timeout
+                self._busy[thread] = job
+
+            response: typing.Optional[Response] = None
+            error: typing.Optional[Exception] = None
+            try:
+                response = self._request(job.request, job.deadline)
+            except Exception as e:
+                error = e
+
+            with self._lock:
+                abandoned = not thread in self._threads
+                self._busy.pop(thread, None)
+            self._finish(job, response, error)
+            if abandoned:
+                # we've already been replaced
+                break
+
+    def _watch(self):
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            now = time.monotonic()
+            stuck: typing.List[_Job] = []
+            with self._lock:
+                for thread, job in list(self._busy.items()):
+                    if now > (job.deadline+STUCK_GRACE):
+                        self._threads.remove(thread)
+                        del self._busy[thread]
+                        stuck.append(job)
+
+            if stuck:
+                self._start()
+            for job in stuck:
+                self._finish(job, None, HTTPTimeoutException())
+
+    def _finish(self, job: _Job, response: typing.Optional[Response],
+            error: typing.Optional[Exception]):
+        with self._lock:
+            if job.finished:
+                return
+            job.finished = True
+
+        if error is None:
+            job.future.set_result(typing.cast(Response, response))
+        else:
+            job.future.set_exception(typing.cast(Exception, error))
+
+        if not job.callback is None:
+            callback = job.callback
+            func = lambda: callback(response, error)
+            try:
+                if job.trigger is None:
+                    func()
+                else:
+                    job.trigger(func)
+            except Exception:
+                traceback.print_exc()
+
+    def _request(self, request_obj: Request, deadline: float) -> Response:
 
-    def _assert_allowed(url: str):
-        hostname = urllib.parse.urlparse(url).hostname
-        if hostname is None or not host_permitted(hostname):
-            raise HostNameInvalidError(
-                f"hostname {hostname} is not permitted")
+        def _assert_allowed(url: str):
+            hostname = urllib.parse.urlparse(url).hostname
+            if hostname is None or not host_permitted(hostname):
+                raise HostNameInvalidError(
+                    f"hostname {hostname} is not permitted")
+
+        def _time_left() -> float:
+            time_left = deadline-time.monotonic()
+            if time_left <= 0:
+                raise HTTPTimeoutException()
+            return time_left
 
-    def _wrap() -> Response:
         headers = request_obj.get_headers()
+        session = self._session(request_obj.bindhost)
 
         redirect = 0
         current_url = request_obj.url
-        session = requests.Session()
-        if not request_obj.bindhost is None:
-            new_source = source.SourceAddressAdapter(request_obj.bindhost)
-            session.mount('http://', new_source)
-            session.mount('https://', new_source)
-
-        while True:
-            if request_obj.check_hostname:
-                _assert_allowed(current_url)
-
-            response = session.request(
-                request_obj.method,
-                current_url,
-                headers=headers,
-                params=request_obj.get_params,
-                data=request_obj.get_body(),
-                allow_redirects=False,
-                stream=True,
-                cookies=request_obj.cookies
-            )
-
-            if response.status_code in [301, 302]:
-                redirect += 1
-                if redirect == 5:
-                    raise TooManyRedirectionsError(f"{redirect} redirects")
-                else:
-                    current_url = response.headers["location"]
-                    continue
-
-            response_content = response.raw.read(RESPONSE_MAX,
-                decode_content=True)
-            if not response.raw.read(1) == b"":
-                raise ValueError("Response too large")
-            break
-
-        session.close()
-
-        headers = utils.CaseInsensitiveDict(dict(response.headers))
-        our_response = Response(response.status_code, response_content,
-            encoding=response.encoding, headers=headers,
+        try:
+            while True:
+                if request_obj.check_hostname:
+                    _assert_allowed(current_url)
+
+                response = session.request(
+                    request_obj.method,
+                    current_url,
+                    headers=headers,
+                    params=request_obj.get_params,
+                    data=request_obj.get_body(),
+                    allow_redirects=False,
+                    stream=True,
+                    cookies=request_obj.cookies,
+                    timeout=_time_left()
+                )
+
+                if response.status_code in [301, 302]:
+                    response.close()
+                    redirect += 1
+                    if redirect == 5:
+                        raise TooManyRedirectionsError(f"{redirect} redirects")
+                    else:
+                        current_url = response.headers["location"]
+                        continue
+
+                chunks: typing.List[bytes] = []
+                read = 0
+                try:
+                    for chunk in response.raw.stream(RESPONSE_CHUNK,
+                            decode_content=True):
+                        _time_left()
+                        read += len(chunk)
+                        if read > RESPONSE_MAX:
+                            raise ValueError("Response too large")
+                        chunks.append(chunk)
+                finally:
+                    response.close()
+                break
+        except requests.exceptions.Timeout:
+            raise HTTPTimeoutException()
+
+        our_response = Response(response.status_code, b"".join(chunks),
+            encoding=response.encoding,
+            headers=utils.CaseInsensitiveDict(dict(response.headers)),
             cookies=response.cookies.get_dict())
+        _set_encoding(request_obj, our_response)
         return our_response
 
-    try:
-        response = utils.deadline_process(_wrap, seconds=request_obj.timeout)
-    except utils.DeadlineExceededException:
-        raise HTTPTimeoutException()
-
+def _set_encoding(request_obj: Request, response: Response):
     encoding = response.encoding or request_obj.fallback_encoding
 
     if not encoding:
@@ -253,7 +414,24 @@ def _request(request_obj: Request) -> Response:
         encoding = _find_encoding(response.headers, response.data) or encoding
     response.encoding = encoding
 
-    return response
+_engine = Engine()
+
+def request_async(request_obj: Request, callback: T_CALLBACK,
+        trigger: typing.Optional[T_TRIGGER]=None
+        ) -> "concurrent.futures.Future[Response]":
+    # `callback` is called with (response, None) or (None, exception) and, if
+    # given, through `trigger` (e.g. `Bot.trigger`) so it runs on the main
+    # thread
+    return _engine.submit(request_obj, callback, trigger)
+
+def _request(request_obj: Request) -> Response:
+    future = _engine.submit(request_obj)
+    try:
+        # the engine enforces the timeout itself, this is a safety net
+        return future.result(timeout=request_obj.timeout+1)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise HTTPTimeoutException()
 
 class Session(object):
     def __init__(self):
@@ -272,49 +450,80 @@ class Session(object):
 class RequestManyException(Exception):
     pass
 def request_many(requests: typing.List[Request]) -> typing.Dict[str, Response]:
+    futures = {}
+    for request in requests:
+        future = _engine.submit(request, timeout=min(request.timeout, 5))
+        futures[future] = request
+
     responses = {}
+    done, not_done = concurrent.futures.wait(futures.keys(), timeout=6)
+    for future in not_done:
+        future.cancel()
+    for future in done:
+        if future.exception() is None:
+            request = futures[future]
+            responses[typing.cast(str, request.id)] = future.result()
 
-    async def _request(request):
-        request.validate()
-        client = tornado.httpclient.AsyncHTTPClient()
-        url = request.url
-        if request.get_params:
-            url = "%s?%s" % (url, urllib.parse.urlencode(request.get_params))
-
-        t_request = tornado.httpclient.HTTPRequest(
-            request.url,
-            connect_timeout=2, request_timeout=2,
-            method=request.method,
-            body=request.get_body(),
-            headers=request.get_headers(),
-            follow_redirects=request.allow_redirects,
-        )
+    return responses
 
-        try:
-            response = await client.fetch(t_request)
-        except:
-            raise RequestManyException(
-                "request_many failed for %s" % url)
-
-        headers = utils.CaseInsensitiveDict(dict(response.headers))
-        encoding = _find_encoding(headers, response.body) or "utf8"
-        responses[request.id] = Response(response.code, response.body, encoding,
-            headers, {})
-
-    loop = asyncio.new_event_loop()
-    awaits = []
-    for request in requests:
-        awaits.append(_request(request))
-    task = asyncio.wait(awaits, loop=loop, timeout=5)
-    loop.run_until_complete(task)
-    loop.close()
+def request_many_async(requests: typing.List[Request],
+        callback: typing.Callable[[typing.Dict[str, Response]], None],
+        trigger: typing.Optional[T_TRIGGER]=None):
+    # like request_many(), `callback` gets the responses that succeeded, by
+    # request id, once every request has finished one way or another
+    responses: typing.Dict[str, Response] = {}
+    remaining = [len(requests)]
+    if not requests:
+        callback(responses)
+        return
+
+    def _done(request: Request, response: typing.Optional[Response],
+            error: typing.Optional[Exception]):
+        if not response is None:
+            responses[typing.cast(str, request.id)] = response
+        remaining[0] -= 1
+        if not remaining[0]:
+            callback(responses)
 
-    return responses
+    for request in requests:
+        _engine.submit(request, functools.partial(_done, request), trigger,
+            timeout=min(request.timeout, 5))
+
+T_GENERATOR = typing.Generator[typing.Any, typing.Any, None]
+T_DONE = typing.Callable[[typing.Optional[Exception]], None]
+
+def run_generator(generator: T_GENERATOR, done: T_DONE,
+        trigger: T_TRIGGER):
+    # run `generator` until it next yields a Request (or list of Requests)
+    # then carry on, through `trigger`, once the response is in. the
+    # generator gets back what request() (or request_many()) would have
+    # returned, or has the request's exception raised at the yield.
+    # `done` gets the exception the generator raised, if any
+    def _step(value: typing.Any, error: typing.Optional[Exception]):
+        try:
+            if error is None:
+                yielded = generator.send(value)
+            else:
+                yielded = generator.throw(error)
+        except StopIteration:
+            done(None)
+            return
+        except Exception as e:
+            done(e)
+            return
+
+        if isinstance(yielded, list):
+            request_many_async(yielded,
+                lambda responses: _step(responses, None), trigger)
+        else:
+            _engine.submit(yielded, _step, trigger)
+    _step(None, None)
 
 class Client(object):
     request = request
     request_many = request_many
 
+
 def strip_html(s: str) -> str:
     return bs4.BeautifulSoup(s, "html5lib").get_text()
 
@@ -1,4 +1,4 @@
-import dataclasses, json, string, re, typing, uuid
+import dataclasses, functools, json, string, re, typing, uuid
 from . import consts
 
 ASCII_UPPER = string.ascii_uppercase
@@ -15,15 +15,22 @@ def multi_replace(s: str,
     for char1, char2 in zip(chars1, chars2):
         s = s.replace(char1, char2)
     return s
+
+CASE_MAPPINGS = {
+    "ascii": str.maketrans(ASCII_UPPER, ASCII_LOWER),
+    "rfc1459": str.maketrans(RFC1459_UPPER, RFC1459_LOWER),
+    "strict-rfc1459": str.maketrans(STRICT_RFC1459_UPPER,
+        STRICT_RFC1459_LOWER)
+}
+LOWER_CACHE_SIZE = 4096
+
+# nicknames and channel names are lowered over and over again, keep the most
+# recently used ones around
+@functools.lru_cache(maxsize=LOWER_CACHE_SIZE)
 def lower(case_mapping: str, s: str) -> str:
-    if case_mapping == "ascii":
-        return multi_replace(s, ASCII_UPPER, ASCII_LOWER)
-    elif case_mapping == "rfc1459":
-        return multi_replace(s, RFC1459_UPPER, RFC1459_LOWER)
-    elif case_mapping == "strict-rfc1459":
-        return multi_replace(s, STRICT_RFC1459_UPPER, STRICT_RFC1459_LOWER)
-    else:
+    if not case_mapping in CASE_MAPPINGS:
         raise ValueError("unknown casemapping '%s'" % case_mapping)
+    return s.translate(CASE_MAPPINGS[case_mapping])
 
 # compare a string while respecting case mapping
 def equals(case_mapping: str, s1: str, s2: str) -> bool:
@@ -76,29 +83,15 @@ FORMAT_STRIP = [
     "\x08" # backspace
 ]
 
+FORMAT_CHARS = [consts.COLOR]+FORMAT_TOKENS+FORMAT_STRIP
+REGEX_FORMAT_CHARS = re.compile("[%s]" % "".join(FORMAT_CHARS))
+REGEX_FORMAT = re.compile("(%s\\d{0,2}(?:,\\d{1,2})?|[%s])" % (consts.COLOR,
+    "".join(FORMAT_TOKENS+FORMAT_STRIP)))
+
 def _format_tokens(s: str) -> typing.List[str]:
-    tokens: typing.List[str] = []
-
-    s_copy = list(s)
-    while s_copy:
-        token = s_copy.pop(0)
-        if token == "\x03":
-            for i in range(2):
-                if s_copy and s_copy[0].isdigit():
-                    token += s_copy.pop(0)
-            if (len(s_copy) > 1 and
-                    s_copy[0] == "," and
-                    s_copy[1].isdigit()):
-                token += s_copy.pop(0)
-                token += s_copy.pop(0)
-                if s_copy and s_copy[0].isdigit():
-                    token += s_copy.pop(0)
-
-            tokens.append(token)
-        elif (token in FORMAT_TOKENS or
-                token in FORMAT_STRIP):
-            tokens.append(token)
-    return tokens
+    # alternating text and formatting tokens, always starting and ending with
+    # (possibly empty) text
+    return REGEX_FORMAT.split(s)
 
 def _color_match(code: typing.Optional[str], foreground: bool) -> str:
     if not code:
@@ -112,7 +105,13 @@ def parse_format(s: str) -> str:
     bold = False
     underline = False
 
-    for token in _format_tokens(s):
+    if REGEX_FORMAT_CHARS.search(s) is None:
+        return s+consts.ANSI_RESET
+
+    pieces = _format_tokens(s)
+    out: typing.List[str] = [pieces[0]]
+    for i in range(1, len(pieces), 2):
+        token = pieces[i]
         replace = ""
         type = token[0]
 
@@ -153,15 +152,16 @@ def parse_format(s: str) -> str:
         elif type in FORMAT_STRIP:
             replace = ""
 
-        s = s.replace(token, replace, 1)
+        out.append(replace)
+        out.append(pieces[i+1])
 
-    s += consts.ANSI_RESET
-    return s
+    out.append(consts.ANSI_RESET)
+    return "".join(out)
 
 def strip_font(s: str) -> str:
-    for token in _format_tokens(s):
-        s = s.replace(token, "", 1)
-    return s
+    if REGEX_FORMAT_CHARS.search(s) is None:
+        return s
+    return "".join(_format_tokens(s)[::2])
 
 OPT_STR = typing.Optional[str]
 class IRCConnectionParameters(object):